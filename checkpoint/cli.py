@@ -99,7 +99,8 @@ def process_args(args: argparse.Namespace):
         gb.rc.print(f"📝 Лог записывается в файл: {log_path}", style="blue")
 
     try:
-        driver_manager = get_driver_manager(args.is_headless)
+        # Модулю disabled нужны события скачивания браузера
+        driver_manager = get_driver_manager(args.is_headless, page_log=args.module == "disabled")
         driver = driver_manager.get_driver()
 
         from checkpoint.modules import login
@@ -23,10 +23,18 @@ def init_globals():
     tmprinter = TMPrinter()
     rc = DualConsole(highlight=True)  # Используем систему двойного вывода
     task_sync = TaskSynchronizer()  # Инициализируем синхронизатор задач
+
+    # Планировщик мог быть остановлен прошлым cleanup_globals()
+    from checkpoint.objects.scheduler import scheduler
+    scheduler.start()
     
 def cleanup_globals():
     """Корректно завершает работу с глобальными объектами"""
     global rc
+    # Прерываем паузы фоновых потоков и останавливаем таймеры
+    from checkpoint.objects.scheduler import scheduler
+    scheduler.shutdown()
+
     if 'rc' in globals() and hasattr(rc, 'close'):
         rc.close()
 
@@ -33,7 +33,7 @@ async def check_cookies(driver: WebDriver, cookies) -> bool:
     """Checks the validity of given cookies."""
     driver.get(urls["home"])
 
-    if check_page(driver, 'index') or check_page(driver, 'authorized'):
+    if classify_page(driver, ['index', 'authorized'], WAIT_TIMEOUT):
         return True
 
     if not cookies:
@@ -44,7 +44,7 @@ async def check_cookies(driver: WebDriver, cookies) -> bool:
 
     driver.refresh()
 
-    return check_page(driver, 'index') or check_page(driver, 'authorized')
+    return bool(classify_page(driver, ['index', 'authorized'], WAIT_TIMEOUT))
 
 @print_function_name
 async def gen_cookies(driver: WebDriver, creds: CheckPointCreds):
@@ -58,23 +58,23 @@ async def gen_cookies(driver: WebDriver, creds: CheckPointCreds):
             driver.refresh()
             loop_counter = 0
 
-        if check_page(driver, 'login'):
+        # Все страницы авторизации проверяются одним вызовом, ожидание - одно на все страницы
+        page = classify_page(driver, ['login', 'captcha', 'two_step_verification', 'add_trusted_device', 'index', 'authorized'], WAIT_TIMEOUT)
+
+        if 'index' in page or 'authorized' in page:
+            break
+
+        if 'login' in page:
             login(driver, config.USER_NAME, config.PASSWORD)
         
-        if check_page(driver, 'captcha'):
+        if 'captcha' in page:
             solve_captcha(driver)
         
-        if check_page(driver, 'two_step_verification'):
+        if 'two_step_verification' in page:
             two_step_verification_wait(driver)
         
-        if check_page(driver, 'add_trusted_device'):
+        if 'add_trusted_device' in page:
             add_trusted_device(driver)
-        
-        if check_page(driver, 'index'):
-            break
-        
-        if check_page(driver, 'authorized'):
-            break
 
         # Проверка на истечение времени сеанса
         if check_popup(driver, "session_timeout"):
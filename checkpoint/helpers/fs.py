@@ -4,10 +4,13 @@ File system utilities and duplicate handling
 import os
 import re
 import shutil
-import hashlib
+import time
 from pathlib import Path
 from typing import Set, List, Tuple, Optional
 from checkpoint import globals as gb
+from checkpoint.knowledge.fs import files as fs_files, hashing as hashing_config, perceptual as perceptual_config
+from checkpoint.objects.hashing import HASH_ALGORITHMS, HashEngine, hash_file, hash_file_edges
+from checkpoint.objects.perceptual import PerceptualIndex
 
 
 def ensure_temp_directory() -> Path:
@@ -55,7 +58,7 @@ def calculate_file_hash(file_path: Path, algorithm: str = 'md5') -> str:
     
     Args:
         file_path: Путь к файлу
-        algorithm: Алгоритм хеширования ('md5', 'sha1', 'sha256')
+        algorithm: Алгоритм хеширования ('md5', 'sha1', 'sha256', 'blake2b')
         
     Returns:
         str: Хеш файла в виде строки
@@ -67,30 +70,11 @@ def calculate_file_hash(file_path: Path, algorithm: str = 'md5') -> str:
     if not file_path.exists():
         raise FileNotFoundError(f"Файл не найден: {file_path}")
     
-    # Размер буфера для чтения файла (64KB)
-    BUF_SIZE = 65536
-    
-    # Выбираем алгоритм хеширования
-    hash_algorithms = {
-        'md5': hashlib.md5,
-        'sha1': hashlib.sha1,
-        'sha256': hashlib.sha256
-    }
-    
-    if algorithm not in hash_algorithms:
-        raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}. Доступны: {list(hash_algorithms.keys())}")
-    
-    hash_obj = hash_algorithms[algorithm]()
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}. Доступны: {list(HASH_ALGORITHMS.keys())}")
     
     try:
-        with open(file_path, 'rb') as f:
-            while True:
-                data = f.read(BUF_SIZE)
-                if not data:
-                    break
-                hash_obj.update(data)
-        
-        return hash_obj.hexdigest()
+        return hash_file(file_path, algorithm)
     
     except Exception as e:
         gb.rc.print(f"❌ Ошибка при вычислении хеша файла {file_path}: {e}", style="red")
@@ -112,11 +96,101 @@ def is_duplicate_by_filename(filename: str) -> bool:
     return bool(re.search(pattern, filename))
 
 
+def _collect_files(directory: Path, extensions: Optional[List[str]] = None, recursive: bool = True) -> List[Path]:
+    """
+    Собирает список файлов директории с фильтром по расширению
+    
+    Args:
+        directory: Путь к директории
+        extensions: Список расширений файлов для проверки (например, ['.jpg', '.png'])
+        recursive: Рекурсивный поиск по поддиректориям
+        
+    Returns:
+        List[Path]: Список путей к файлам
+    """
+    # Множество расширений собирается один раз, а не для каждого файла
+    allowed_extensions = {ext.lower() for ext in extensions} if extensions else None
+    file_paths = directory.rglob('*') if recursive else directory.glob('*')
+    
+    return [
+        file_path for file_path in file_paths
+        if (allowed_extensions is None or file_path.suffix.lower() in allowed_extensions) and file_path.is_file()
+    ]
+
+
+def _group_duplicates(
+    file_paths: List[Path],
+    algorithm: str = 'md5',
+    strategy: str = 'tiered'
+) -> Tuple[List[Tuple[str, List[Path]]], int]:
+    """
+    Группирует файлы с одинаковым содержимым
+    
+    Args:
+        file_paths: Список путей к файлам
+        algorithm: Алгоритм хеширования
+        strategy: Стратегия поиска:
+            - 'tiered': группировка по размеру, затем хеш начала и конца файла,
+              полный хеш только для оставшихся совпадений
+            - 'full': полный хеш каждого файла
+            
+    Returns:
+        Tuple[List[Tuple[str, List[Path]]], int]: (список групп дубликатов (хеш, список путей), прочитано байт)
+    """
+    if strategy not in ('tiered', 'full'):
+        raise ValueError(f"Неподдерживаемая стратегия: {strategy}. Доступны: 'tiered', 'full'")
+    
+    bytes_read = 0
+    file_hashes = {}
+    
+    if strategy == 'full':
+        candidates = file_paths
+    else:
+        # Этап 1: файлы с уникальным размером не могут иметь дубликатов
+        by_size = {}
+        for file_path in file_paths:
+            try:
+                by_size.setdefault(file_path.stat().st_size, []).append(file_path)
+            except OSError as e:
+                gb.rc.print(f"⚠️ Ошибка при обработке файла {file_path}: {e}", style="yellow")
+        
+        # Этап 2: хеш начала и конца файла для файлов одинакового размера.
+        # Файл не больше двух блоков читается целиком - его хеш уже полный, этап 3 для него не нужен
+        chunk_size = hashing_config['partial_chunk_size']
+        by_partial = {}
+        for size, paths in by_size.items():
+            if len(paths) < 2:
+                continue
+            groups = file_hashes if size <= chunk_size * 2 else by_partial
+            for file_path in paths:
+                try:
+                    partial_hash, read = hash_file_edges(file_path, algorithm, chunk_size)
+                    bytes_read += read
+                    groups.setdefault(partial_hash, []).append(Path(file_path))
+                except OSError as e:
+                    gb.rc.print(f"⚠️ Ошибка при обработке файла {file_path}: {e}", style="yellow")
+        
+        candidates = [file_path for paths in by_partial.values() if len(paths) > 1 for file_path in paths]
+    
+    # Этап 3: полный хеш для оставшихся совпадений
+    for file_path, file_hash, error in HashEngine(algorithm).map(candidates):
+        if error:
+            gb.rc.print(f"⚠️ Ошибка при обработке файла {file_path}: {error}", style="yellow")
+            continue
+        bytes_read += os.path.getsize(file_path)
+        file_hashes.setdefault(file_hash, []).append(Path(file_path))
+    
+    duplicate_groups = [(hash_val, sorted(paths)) for hash_val, paths in file_hashes.items() if len(paths) > 1]
+    
+    return duplicate_groups, bytes_read
+
+
 def find_duplicates_by_hash(
     directory: Path, 
     extensions: Optional[List[str]] = None,
     algorithm: str = 'md5',
-    recursive: bool = True
+    recursive: bool = True,
+    strategy: str = 'tiered'
 ) -> Tuple[List[Tuple[str, List[Path]]], int]:
     """
     Находит дубликаты файлов в директории по хешу
@@ -126,6 +200,7 @@ def find_duplicates_by_hash(
         extensions: Список расширений файлов для проверки (например, ['.jpg', '.png'])
         algorithm: Алгоритм хеширования
         recursive: Рекурсивный поиск по поддиректориям
+        strategy: Стратегия поиска ('tiered' - размер, частичный и полный хеш; 'full' - полный хеш всех файлов)
         
     Returns:
         Tuple[List[Tuple[str, List[Path]]], int]: 
@@ -135,39 +210,11 @@ def find_duplicates_by_hash(
         gb.rc.print(f"⚠️ Директория не найдена: {directory}", style="yellow")
         return [], 0
     
-    file_hashes = {}
     total_duplicates = 0
     
     try:
-        # Определяем метод обхода директории
-        if recursive:
-            file_paths = directory.rglob('*')
-        else:
-            file_paths = directory.glob('*')
-        
-        # Фильтруем только файлы
-        for file_path in file_paths:
-            if not file_path.is_file():
-                continue
-                
-            # Проверяем расширение файла, если задан фильтр
-            if extensions and file_path.suffix.lower() not in [ext.lower() for ext in extensions]:
-                continue
-            
-            try:
-                file_hash = calculate_file_hash(file_path, algorithm)
-                
-                if file_hash in file_hashes:
-                    file_hashes[file_hash].append(file_path)
-                else:
-                    file_hashes[file_hash] = [file_path]
-                    
-            except Exception as e:
-                gb.rc.print(f"⚠️ Ошибка при обработке файла {file_path}: {e}", style="yellow")
-                continue
-        
-        # Выбираем только группы с дубликатами (больше одного файла)
-        duplicate_groups = [(hash_val, paths) for hash_val, paths in file_hashes.items() if len(paths) > 1]
+        file_paths = _collect_files(directory, extensions, recursive)
+        duplicate_groups, _ = _group_duplicates(file_paths, algorithm, strategy)
         
         # Подсчитываем общее количество дубликатов (исключая оригиналы)
         for _, paths in duplicate_groups:
@@ -182,6 +229,47 @@ def find_duplicates_by_hash(
         return [], 0
 
 
+def benchmark_duplicate_search(
+    directory: Path,
+    extensions: Optional[List[str]] = None,
+    algorithm: str = 'md5',
+    recursive: bool = True
+) -> dict:
+    """
+    Сравнивает объем чтения и время поиска дубликатов полным хешированием и поэтапной стратегией
+    
+    Args:
+        directory: Путь к директории
+        extensions: Список расширений файлов для проверки
+        algorithm: Алгоритм хеширования
+        recursive: Рекурсивный поиск по поддиректориям
+        
+    Returns:
+        dict: Результаты по каждой стратегии: прочитано байт, время, количество групп дубликатов
+    """
+    file_paths = _collect_files(directory, extensions, recursive)
+    results = {'directory': str(directory), 'files': len(file_paths)}
+    
+    for strategy in ('full', 'tiered'):
+        start_time = time.perf_counter()
+        duplicate_groups, bytes_read = _group_duplicates(file_paths, algorithm, strategy)
+        results[strategy] = {
+            'bytes_read': bytes_read,
+            'seconds': round(time.perf_counter() - start_time, 3),
+            'groups': len(duplicate_groups),
+        }
+    
+    full_read = results['full']['bytes_read']
+    tiered_read = results['tiered']['bytes_read']
+    ratio = f"{tiered_read / full_read * 100:.1f}%" if full_read else "n/a"
+    
+    gb.rc.print(f"📊 Поиск дубликатов в {directory} ({len(file_paths)} файлов):", style="blue")
+    gb.rc.print(f"   📖 Полный хеш: прочитано {full_read} байт за {results['full']['seconds']} сек", style="cyan")
+    gb.rc.print(f"   📖 Поэтапный поиск: прочитано {tiered_read} байт за {results['tiered']['seconds']} сек ({ratio})", style="cyan")
+    
+    return results
+
+
 def find_duplicates_by_filename(
     directory: Path,
     recursive: bool = True
@@ -223,6 +311,47 @@ def find_duplicates_by_filename(
         return [], 0
 
 
+def find_near_duplicates(
+    directory: Path,
+    extensions: Optional[List[str]] = None,
+    max_distance: Optional[int] = None,
+    recursive: bool = True
+) -> Tuple[List[List[Path]], int]:
+    """
+    Находит похожие изображения (пережатые, уменьшенные копии) по перцептивному хешу
+    
+    Args:
+        directory: Путь к директории для поиска
+        extensions: Список расширений изображений (по умолчанию из конфигурации)
+        max_distance: Максимальное расстояние Хэмминга между похожими изображениями
+        recursive: Рекурсивный поиск по поддиректориям
+        
+    Returns:
+        Tuple[List[List[Path]], int]: (список групп похожих изображений, общее количество дубликатов)
+    """
+    if not directory.exists():
+        gb.rc.print(f"⚠️ Директория не найдена: {directory}", style="yellow")
+        return [], 0
+    
+    try:
+        index = PerceptualIndex(get_temp_path(fs_files['perceptual_index_file']))
+        indexed = index.update(directory, extensions, recursive)
+        
+        for file_path, error in index.errors:
+            gb.rc.print(f"⚠️ Ошибка при обработке файла {file_path}: {error}", style="yellow")
+        
+        clusters = index.clusters(max_distance if max_distance is not None else perceptual_config['max_distance'])
+        total_duplicates = sum(len(paths) - 1 for paths in clusters)
+        
+        gb.rc.print(f"🔍 Проиндексировано {indexed} изображений, найдено {len(clusters)} групп похожих, всего дубликатов: {total_duplicates}", style="blue")
+        
+        return clusters, total_duplicates
+        
+    except Exception as e:
+        gb.rc.print(f"❌ Ошибка при поиске похожих изображений в {directory}: {e}", style="red")
+        return [], 0
+
+
 def get_unique_filename(target_path: Path) -> Path:
     """
     Генерирует уникальное имя файла, добавляя число к имени при конфликте
@@ -333,7 +462,8 @@ def remove_duplicates(
     method: str = 'hash',
     extensions: Optional[List[str]] = None,
     dry_run: bool = True,
-    keep_newest: bool = True
+    keep_newest: bool = True,
+    strategy: str = 'tiered'
 ) -> Tuple[int, List[Path]]:
     """
     Удаляет дубликаты файлов в директории
@@ -344,6 +474,7 @@ def remove_duplicates(
         extensions: Список расширений файлов для проверки
         dry_run: Если True, только показывает что будет удалено без реального удаления
         keep_newest: Если True, сохраняет самый новый файл из группы дубликатов
+        strategy: Стратегия поиска дубликатов по хешу ('tiered' или 'full')
         
     Returns:
         Tuple[int, List[Path]]: (количество удаленных файлов, список удаленных путей)
@@ -357,7 +488,7 @@ def remove_duplicates(
     
     try:
         if method == 'hash':
-            duplicate_groups, _ = find_duplicates_by_hash(directory, extensions)
+            duplicate_groups, _ = find_duplicates_by_hash(directory, extensions, strategy=strategy)
             
             for hash_val, file_paths in duplicate_groups:
                 # Сортируем файлы по времени модификации
@@ -412,7 +543,9 @@ def get_duplicate_statistics(
     directory: Path,
     extensions: Optional[List[str]] = None,
     include_hash_duplicates: bool = True,
-    include_filename_duplicates: bool = True
+    include_filename_duplicates: bool = True,
+    strategy: str = 'tiered',
+    include_near_duplicates: bool = False
 ) -> dict:
     """
     Получает статистику по дубликатам в директории
@@ -422,6 +555,9 @@ def get_duplicate_statistics(
         extensions: Список расширений файлов для проверки
         include_hash_duplicates: Включать ли поиск дубликатов по хешу
         include_filename_duplicates: Включать ли поиск дубликатов по имени
+        strategy: Стратегия поиска дубликатов по хешу ('tiered' или 'full')
+        include_near_duplicates: Включать ли поиск похожих изображений по перцептивному хешу
+            (не входят в total_duplicates: похожее изображение - не обязательно копия)
         
     Returns:
         dict: Словарь со статистикой дубликатов
@@ -430,6 +566,7 @@ def get_duplicate_statistics(
         'directory': str(directory),
         'hash_duplicates': {'groups': 0, 'files': 0, 'details': []},
         'filename_duplicates': {'files': 0, 'details': []},
+        'near_duplicates': {'groups': 0, 'files': 0, 'details': []},
         'total_duplicates': 0
     }
     
@@ -439,7 +576,7 @@ def get_duplicate_statistics(
     
     try:
         if include_hash_duplicates:
-            duplicate_groups, hash_duplicates_count = find_duplicates_by_hash(directory, extensions)
+            duplicate_groups, hash_duplicates_count = find_duplicates_by_hash(directory, extensions, strategy=strategy)
             stats['hash_duplicates']['groups'] = len(duplicate_groups)
             stats['hash_duplicates']['files'] = hash_duplicates_count
             stats['hash_duplicates']['details'] = [(hash_val, [str(p) for p in paths]) for hash_val, paths in duplicate_groups]
@@ -449,11 +586,20 @@ def get_duplicate_statistics(
             stats['filename_duplicates']['files'] = filename_duplicates_count
             stats['filename_duplicates']['details'] = [str(p) for p in filename_duplicates]
         
+        if include_near_duplicates:
+            image_extensions = [ext for ext in extensions if ext.lower() in perceptual_config['extensions']] if extensions else None
+            clusters, near_duplicates_count = find_near_duplicates(directory, image_extensions)
+            stats['near_duplicates']['groups'] = len(clusters)
+            stats['near_duplicates']['files'] = near_duplicates_count
+            stats['near_duplicates']['details'] = [[str(p) for p in paths] for paths in clusters]
+        
         stats['total_duplicates'] = stats['hash_duplicates']['files'] + stats['filename_duplicates']['files']
         
         gb.rc.print(f"📊 Статистика дубликатов для {directory}:", style="blue")
         gb.rc.print(f"   🔗 Дубликаты по хешу: {stats['hash_duplicates']['files']} файлов в {stats['hash_duplicates']['groups']} группах", style="cyan")
         gb.rc.print(f"   📝 Дубликаты по имени: {stats['filename_duplicates']['files']} файлов", style="cyan")
+        if include_near_duplicates:
+            gb.rc.print(f"   🖼️ Похожие изображения: {stats['near_duplicates']['files']} файлов в {stats['near_duplicates']['groups']} группах", style="cyan")
         gb.rc.print(f"   📁 Всего дубликатов: {stats['total_duplicates']}", style="green")
         
         return stats
@@ -1,5 +1,7 @@
 import json
 from pathlib import Path
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
 
 from selenium.common import WebDriverException
 from selenium.webdriver.chrome.webdriver import WebDriver
@@ -13,83 +15,104 @@ from checkpoint.helpers.fs import get_temp_path
 from checkpoint.knowledge import fs, pages
 
 WAIT_TIMEOUT = 3
+POLL_FREQUENCY = 0.25
+
+# Распознавание страниц за один вызов: адрес и CSS селекторы проверяются для каждой страницы,
+# тексты всех страниц ищутся за один обход текстовых узлов документа.
+# Возвращает названия страниц, признаки которых найдены
+CLASSIFY_SCRIPT = """
+var signatures = arguments[0];
+var matched = {};
+var byText = {};
+var remaining = 0;
+for (var page in signatures) {
+    var signature = signatures[page];
+    var url = signature.urls.some(function (part) { return location.href.indexOf(part) !== -1; });
+    if (url || (signature.selector && document.querySelector(signature.selector))) {
+        matched[page] = true;
+        continue;
+    }
+    if (signature.texts.length) remaining++;
+    signature.texts.forEach(function (text) { (byText[text] = byText[text] || []).push(page); });
+}
+if (remaining && document.body) {
+    var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+    for (var node = walker.nextNode(); node && remaining; node = walker.nextNode()) {
+        var pages = byText[node.nodeValue.trim()];
+        if (!pages) continue;
+        pages.forEach(function (page) {
+            if (!matched[page]) { matched[page] = true; remaining--; }
+        });
+    }
+}
+return Object.keys(matched);
+"""
+
+
+def _css_string(value: str) -> str:
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+@lru_cache(maxsize=None)
+def compile_signatures(locales: Tuple[str, ...] = tuple(pages.locales)) -> Dict[str, dict]:
+    """
+    Собирает признаки страниц из knowledge.pages.signatures для заданных языков (результат кэшируется)
 
+    Args:
+        locales: Языки интерфейса
 
-@print_function_name
-def check_page(driver: WebDriver, page: str) -> str | bool:
-    match page:
-        case 'captcha': # страница запроса капчи
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Введите символы, которые вы видите']")))
-            except WebDriverException:
-                return False
-            return True
-
-        case 'index':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[@aria-label='Ваш профиль']")))
-            except WebDriverException:
-                return False
-            return True
-
-        case 'login':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Недавние входы' or @name='login' or text()='Войти на Facebook']")))
-            except WebDriverException:
-                return False
-            return True
+    Returns:
+        Dict[str, dict]: {страница: {selector, texts, urls, priority}}, selector - все CSS селекторы и aria-label через запятую
+    """
+    compiled = {}
+    for page, signature in pages.signatures.items():
+        selectors = list(signature.get('selectors', []))
+        selectors += [f"[aria-label={_css_string(label)}]" for locale in locales for label in signature.get('aria_labels', {}).get(locale, [])]
+        compiled[page] = {
+            'selector': ', '.join(selectors),
+            'texts': [text for locale in locales for text in signature.get('texts', {}).get(locale, [])],
+            'urls': list(signature.get('urls', [])),
+            'priority': signature.get('priority', 0),
+        }
+    return compiled
 
-        case 'two_step_verification':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Проверьте уведомления на другом устройстве' or text()='Проверьте сообщения WhatsApp']")))
-            except WebDriverException:
-                return False
-            return True
 
-        case 'add_trusted_device':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Проверьте уведомления на другом устройстве']")))
-            except WebDriverException:
-                return False
-            return True
+@print_function_name
+def classify_page(driver: WebDriver, page_names: Iterable[str] = None, timeout: float = 0) -> List[str]:
+    """
+    Определяет текущую страницу: признаки всех страниц проверяются одним вызовом JavaScript
 
-        case 'authorized':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[@aria-label='Управление аккаунтом и его настройки']")))
-            except WebDriverException:
-                return False
-            return True
+    Args:
+        driver: WebDriver instance
+        page_names: Проверяемые страницы (по умолчанию все из knowledge.pages.signatures)
+        timeout: Если ни один признак не найден сразу - сколько секунд ждать появления любого из них
 
-        case 'disabled_account':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Мы отключили ваш аккаунт']")))
-            except WebDriverException:
-                return False
-            return True
+    Returns:
+        List[str]: Распознанные страницы по убыванию priority (пустой список, если страница не распознана)
+    """
+    compiled = compile_signatures()
+    signatures = {page: compiled[page] for page in (page_names if page_names is not None else compiled) if page in compiled}
+    if not signatures:
+        return []
 
-        case 'download_account':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Скачать информацию']")))
-            except WebDriverException:
-                return False
-            return True
+    def matched_pages(driver: WebDriver) -> list:
+        return driver.execute_script(CLASSIFY_SCRIPT, signatures)
 
-        case 'creation_backup_is_processing':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Мы создаем файл с вашей информацией']")))
-            except WebDriverException:
-                return False
-            return True
+    try:
+        matched = matched_pages(driver)
+        if not matched and timeout > 0:
+            matched = WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(matched_pages)
+    except WebDriverException:
+        return []
 
-        case 'download_ready':
-            try:
-                WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Файл с вашей информацией готов']")))
-            except WebDriverException:
-                return False
-            return True
+    return sorted(matched, key=lambda page: -signatures[page]['priority'])
 
-        case _:
-            return False
+@print_function_name
+def check_page(driver: WebDriver, page: str, timeout: float = WAIT_TIMEOUT) -> str | bool:
+    """
+    Проверяет, открыта ли страница page (с ожиданием появления ее признака до timeout)
+    """
+    return page in classify_page(driver, [page], timeout)
 
 @print_function_name
 def load_allowed_pages():
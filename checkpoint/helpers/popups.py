@@ -2,10 +2,11 @@ from typing import Optional
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
 
 from checkpoint import globals as gb
 from checkpoint.helpers.utils import print_function_name
+from checkpoint.objects.events import PageEventBus
 
 
 @print_function_name
@@ -95,6 +96,18 @@ def check_popup(driver: WebDriver, popup_type: str) -> bool:
     Returns:
         bool: True если найден указанный popup, False в противном случае
     """
+    events = PageEventBus.for_driver(driver)
+    if popup_type in events.watches:
+        # Popup отслеживается в браузере - одна выборка событий вместо поиска по DOM
+        try:
+            events.poll()
+            if events.present(popup_type):
+                gb.rc.print(f"⚠️ Обнаружен диалог: {events.text(popup_type)}", style="yellow")
+                return True
+            return False
+        except WebDriverException:
+            pass
+
     try:
         if popup_type == "session_timeout":
             # Пробуем найти элемент с точным текстом "Время сеанса истекло"
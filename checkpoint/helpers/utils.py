@@ -20,20 +20,22 @@ from checkpoint import version as current_version
 from selenium.webdriver.chrome.webdriver import WebDriver
 
 from checkpoint.objects.driver import DriverManager
+from checkpoint.objects.scheduler import scheduler
 
 
-def get_driver_manager(is_headless: bool) -> DriverManager:
+def get_driver_manager(is_headless: bool, page_log: bool = False) -> DriverManager:
     """
     Creates and returns a configured WebDriver instance for browser automation.
 
     Args:
         is_headless (bool): If True, runs browser in headless mode without GUI.
                            If False, runs browser with visible GUI.
+        page_log (bool): If True, browser Page events (downloads) are available via get_log('performance').
 
     Returns:
         WebDriver: Configured Selenium WebDriver instance ready for automation.
     """
-    return DriverManager(is_headless=is_headless)
+    return DriverManager(is_headless=is_headless, page_log=page_log)
 
 def print_function_name(func):
     """
@@ -255,13 +257,17 @@ def get_temp_path(filename: str) -> Path:
     return temp_dir / filename
 
 
-def sleep(duration, description="Пауза"):
+def sleep(duration, description="Пауза", channels: Iterable[str] = ()) -> bool:
     """
     Sleep wrapper with console logging
     
     Args:
         duration (float): Duration in seconds
         description (str): Description of the pause
+        channels: Scheduler channels whose signal ends the pause early (new work for a background task)
+
+    Returns:
+        bool: True if the pause was interrupted by a signal or scheduler shutdown
     """
     if duration >= 3600:  # 1 час и больше
         hours = int(duration // 3600)
@@ -277,7 +283,11 @@ def sleep(duration, description="Пауза"):
     
     start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     gb.rc.print(f"⏳ [{start_time}] Начало паузы: {description} ({duration_str})", style="yellow")
-    time.sleep(duration)
+    interrupted = scheduler.wait(duration, *channels)
     end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    gb.rc.print(f"✅ [{end_time}] Пауза завершена", style="green")
+    if interrupted:
+        gb.rc.print(f"⏩ [{end_time}] Пауза прервана", style="green")
+    else:
+        gb.rc.print(f"✅ [{end_time}] Пауза завершена", style="green")
+    return interrupted
 
@@ -0,0 +1,14 @@
+"""
+Конфигурация скачивания архивов резервной копии
+"""
+
+# Прямое скачивание частей архива по HTTP (httpx, HTTP/2) с cookies сеанса браузера
+direct = {
+    'enabled': True,               # False - части скачивает браузер по клику на кнопки
+    'concurrency': 3,              # Сколько частей скачивается одновременно (и размер пула соединений)
+    'connect_timeout': 30,         # Ожидание соединения (сек)
+    'read_timeout': 300,           # Ожидание данных от сервера (сек)
+    'retry_delay': 30,             # Пауза перед повторной попыткой части (умножается на номер попытки)
+    'temp_suffix': '.part',        # Суффикс недокачанной части (ArchiveManager забирает только *.zip)
+    'verify_zip': True,            # Проверять CRC всех файлов архива после скачивания
+}
@@ -10,9 +10,30 @@ path = {
     'stats_logs_dir': "stats_logs",
 }
 
+# Конфигурация движка хеширования файлов
+hashing = {
+    'algorithm': 'md5',                        # Алгоритм по умолчанию: md5, sha1, sha256, blake2b
+    'workers': 8,                              # Количество потоков хеширования
+    'buffer_size': 1024 * 1024,                # Размер буфера чтения на поток (1 МБ)
+    'max_inflight_bytes': 512 * 1024 * 1024,   # Сколько байт файлов может хешироваться одновременно
+    'partial_chunk_size': 64 * 1024,           # Размер начала и конца файла для частичного хеша при поиске дубликатов
+}
+
+# Конфигурация индекса перцептивных хешей (поиск похожих изображений)
+perceptual = {
+    'algorithm': 'phash',      # Алгоритм перцептивного хеша: phash, dhash, ahash
+    'hash_size': 8,            # Размер хеша (8 -> 64 бита)
+    'max_distance': 6,         # Максимальное расстояние Хэмминга для похожих изображений
+    'workers': 8,              # Количество потоков декодирования изображений
+    'batch_size': 1000,        # Сколько изображений отдавать пулу за раз
+    'extensions': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'],
+    'stats_report': True,      # Искать в ежедневной статистике изображения, похожие на новые файлы
+}
+
 files = {
     'verification_code_file': "verification_code.json",
     'allowed_pages_file': "allowed_pages.json",
+    'perceptual_index_file': "perceptual_index.jsonl",
 }
 
 # Конфигурация для CleanupManager
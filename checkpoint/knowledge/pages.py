@@ -9,4 +9,67 @@ allowed_pages = [
     'creation_backup_is_processing',
     'login',
     'download_ready'
-]
\ No newline at end of file
+]
+# Элементы страницы, появление и исчезновение которых отслеживает PageEventBus (название события: XPath)
+events = {
+    'popup': "//*[text()='Вы временно заблокированы' or text()='Мы удалили вашу публикацию' or text()='Что произошло']",
+    'offline': "//*[text()='Вы офлайн.']",
+    'page_unavailable': "//*[text()='Страница сейчас недоступна']",
+    'session_timeout': "//*[contains(text(), 'Время сеанса истекло')]",
+    'add_dialogs': "//*[text()='Добавить в альбом']",
+}
+
+# Языки интерфейса, тексты которых распознаются
+locales = ['ru', 'en']
+
+# Признаки страниц. Страница распознается по любому из признаков:
+#   texts - точный текст элемента (по языкам), aria_labels - aria-label элемента (по языкам),
+#   selectors - CSS селекторы, urls - подстроки адреса страницы.
+# priority - порядок страниц в результате, если распознано несколько (больше - раньше)
+signatures = {
+    'captcha': {
+        'texts': {'ru': ['Введите символы, которые вы видите'], 'en': ['Enter the characters you see']},
+        'priority': 90,
+    },
+    'two_step_verification': {
+        'texts': {
+            'ru': ['Проверьте уведомления на другом устройстве', 'Проверьте сообщения WhatsApp'],
+            'en': ['Check your notifications on another device', 'Check your WhatsApp messages'],
+        },
+        'urls': ['two_step_verification'],
+        'priority': 80,
+    },
+    'add_trusted_device': {
+        'texts': {'ru': ['Проверьте уведомления на другом устройстве'], 'en': ['Check your notifications on another device']},
+        'priority': 70,
+    },
+    'login': {
+        'texts': {'ru': ['Недавние входы', 'Войти на Facebook'], 'en': ['Recent logins', 'Log in to Facebook', 'Log into Facebook']},
+        'selectors': ["[name='login']"],
+        'priority': 60,
+    },
+    'disabled_account': {
+        'texts': {'ru': ['Мы отключили ваш аккаунт'], 'en': ['We suspended your account']},
+        'priority': 50,
+    },
+    'download_ready': {
+        'texts': {'ru': ['Файл с вашей информацией готов'], 'en': ['Your information file is ready']},
+        'priority': 40,
+    },
+    'creation_backup_is_processing': {
+        'texts': {'ru': ['Мы создаем файл с вашей информацией'], 'en': ["We're creating a file with your information"]},
+        'priority': 30,
+    },
+    'download_account': {
+        'texts': {'ru': ['Скачать информацию'], 'en': ['Download your information']},
+        'priority': 20,
+    },
+    'authorized': {
+        'aria_labels': {'ru': ['Управление аккаунтом и его настройки'], 'en': ['Account controls and settings']},
+        'priority': 10,
+    },
+    'index': {
+        'aria_labels': {'ru': ['Ваш профиль'], 'en': ['Your profile']},
+        'priority': 10,
+    },
+}
@@ -21,9 +21,11 @@ auth = {
 # Download and backup pauses
 download = {
     'button_click': 5,         # Пауза после клика по кнопке
-    'download_start': 2,       # Ожидание начала скачивания
+    'download_start': 120,     # Максимальное ожидание начала скачивания после клика по кнопке
     'backup_processing': 36000,  # Ожидание обработки бэкапа (10 часов)
-    'post_download': 93600,    # 26 часов после завершения скачиваний (93600 секунд)
+    'post_download': 93600,    # Максимальное ожидание завершения всех скачиваний (26 часов)
+    'progress_poll': 5,        # Период проверки событий скачивания и папки скачивания
+    'stall_timeout': 1800,     # Скачивание не продвигается столько секунд - часть скачивается заново
 }
 
 # Archive monitoring pauses
@@ -31,6 +33,7 @@ archive = {
     'file_stability_check': 2,  # Проверка стабильности размера файла
     'monitor_cycle': 600,        # Пауза между циклами мониторинга ZIP файлов
     'error_recovery': 100,      # Увеличенная пауза при ошибке в мониторинге
+    'watch_interval': 5,        # Проверка появления новых ZIP файлов (новый файл прерывает паузу между циклами)
 }
 
 # Media processing pauses
@@ -38,6 +41,7 @@ media = {
     'folder_scan': 560,          # Пауза между сканированием папок медиа
     'processing_cycle': 6,      # Пауза между обработкой отдельных папок
     'error_recovery': 100,       # Пауза при ошибке в обработке медиа
+    'watch_interval': 5,         # Проверка появления новых папок медиа (новая папка прерывает паузу между циклами)
 }
 
 # Upload and connection pauses
@@ -60,6 +64,9 @@ cleanup = {
 # Throttling function delays (used in sleep_throttling)
 throttling = {
     'base_delay': 1,           # Базовая задержка в функции sleep_throttling
+    'max_delay': 900,          # Максимальная пауза после повторяющихся ошибок (15 минут)
+    'jitter': 0.5,             # Случайное отклонение паузы (доля от паузы), чтобы браузеры не возобновлялись одновременно
+    'block_delay': 600,        # Минимальная пауза после "Вы временно заблокированы"
 }
 
 # WebDriverWait timeout values (in seconds)
@@ -73,3 +80,32 @@ webdriver_wait = {
     'long_wait': 1000,         # Длительное ожидание (капча, верификация)
     'verification_wait': 36000, # Ожидание верификации (10 часов)
 }
+
+# Browser-side page events
+events = {
+    'poll_interval': 0.5,      # Период выборки событий страницы одним вызовом execute_script
+    'alert_poll_interval': 0.2,  # Период выборки, пока нет соединения или страница недоступна
+    'page_unavailable_refresh': 100,  # Пауза перед обновлением страницы "Страница сейчас недоступна"
+    'mutation_debounce': 50,   # Задержка (мс) пересчета элементов после изменений DOM в браузере
+    'add_dialogs_appear': 300,  # Максимальное ожидание первых диалогов "Добавить в альбом" после прикрепления пачки
+    'add_dialogs_change': 10,  # Максимальное ожидание изменения количества диалогов после публикации фото
+}
+
+# Incremental page scrolling (scroll_to_end)
+scroll = {
+    'growth_timeout': 10,      # Максимальное ожидание подгрузки после прокрутки до низа страницы
+    'network_idle': 0.5,       # Нет новых сетевых запросов столько секунд - подгрузка завершена
+    'check_interval': 100,     # Период проверки высоты страницы и сетевых запросов в браузере (мс)
+}
+
+# Disabled module page states: next page check after the state is handled (seconds).
+# 0 - page is checked again right away without refresh; otherwise page is refreshed when the deadline expires
+disabled_states = {
+    'disabled_account': 0,       # После клика "Скачать информацию" страница уже сменилась - проверка сразу
+    'download_account': 0,       # После клика "Запросить файл" - проверка сразу
+    'creation_backup_is_processing': download['backup_processing'],  # Бэкап обрабатывается ~10 часов
+    'login': 0,                  # После входа - проверка сразу
+    'download_ready': 600,       # После отправки файлов на скачивание
+    'unknown': 1800,             # Страница не распознана
+    'repeat': 60,                # Состояние не сменилось после действия - следующая проверка не раньше
+}
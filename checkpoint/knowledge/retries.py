@@ -6,3 +6,8 @@
 auth = {
     'max_verification_attempts': 30,  # Максимальное количество попыток ввода кода верификации
 }
+
+# Скачивание архивов
+download = {
+    'max_part_attempts': 3,  # Максимальное количество попыток скачивания одной части
+}
@@ -0,0 +1,56 @@
+"""
+Конфигурация загрузки файлов в альбомы
+"""
+
+# Адаптивный размер пачки файлов (AIMD)
+batching = {
+    'min_size': 1,                 # Минимальный размер пачки
+    'max_size': 100,               # Максимальный размер пачки
+    'increase_step': 2,            # Аддитивное увеличение после успешной пачки
+    'decrease_factor': 0.5,        # Мультипликативное уменьшение при перегрузке
+    'slow_publication': 60,        # Ожидание "Публикация" дольше этого (сек) - признак перегрузки
+    'popup_limit': 2,              # Больше попапов за пачку - признак перегрузки
+    'stall_limit': 5,              # Больше проверок без закрытых диалогов за пачку - признак перегрузки
+    'dialog_slowdown': 1.5,        # Среднее время диалога выше средней по прошлым пачкам во столько раз - признак перегрузки
+    'smoothing': 0.3,              # Коэффициент сглаживания средних по пачкам
+}
+
+# Параллельная загрузка в нескольких браузерах
+workers = {
+    'count': 1,                    # Количество браузеров (1 - загрузка в одном браузере, как раньше)
+    'max_concurrent': 2,           # Сколько пачек может загружаться одновременно во всех браузерах
+    'profiles_dir': 'profiles',    # Папка профилей Chrome для браузеров пула
+}
+
+# Уменьшение изображений перед загрузкой (Facebook все равно уменьшает фото до 2048 px по большей стороне)
+optimize = {
+    'max_edge': 2048,              # Максимальный размер большей стороны (px)
+    'quality': 85,                 # Качество JPEG при пересжатии
+    'workers': 4,                  # Количество потоков пересжатия
+    'cache_dir': 'optimized',      # Папка кэша уменьшенных изображений (имя файла - хеш содержимого оригинала)
+    'formats': ['JPEG', 'WEBP'],   # Форматы, которые пересжимаются в JPEG (PNG/GIF с прозрачностью и анимацией не трогаются)
+    'min_saving': 0.1,             # Уменьшенный файл используется, только если он меньше оригинала хотя бы на эту долю
+}
+
+# Темп действий на Facebook (общий для всех браузеров): token bucket, безопасный темп подбирается по блокировкам
+rate = {
+    'initial_rate': 30,            # Начальный темп (действий в минуту)
+    'min_rate': 1,                 # Минимальный темп
+    'max_rate': 120,               # Максимальный темп
+    'burst': 5,                    # Сколько действий можно выполнить подряд без ожидания
+    'increase_step': 0.2,          # Увеличение темпа после успешного действия (действий в минуту)
+    'block_factor': 0.5,           # Во сколько раз снижается темп после "Вы временно заблокированы"
+    'ceiling_margin': 0.9,         # Темп не поднимается выше этой доли от темпа, при котором была блокировка
+    'ceiling_recovery': 0.05,      # Насколько поднимается потолок темпа после успешного действия (действий в минуту)
+    'state_file': 'rate_state.json',  # Файл состояния между запусками
+}
+
+# Отслеживание запросов загрузки и публикации по событиям Network (Chrome DevTools Protocol, лог performance)
+network = {
+    'upload_urls': ['upload.facebook.com', '/photo/upload'],  # Запросы загрузки файла на сервер
+    'publish_urls': ['/api/graphql/'],                        # Запросы публикации (POST)
+    'publish_markers': ['Mutation'],                          # В теле запроса публикации (fb_api_req_friendly_name)
+    'publish_timeout': 120,        # Ожидание ответа на публикацию, после чего - ожидание по тексту "Публикация"
+    'poll_interval': 0.2,          # Период выборки событий из лога
+    'history': 1000,               # Сколько завершенных запросов хранится
+}
@@ -1,22 +1,26 @@
+import time
 from pathlib import Path
+from typing import Dict
 
-from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 
 from checkpoint import globals as gb
 from checkpoint import config
-from checkpoint.helpers.pages import check_page, load_allowed_pages, save_allowed_pages, get_page_title, check_browser_error
+from checkpoint.helpers.pages import classify_page, load_allowed_pages, save_allowed_pages, get_page_title, check_browser_error, WAIT_TIMEOUT
 from checkpoint.helpers.email import *
 from checkpoint.helpers.popups import check_popup
 from checkpoint.helpers.utils import sleep
-from checkpoint.knowledge import fs, pauses
+from checkpoint.knowledge import fs, pauses, retries
+from checkpoint.knowledge.download import direct as direct_config
 from checkpoint.knowledge.pages import urls
 from checkpoint.modules import login
 from checkpoint.objects.archive import ArchiveManager
 from checkpoint.objects.media import MediaManager
 from checkpoint.objects.stats import PhotoStatsManager
 from checkpoint.objects.cleanup import CleanupManager
+from checkpoint.objects.downloads import DirectDownloader, DownloadTracker, throughput
+from checkpoint.objects.scheduler import scheduler
 
 # Глобальные переменные для менеджеров
 archive_manager = None
@@ -27,60 +31,170 @@ cleanup_manager = None
 
 
 
-def handle_download_ready(driver: WebDriver, download_folder: Path) -> None:
+DOWNLOAD_BUTTONS_XPATH = "//*[contains(text(), 'Скачать') and contains(text(), 'файлов из')]"
+
+# Адрес части: ссылка, в которую вложена кнопка скачивания или которая вложена в кнопку
+DOWNLOAD_LINKS_SCRIPT = """
+const nodes = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+const links = [];
+for (let i = 0; i < nodes.snapshotLength; i++) {
+    const node = nodes.snapshotItem(i);
+    const link = node.closest('a[href]') || node.querySelector('a[href]');
+    links.push([node.innerText.trim(), link ? link.href : null]);
+}
+return links;
+"""
+
+
+def find_download_urls(driver: WebDriver) -> Dict[str, str]:
+    """
+    Адреса частей архива на странице готовых файлов
+
+    Returns:
+        Dict[str, str]: {текст кнопки: url} для кнопок, у которых есть ссылка
+    """
+    return {text: url for text, url in driver.execute_script(DOWNLOAD_LINKS_SCRIPT, DOWNLOAD_BUTTONS_XPATH) if url}
+
+
+async def download_direct(driver: WebDriver, download_folder: Path, urls: Dict[str, str]) -> Dict[str, dict]:
+    """
+    Скачивает части архива напрямую по HTTP с cookies сеанса браузера
+
+    Args:
+        driver: WebDriver instance
+        download_folder: Путь к папке для скачивания
+        urls: {текст кнопки: url}
+
+    Returns:
+        Dict[str, dict]: Состояние частей {текст кнопки: состояние}
+    """
+    gb.rc.print(f"📥 Прямое скачивание частей: {len(urls)}, одновременно: {direct_config['concurrency']}", style="cyan")
+    downloader = DirectDownloader(download_folder, driver.get_cookies(), driver.execute_script("return navigator.userAgent"))
+    parts = await downloader.download(urls)
+    for part in parts.values():
+        print_download_part(part)
+    return parts
+
+
+def click_download_button(driver: WebDriver, tracker: DownloadTracker, part: str, button) -> bool:
+    """
+    Нажимает кнопку скачивания части и дожидается начала скачивания
+
+    Args:
+        driver: WebDriver instance
+        tracker: Отслеживание скачиваний
+        part: Название части (текст кнопки)
+        button: Кнопка скачивания
+
+    Returns:
+        bool: True если скачивание началось
+    """
+    tracker.begin(part)
+    # Прокручиваем до кнопки и кликаем
+    driver.execute_script("arguments[0].scrollIntoView();", button)
+    sleep(pauses.download['button_click'], "Пауза после прокрутки к кнопке")
+    button.click()
+    return tracker.wait_started(part)
+
+
+def print_download_part(part: dict) -> None:
+    """
+    Выводит состояние части скачивания
+    """
+    if part['state'] == DownloadTracker.STATE_PROGRESS:
+        gb.rc.print(f"⬇️ {part['part']}: скачивание началось ({part['file']})", style="cyan")
+    elif part['state'] == DownloadTracker.STATE_COMPLETED:
+        seconds = part['finished'] - part['started']
+        speed = throughput(part) / 1024 / 1024
+        resumed = f", докачано с {part['resumed_from'] / 1024 / 1024:.1f} МБ" if part.get('resumed_from') else ""
+        gb.rc.print(f"✅ {part['part']}: {part['file']}, {part['received'] / 1024 / 1024:.1f} МБ за {seconds:.0f} сек "
+                    f"({speed:.2f} МБ/сек, попыток: {part['attempts']}{resumed})", style="green")
+    elif part['state'] == DownloadTracker.STATE_FAILED:
+        gb.rc.print(f"❌ {part['part']}: ошибка скачивания ({part['error']}, попытка {part['attempts']})", style="red")
+
+
+async def handle_download_ready(driver: WebDriver, download_folder: Path) -> None:
     """
     Обрабатывает страницу с готовыми для скачивания файлами
+
+    Каждая кнопка - отдельная часть архива. Части со ссылкой скачиваются напрямую по HTTP параллельно, с докачкой.
+    Остальные части (и части, которые не удалось скачать напрямую) скачивает браузер по клику на кнопку:
+    скачивание отслеживается по событиям браузера (или по файлам .crdownload в папке скачивания), ожидание
+    заканчивается, как только скачаны все части. Части с ошибкой скачиваются заново
+    (не больше retries.download['max_part_attempts'] попыток)
     
     Args:
         driver: WebDriver instance
         download_folder: Путь к папке для скачивания
     """
     # Поиск всех кнопок с текстом "Скачать * файлов из *"
-    try:
-        download_buttons = driver.find_elements(
-            By.XPATH, 
-            "//*[contains(text(), 'Скачать') and contains(text(), 'файлов из')]"
-        )
-        
-        if download_buttons:
-            gb.rc.print(f"🔍 Найдено {len(download_buttons)} кнопок для скачивания", style="yellow")
-            
-            for i, button in enumerate(download_buttons, 1):
-                try:
-                    button_text = button.text
-                    gb.rc.print(f"📥 Нажимаем кнопку {i}: {button_text}", style="cyan")
-                    
-                    # Настройка Chrome для скачивания в указанную папку
-                    driver.execute_cdp_cmd('Page.setDownloadBehavior', {
-                        'behavior': 'allow',
-                        'downloadPath': str(download_folder)
-                    })
-                    
-                    # Прокручиваем до кнопки и кликаем
-                    driver.execute_script("arguments[0].scrollIntoView();", button)
-                    sleep(pauses.download['button_click'], "Пауза после прокрутки к кнопке")
-                    button.click()
-                    sleep(pauses.download['button_click'], "Пауза после клика по кнопке")
-                    
-                    # Ждем начала скачивания
-                    sleep(pauses.download['download_start'], "Ожидание начала скачивания")
-                    gb.rc.print(f"✅ Кнопка {i} нажата, файл отправлен на скачивание", style="green")
-                    
-                except Exception as e:
-                    gb.rc.print(f"❌ Ошибка при нажатии кнопки {i}: {e}", style="red")
-                    continue
-
-            gb.rc.print(f"📊 Всего отправлено на скачивание: {len(download_buttons)} файлов", style="blue")
-
-            # Отправляем уведомление на email
-            send_download_completion_notification(config.NOTIFY_EMAIL, len(download_buttons))
-
-            gb.rc.print("⏳ Ожидаем завершения всех скачиваний...", style="yellow")
-            sleep(pauses.download['post_download'], "Пауза после завершения скачиваний")
-            gb.rc.print("⏰ Пауза завершена, продолжаем работу", style="green")
-
-    except NoSuchElementException:
-        pass
+    download_buttons = driver.find_elements(By.XPATH, DOWNLOAD_BUTTONS_XPATH)
+    if not download_buttons:
+        return
+
+    gb.rc.print(f"🔍 Найдено {len(download_buttons)} кнопок для скачивания", style="yellow")
+
+    direct_parts = {}
+    if direct_config['enabled']:
+        part_urls = find_download_urls(driver)
+        if part_urls:
+            direct_parts = await download_direct(driver, download_folder, part_urls)
+    downloaded = {name for name, part in direct_parts.items() if part['state'] == DownloadTracker.STATE_COMPLETED}
+    if direct_parts:
+        # Прямое скачивание могло идти часами - кнопки ищутся заново, браузер скачивает только оставшиеся части
+        download_buttons = [button for button in driver.find_elements(By.XPATH, DOWNLOAD_BUTTONS_XPATH) if button.text not in downloaded]
+
+    # Настройка Chrome для скачивания в указанную папку
+    tracker = DownloadTracker(driver, download_folder)
+    tracker.enable()
+    if not tracker.events_available:
+        gb.rc.print("⚠️ События скачивания недоступны, скачивание отслеживается по папке", style="yellow")
+
+    for i, button in enumerate(download_buttons, 1):
+        part = button.text
+        try:
+            gb.rc.print(f"📥 Нажимаем кнопку {i}: {part}", style="cyan")
+            click_download_button(driver, tracker, part, button)
+        except Exception as e:
+            gb.rc.print(f"❌ Ошибка при нажатии кнопки {i}: {e}", style="red")
+        print_download_part(tracker.parts[part])
+
+    gb.rc.print("⏳ Ожидаем завершения всех скачиваний...", style="yellow")
+    deadline = time.monotonic() + pauses.download['post_download']
+    while time.monotonic() < deadline:
+        for part in tracker.poll():
+            print_download_part(part)
+
+        retry = [part for part in tracker.failed() if part['attempts'] < retries.download['max_part_attempts']]
+        if not retry and not tracker.pending():
+            break
+
+        for part in retry:
+            # Страница могла обновиться - кнопка части ищется заново по тексту
+            button = next((b for b in driver.find_elements(By.XPATH, DOWNLOAD_BUTTONS_XPATH) if b.text == part['part']), None)
+            if button is None:
+                gb.rc.print(f"❌ {part['part']}: кнопка не найдена, повтор невозможен", style="red")
+                part['attempts'] = retries.download['max_part_attempts']
+                continue
+            gb.rc.print(f"🔄 {part['part']}: повторное скачивание", style="yellow")
+            try:
+                click_download_button(driver, tracker, part['part'], button)
+            except Exception as e:
+                gb.rc.print(f"❌ Ошибка при нажатии кнопки {part['part']}: {e}", style="red")
+            print_download_part(part)
+
+        if scheduler.wait(pauses.download['progress_poll'], tracker.task_name) and scheduler.stopped:
+            break
+
+    stats = tracker.stats()
+    stats['completed'] += len(downloaded)
+    stats['parts'] += len(downloaded)
+    stats['bytes'] += sum(direct_parts[name]['received'] for name in downloaded)
+    gb.rc.print(f"📊 Скачано частей: {stats['completed']} из {stats['parts']} ({stats['bytes'] / 1024 / 1024:.1f} МБ), "
+                f"с ошибкой: {stats['failed']}, не завершено: {stats['pending']}, отменено поздних скачиваний: {stats['rejected']}", style="blue")
+
+    # Отправляем уведомление на email
+    send_download_completion_notification(config.NOTIFY_EMAIL, stats['completed'])
 
 
 async def run(driver: WebDriver = None, download_path: str = None, root_folder: str = None):
@@ -138,56 +252,73 @@ async def run(driver: WebDriver = None, download_path: str = None, root_folder:
     # Загружаем allowed_pages из JSON файла или используем значения по умолчанию
     allowed_pages = set(load_allowed_pages())
 
+    state = None
+    page_loads = 0
+    deadline = time.monotonic()
+
     try:
         while True:
+            # Ожидание до дедлайна текущего состояния; страница обновляется только по истечении дедлайна
+            wait = deadline - time.monotonic()
+            if wait > 0:
+                sleep(wait, f"Следующая проверка страницы ({state})")
+                driver.refresh()
+                page_loads += 1
 
-            if 'disabled_account' in allowed_pages and check_page(driver, 'disabled_account'):
-                get_page_title(driver)
-                button = driver.find_element(By.XPATH, "//*[text()='Скачать информацию']")
-                if button:
-                    button.click()
+            # Проверка на истечение времени сеанса
+            if check_popup(driver, "session_timeout"):
+                gb.rc.print("🏠 Переходим на главную страницу из-за истечения сеанса", style="cyan")
+                driver.get(urls["home"])
+                page_loads += 1
+                continue
 
-            if 'download_account' in allowed_pages and check_page(driver, 'download_account'):
+            # Проверка на ошибку браузера
+            if check_browser_error(driver):
+                gb.rc.print("🏠 Переходим на главную страницу из-за ошибки браузера", style="cyan")
+                driver.get(urls["home"])
+                page_loads += 1
+                continue
+
+            # Все разрешенные страницы проверяются одним вызовом, состояние - страница с наибольшим priority
+            page = classify_page(driver, allowed_pages, WAIT_TIMEOUT)
+            previous_state, state = state, (page[0] if page else 'unknown')
+
+            if state == 'disabled_account':
                 get_page_title(driver)
-                button = driver.find_element(By.XPATH, "//*[text()='Запросить файл']")
-                if button:
-                    button.click()
-                    allowed_pages.add('download_ready')
-                    save_allowed_pages(list(allowed_pages))
+                driver.find_element(By.XPATH, "//*[text()='Скачать информацию']").click()
 
-            if 'creation_backup_is_processing' in allowed_pages and check_page(driver, 'creation_backup_is_processing'):
+            elif state == 'download_account':
                 get_page_title(driver)
-                sleep(pauses.download['backup_processing'], "Ожидание обработки бэкапа")
+                driver.find_element(By.XPATH, "//*[text()='Запросить файл']").click()
+                allowed_pages.add('download_ready')
+                save_allowed_pages(list(allowed_pages))
 
-            if 'login' in allowed_pages and check_page(driver, 'login'):
+            elif state == 'login':
                 get_page_title(driver)
                 await login.check_and_login(driver)
 
-            if 'download_ready' in allowed_pages and check_page(driver, 'download_ready'):
+            elif state == 'download_ready':
                 get_page_title(driver)
-                handle_download_ready(driver, download_folder)
+                await handle_download_ready(driver, download_folder)
                 allowed_pages.discard('download_ready')
                 save_allowed_pages(list(allowed_pages))
 
-            # Проверка на истечение времени сеанса
-            if check_popup(driver, "session_timeout"):
-                gb.rc.print("🏠 Переходим на главную страницу из-за истечения сеанса", style="cyan")
-                driver.get(urls["home"])
-                continue
+            elif state == 'creation_backup_is_processing':
+                get_page_title(driver)
 
-            # Проверка на ошибку браузера
-            if check_browser_error(driver):
-                gb.rc.print("🏠 Переходим на главную страницу из-за ошибки браузера", style="cyan")
-                driver.get(urls["home"])
-                continue
+            delay = pauses.disabled_states.get(state, pauses.disabled_states['unknown'])
+            if delay == 0 and state == previous_state:
+                # Действие не сменило страницу - повтор не чаще pauses.disabled_states['repeat']
+                delay = pauses.disabled_states['repeat']
+            deadline = time.monotonic() + delay
 
-            driver.refresh()
-            
     except KeyboardInterrupt:
         gb.rc.print("⚠️ Получен сигнал прерывания, завершаем работу...", style="yellow")
     except Exception as e:
         gb.rc.print(f"❌ Критическая ошибка в модуле disabled: {e}", style="red")
     finally:
+        gb.rc.print(f"📊 Загрузок страницы: {page_loads}", style="blue")
+
         # Останавливаем мониторинг ZIP файлов при выходе
         if archive_manager:
             archive_manager.stop_monitor()
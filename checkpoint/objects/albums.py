@@ -0,0 +1,152 @@
+"""
+Реестр альбомов профиля
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class AlbumRegistry:
+    """
+    Локальный реестр альбомов
+
+    Обеспечивает:
+    - Хранение альбомов профиля в JSON файле: ID → название, количество объектов, когда альбом последний раз виден
+    - Поиск альбома по названию без открытия страницы альбомов (в том числе продолжений "название 2", "название 3")
+    - Обновление по результатам частичного просмотра страницы альбомов
+    - Учет добавленных файлов, чтобы количество объектов было актуальным без повторного просмотра
+    """
+
+    def __init__(self, registry_path: Path):
+        """
+        Инициализация реестра
+
+        Args:
+            registry_path: Путь к файлу реестра
+        """
+        self.registry_path = Path(registry_path)
+        self.albums: Dict[str, dict] = {}
+        self.complete = False
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """
+        Загружает реестр с диска
+
+        Returns:
+            int: Количество альбомов в реестре
+        """
+        self.albums = {}
+        self.complete = False
+        if not self.registry_path.exists():
+            return 0
+
+        try:
+            with open(self.registry_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.albums = data.get('albums', {})
+            self.complete = data.get('complete', False)
+        except (json.JSONDecodeError, OSError, AttributeError):
+            self.albums = {}
+            self.complete = False
+
+        return len(self.albums)
+
+    def save(self) -> None:
+        """
+        Сохраняет реестр на диск (через временный файл, чтобы реестр не повредился при аварийном завершении)
+        """
+        with self._lock:
+            self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.registry_path.with_suffix(self.registry_path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'complete': self.complete, 'albums': self.albums}, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.registry_path)
+
+    @staticmethod
+    def name_suffix(name: str, album_name: str) -> Optional[int]:
+        # "album_name" - 1, "album_name 15" - 15, "album_name xyz" - не подходит
+        if name == album_name:
+            return 1
+        if name and name.startswith(album_name + ' ') and name[len(album_name) + 1:].isdigit():
+            return int(name[len(album_name) + 1:])
+        return None
+
+    def find(self, album_name: str) -> Optional[Tuple[str, int]]:
+        """
+        Ищет альбом по названию. Если есть продолжения альбома ("название 2", ...), возвращается последнее
+
+        Args:
+            album_name: Название альбома
+
+        Returns:
+            Tuple[str, int]: (ID альбома, количество объектов) или None
+        """
+        found = None
+        found_suffix = 0
+        for album_id, album in self.albums.items():
+            suffix = self.name_suffix(album.get('name'), album_name)
+            if suffix is not None and suffix > found_suffix:
+                found = (album_id, album.get('count') or 0)
+                found_suffix = suffix
+        return found
+
+    def update(self, album_id, name: str = None, count: int = None) -> bool:
+        """
+        Добавляет или обновляет альбом
+
+        Args:
+            album_id: ID альбома
+            name: Название альбома
+            count: Количество объектов в альбоме
+
+        Returns:
+            bool: True если альбома не было в реестре
+        """
+        album_id = str(album_id)
+        with self._lock:
+            is_new = album_id not in self.albums
+            album = self.albums.setdefault(album_id, {'name': name, 'count': 0})
+            if name:
+                album['name'] = name
+            if count is not None:
+                album['count'] = count
+            album['last_seen'] = datetime.now().isoformat(timespec='seconds')
+        return is_new
+
+    def merge(self, albums: Iterable[dict]) -> int:
+        """
+        Обновляет реестр альбомами со страницы
+
+        Args:
+            albums: [{'id', 'name', 'count'}]
+
+        Returns:
+            int: Количество альбомов, которых не было в реестре
+        """
+        return sum(1 for album in albums if self.update(album['id'], album.get('name'), album.get('count')))
+
+    def add_items(self, album_id, count: int, name: str = None) -> None:
+        """
+        Учитывает файлы, добавленные в альбом
+
+        Args:
+            album_id: ID альбома
+            count: Количество добавленных файлов
+            name: Название альбома, если альбома нет в реестре
+        """
+        album_id = str(album_id)
+        with self._lock:
+            album = self.albums.setdefault(album_id, {'name': name, 'count': 0})
+            album['count'] = (album.get('count') or 0) + count
+            album['last_seen'] = datetime.now().isoformat(timespec='seconds')
+        self.save()
+
+    def mark_complete(self) -> None:
+        """
+        Отмечает, что реестр содержит все альбомы профиля (страница альбомов просмотрена до конца)
+        """
+        self.complete = True
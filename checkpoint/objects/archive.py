@@ -10,6 +10,8 @@ from checkpoint.knowledge import pauses
 from checkpoint.knowledge.fs import path as fs_path
 from checkpoint.helpers.utils import sleep
 from checkpoint.helpers.fs import get_unique_filename, merge_directories
+from checkpoint.objects.media import MediaManager
+from checkpoint.objects.scheduler import scheduler
 
 
 class ArchiveManager:
@@ -21,7 +23,10 @@ class ArchiveManager:
     - Извлечение архивов с разрешением конфликтов имен
     - Объединение директорий при конфликтах
     - Управление потоком мониторинга
+    - Пробуждение монитора сразу после появления нового ZIP файла и немедленную остановку
     """
+
+    task_name = "ArchiveManager"
     
     def __init__(self, download_path: Path):
         """
@@ -34,6 +39,8 @@ class ArchiveManager:
         self.to_delete_dir = download_path / fs_path['to_delete_dir']
         self.monitor_running = False
         self.monitor_thread = None
+        self.watch_timer = None
+        self.watched_files: Set[str] = set()
         self.processed_files: Set[str] = set()
 
     def extract_zip_archive(self, zip_path: Path) -> bool:
@@ -101,7 +108,7 @@ class ArchiveManager:
         Мониторит папку загрузок на наличие ZIP файлов и обрабатывает их
         """
         gb.rc.print(f"🔍 Запущен мониторинг ZIP файлов в: {self.download_path}", style="blue")
-        task_name = "ArchiveManager"
+        task_name = self.task_name
 
         while self.monitor_running:
             try:
@@ -109,7 +116,7 @@ class ArchiveManager:
                 if not gb.task_sync.can_run_task(task_name):
                     # Другой таск уже выполняется, пропускаем этот цикл
                     gb.rc.print(f"⏸️ ArchiveManager: ожидание завершения {gb.task_sync.get_current_running_task()}", style="yellow")
-                    sleep(pauses.archive['monitor_cycle'], "Пауза - ожидание освобождения таска")
+                    sleep(pauses.archive['monitor_cycle'], "Пауза - ожидание освобождения таска", (task_name,))
                     continue
 
                 # Устанавливаем себя как активный таск
@@ -131,6 +138,8 @@ class ArchiveManager:
                             # Файл стабилен, можно обрабатывать
                             if self.extract_zip_archive(zip_file):
                                 self.processed_files.add(zip_file.name)
+                                # В извлеченном архиве - новые папки медиа
+                                scheduler.signal(MediaManager.task_name)
                         else:
                             gb.rc.print(f"⏳ Файл {zip_file.name} еще загружается...", style="yellow")
 
@@ -140,20 +149,29 @@ class ArchiveManager:
                     gb.rc.print(f"⏸️ ArchiveManager: переход в паузу", style="cyan")
 
                 # Пауза между проверками
-                sleep(pauses.archive['monitor_cycle'], "Пауза между циклами мониторинга ZIP файлов")
+                sleep(pauses.archive['monitor_cycle'], "Пауза между циклами мониторинга ZIP файлов", (task_name,))
 
             except Exception as e:
                 gb.rc.print(f"❌ Ошибка в мониторе ZIP файлов: {e}", style="red")
                 # Освобождаем глобальную переменную при ошибке
                 if gb.task_sync.is_task_running(task_name):
                     gb.task_sync.set_current_running_task(None)
-                sleep(pauses.archive['error_recovery'], "Восстановление после ошибки в мониторинге")
+                sleep(pauses.archive['error_recovery'], "Восстановление после ошибки в мониторинге", (task_name,))
 
         # Освобождаем глобальную переменную при завершении работы
         if gb.task_sync.is_task_running(task_name):
             gb.task_sync.set_current_running_task(None)
 
         gb.rc.print("🛑 Мониторинг ZIP файлов остановлен", style="red")
+
+    def watch_zip_files(self) -> None:
+        """
+        Проверяет папку загрузок (на потоке планировщика): появился новый ZIP файл - монитор просыпается сразу
+        """
+        names = {zip_file.name for zip_file in self.download_path.glob("*.zip")}
+        if names - self.watched_files - self.processed_files:
+            scheduler.signal(self.task_name)
+        self.watched_files = names
     
     def start_monitor(self) -> None:
         """
@@ -161,12 +179,15 @@ class ArchiveManager:
         """
         if not self.monitor_running:
             self.monitor_running = True
+            # Сигнал остановки прошлого запуска не должен прервать первую паузу
+            scheduler.clear(self.task_name)
             self.monitor_thread = threading.Thread(
                 target=self.monitor_zip_files,
                 daemon=True,
                 name="ArchiveMonitorThread"
             )
             self.monitor_thread.start()
+            self.watch_timer = scheduler.every(pauses.archive['watch_interval'], self.watch_zip_files)
             gb.rc.print("🚀 Поток мониторинга ZIP файлов запущен", style="green")
     
     def stop_monitor(self) -> None:
@@ -175,6 +196,10 @@ class ArchiveManager:
         """
         if self.monitor_running:
             self.monitor_running = False
+            if self.watch_timer:
+                self.watch_timer.cancel()
+            # Прерываем паузу монитора, чтобы поток завершился сразу
+            scheduler.signal(self.task_name)
             if self.monitor_thread and self.monitor_thread.is_alive():
                 self.monitor_thread.join(timeout=10)
             gb.rc.print("🛑 Поток мониторинга ZIP файлов остановлен", style="red")
@@ -0,0 +1,158 @@
+"""
+Адаптивный размер пачки файлов при загрузке в альбом
+"""
+import time
+from typing import Dict, List, Optional
+
+from checkpoint.knowledge.upload import batching as batching_config
+
+
+class BatchSizeController:
+    """
+    Регулятор размера пачки файлов по схеме AIMD
+
+    Обеспечивает:
+    - Аддитивное увеличение пачки после каждой пачки без признаков перегрузки
+    - Мультипликативное уменьшение при откате пачки, таймаутах, попапах, зависании диалогов, долгой "Публикации"
+      или замедлении диалогов относительно прошлых пачек
+    - Учет времени диалогов "Добавить в альбом" и ожидания "Публикация" внутри пачки
+    - Историю пачек: размер, длительность, файлов/с, байт/с
+    """
+
+    def __init__(self, initial_size: int, min_size: int = None, max_size: int = None, adaptive: bool = True):
+        """
+        Инициализация регулятора
+
+        Args:
+            initial_size: Начальный размер пачки
+            min_size: Минимальный размер пачки
+            max_size: Максимальный размер пачки
+            adaptive: False - размер пачки не меняется (фиксированный --splitedsize)
+        """
+        self.min_size = min_size or batching_config['min_size']
+        self.max_size = max(max_size or batching_config['max_size'], self.min_size)
+        self.size = min(max(initial_size, self.min_size), self.max_size)
+        self.adaptive = adaptive
+        self.throughput: Optional[float] = None
+        self.dialog_time: Optional[float] = None
+        self.history: List[dict] = []
+        self._reset_batch()
+
+    def _reset_batch(self) -> None:
+        self._started = None
+        self._dialog_times: List[float] = []
+        self._publication_times: List[float] = []
+        self._popups = 0
+        self._timeouts = 0
+        self._stalls = 0
+
+    def next_size(self) -> int:
+        """
+        Returns:
+            int: Размер следующей пачки
+        """
+        return self.size
+
+    def start_batch(self) -> None:
+        """
+        Начало загрузки пачки (перед прикреплением файлов)
+        """
+        self._reset_batch()
+        self._started = time.monotonic()
+
+    def observe_dialog(self, seconds: float) -> None:
+        """
+        Время от появления диалога "Добавить в альбом" до его закрытия
+        """
+        self._dialog_times.append(seconds)
+
+    def observe_publication(self, seconds: float) -> None:
+        """
+        Время ожидания исчезновения "Публикация"
+        """
+        self._publication_times.append(seconds)
+
+    def observe_popup(self) -> None:
+        self._popups += 1
+
+    def observe_timeout(self) -> None:
+        self._timeouts += 1
+
+    def observe_stall(self) -> None:
+        """
+        Количество диалогов не изменилось между проверками
+        """
+        self._stalls += 1
+
+    def _congestion(self, success: bool, dialog_time: Optional[float]) -> Optional[str]:
+        if not success:
+            return 'rollback'
+        if self._timeouts:
+            return 'timeout'
+        if self._popups > batching_config['popup_limit']:
+            return 'popups'
+        if self._stalls > batching_config['stall_limit']:
+            return 'stalls'
+        if self._publication_times and max(self._publication_times) > batching_config['slow_publication']:
+            return 'slow publication'
+        if dialog_time and self.dialog_time and dialog_time > self.dialog_time * batching_config['dialog_slowdown']:
+            return 'slow dialogs'
+        return None
+
+    @staticmethod
+    def _smooth(average: Optional[float], value: float) -> float:
+        if average is None:
+            return value
+        alpha = batching_config['smoothing']
+        return alpha * value + (1 - alpha) * average
+
+    def finish_batch(self, success: bool, files_count: int, bytes_count: int) -> Dict:
+        """
+        Завершение пачки: пересчет размера следующей пачки
+
+        Args:
+            success: True если пачка сохранена, False если пачка откатывается
+            files_count: Количество файлов в пачке
+            bytes_count: Объем файлов в пачке
+
+        Returns:
+            Dict: Статистика пачки (size, next_size, seconds, files_per_second, bytes_per_second, reason, ...)
+        """
+        seconds = time.monotonic() - self._started if self._started else 0.0
+        files_per_second = files_count / seconds if success and seconds > 0 else 0.0
+        dialog_time = sum(self._dialog_times) / len(self._dialog_times) if self._dialog_times else None
+        reason = self._congestion(success, dialog_time)
+
+        if success:
+            self.throughput = self._smooth(self.throughput, files_per_second)
+            if dialog_time:
+                self.dialog_time = self._smooth(self.dialog_time, dialog_time)
+
+        size = self.size
+        if self.adaptive:
+            if reason:
+                self.size = max(self.min_size, int(self.size * batching_config['decrease_factor']))
+            else:
+                self.size = min(self.max_size, self.size + batching_config['increase_step'])
+
+        stats = {
+            'size': size,
+            'files': files_count,
+            'bytes': bytes_count,
+            'next_size': self.size,
+            'success': success,
+            'reason': reason,
+            'seconds': seconds,
+            'files_per_second': files_per_second,
+            'bytes_per_second': bytes_count / seconds if success and seconds > 0 else 0.0,
+            'dialogs': len(self._dialog_times),
+            'dialog_seconds': sum(self._dialog_times),
+            'publication_seconds': sum(self._publication_times),
+            'popups': self._popups,
+            'timeouts': self._timeouts,
+            'stalls': self._stalls,
+        }
+        self.history.append(stats)
+        self._reset_batch()
+
+        return stats
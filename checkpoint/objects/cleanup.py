@@ -7,6 +7,7 @@ from checkpoint import globals as gb
 from checkpoint.knowledge import pauses
 from checkpoint.knowledge.fs import path as fs_path, cleanup as cleanup_config
 from checkpoint.helpers.utils import sleep
+from checkpoint.objects.scheduler import scheduler
 
 
 class CleanupManager:
@@ -19,6 +20,8 @@ class CleanupManager:
     - Удаление папок по заданным паттернам
     - Управление потоком мониторинга
     """
+
+    task_name = "CleanupManager"
     
     def __init__(self, target_path: Path, file_patterns: List[str] = None, folder_patterns: List[str] = None):
         """
@@ -310,14 +313,14 @@ class CleanupManager:
             gb.rc.print(f"📋 Паттерны папок (по пути): {self.folder_path_patterns}", style="cyan")
         if self.subfolder_cleanup_rules:
             gb.rc.print(f"📋 Правила очистки подпапок: {self.subfolder_cleanup_rules}", style="cyan")
-        task_name = "CleanupManager"
+        task_name = self.task_name
         
         while self.monitor_running:
             try:
                 # Проверяем глобальную переменную синхронизации перед началом работы
                 if not gb.task_sync.can_run_task(task_name):
                     gb.rc.print(f"⏸️ CleanupManager: ожидание завершения {gb.task_sync.get_current_running_task()}", style="yellow")
-                    sleep(pauses.cleanup['monitor_cycle'], "Пауза - ожидание освобождения таска")
+                    sleep(pauses.cleanup['monitor_cycle'], "Пауза - ожидание освобождения таска", (task_name,))
                     continue
                 
                 # Устанавливаем себя как активный таск
@@ -351,14 +354,14 @@ class CleanupManager:
                     gb.rc.print(f"⏸️ CleanupManager: переход в паузу", style="cyan")
                 
                 # Пауза между проверками
-                sleep(pauses.cleanup['monitor_cycle'], "Пауза между циклами очистки")
+                sleep(pauses.cleanup['monitor_cycle'], "Пауза между циклами очистки", (task_name,))
                 
             except Exception as e:
                 gb.rc.print(f"❌ Ошибка в мониторе очистки: {e}", style="red")
                 # Освобождаем глобальную переменную при ошибке
                 if gb.task_sync.is_task_running(task_name):
                     gb.task_sync.set_current_running_task(None)
-                sleep(pauses.cleanup['error_recovery'], "Восстановление после ошибки в очистке")
+                sleep(pauses.cleanup['error_recovery'], "Восстановление после ошибки в очистке", (task_name,))
         
         # Освобождаем глобальную переменную при завершении работы
         if gb.task_sync.is_task_running(task_name):
@@ -372,6 +375,8 @@ class CleanupManager:
         """
         if not self.monitor_running:
             self.monitor_running = True
+            # Сигнал остановки прошлого запуска не должен прервать первую паузу
+            scheduler.clear(self.task_name)
             self.monitor_thread = threading.Thread(
                 target=self.monitor_cleanup,
                 daemon=True,
@@ -386,6 +391,8 @@ class CleanupManager:
         """
         if self.monitor_running:
             self.monitor_running = False
+            # Прерываем паузу монитора, чтобы поток завершился сразу
+            scheduler.signal(self.task_name)
             if self.monitor_thread and self.monitor_thread.is_alive():
                 self.monitor_thread.join(timeout=10)
             gb.rc.print("🛑 Поток мониторинга очистки остановлен", style="red")
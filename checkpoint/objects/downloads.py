@@ -0,0 +1,455 @@
+"""
+Скачивание частей архива: отслеживание скачиваний браузера (Chrome DevTools Protocol) и прямое скачивание по HTTP
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from urllib.parse import unquote, urlparse
+
+import httpx
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from checkpoint import globals as gb
+from checkpoint.helpers.fs import get_unique_filename
+from checkpoint.knowledge import pauses, retries
+from checkpoint.knowledge.download import direct as direct_config
+from checkpoint.objects.scheduler import scheduler
+
+TEMP_SUFFIX = '.crdownload'
+
+
+def throughput(part: dict) -> float:
+    """
+    Скорость скачивания части
+
+    Args:
+        part: Состояние части (received - скачано всего, downloaded - скачано в последней попытке, если часть докачивалась)
+
+    Returns:
+        float: Байт в секунду (0.0, если скачивание не завершено)
+    """
+    if not part.get('started') or not part.get('finished'):
+        return 0.0
+    return part.get('downloaded', part['received']) / max(part['finished'] - part['started'], 0.001)
+
+
+class DownloadTracker:
+    """
+    Отслеживание скачиваний браузера
+
+    Обеспечивает:
+    - Разрешение скачивания в заданную папку с событиями скачивания
+      (события читаются из лога performance, браузер запускается с page_log)
+    - Привязку скачивания к части (кнопке), после клика по которой оно началось: по времени события и клика.
+      Скачивание, начавшееся после того, как часть уже отмечена не начавшейся, отменяется - оно не приписывается
+      следующей части
+    - Запасной способ без событий: новые файлы и файлы .crdownload в папке скачивания
+    - Состояние, объем и скорость каждой части; отмененные, зависшие и не начавшиеся части отмечаются для повтора
+    - Ожидание через общий планировщик: остановка планировщика прерывает ожидание
+    """
+
+    task_name = "DownloadTracker"
+
+    STATE_WAITING = 'waiting'
+    STATE_PROGRESS = 'inProgress'
+    STATE_COMPLETED = 'completed'
+    STATE_FAILED = 'canceled'
+
+    def __init__(self, driver: WebDriver, download_folder: Path):
+        """
+        Инициализация
+
+        Args:
+            driver: WebDriver instance
+            download_folder: Папка скачивания
+        """
+        self.driver = driver
+        self.download_folder = Path(download_folder)
+        self.parts: Dict[str, dict] = {}
+        self.guids: Dict[str, str] = {}
+        self.clicks: List[tuple] = []
+        self.rejected: Set[str] = set()
+        self.events_available = True
+        self.events_seen = False
+
+    def enable(self) -> None:
+        """
+        Разрешает скачивание в папку и включает события скачивания. События, полученные раньше, отбрасываются
+        """
+        params = {'behavior': 'allow', 'downloadPath': str(self.download_folder)}
+        try:
+            self.driver.execute_cdp_cmd('Browser.setDownloadBehavior', {**params, 'eventsEnabled': True})
+        except WebDriverException:
+            self.driver.execute_cdp_cmd('Page.setDownloadBehavior', params)
+        self._read_events()
+
+    def _read_events(self) -> List[dict]:
+        if not self.events_available:
+            return []
+        try:
+            entries = self.driver.get_log('performance')
+        except WebDriverException:
+            # Браузер запущен без лога performance - остается только папка скачивания
+            self.events_available = False
+            return []
+
+        events = []
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+            if message.get('method', '').endswith(('.downloadWillBegin', '.downloadProgress')):
+                # Время записи события в лог (мс) - по нему скачивание сопоставляется с кликом
+                message['time'] = entry['timestamp'] / 1000 if entry.get('timestamp') else None
+                events.append(message)
+        return events
+
+    def _list_files(self) -> Dict[str, int]:
+        try:
+            return {path.name: path.stat().st_size for path in self.download_folder.iterdir() if path.is_file()}
+        except OSError:
+            return {}
+
+    def _waiting_part(self) -> Optional[dict]:
+        waiting = [part for part in self.parts.values() if part['state'] == self.STATE_WAITING]
+        return min(waiting, key=lambda part: part['clicked']) if waiting else None
+
+    def _clicked_part(self, event_time: float) -> Optional[dict]:
+        # Часть последнего клика перед событием; None - клик этой попытки уже отмечен не начавшимся или скачивание уже идет
+        clicks = [click for click in self.clicks if click[0] <= event_time]
+        if not clicks:
+            return None
+        _, part_name, attempt = clicks[-1]
+        part = self.parts[part_name]
+        return part if part['attempts'] == attempt and part['state'] == self.STATE_WAITING else None
+
+    def _reject(self, params: dict) -> None:
+        self.rejected.add(params.get('guid'))
+        gb.rc.print(f"⚠️ Скачивание {params.get('suggestedFilename')} началось после окончания ожидания части - отменяется", style="yellow")
+        try:
+            self.driver.execute_cdp_cmd('Browser.cancelDownload', {'guid': params.get('guid')})
+        except WebDriverException:
+            pass
+
+    def _start(self, part: dict, file_name: str, now: float, guid: str = None) -> None:
+        part.update(state=self.STATE_PROGRESS, file=file_name, guid=guid, started=now, updated=now)
+        if guid:
+            self.guids[guid] = part['part']
+
+    def _finish(self, part: dict, state: str, now: float, error: str = None) -> None:
+        part.update(state=state, finished=now, error=error)
+
+    @staticmethod
+    def _is_known(name: str, known: Set[str]) -> bool:
+        # Файл был в папке до клика (в том числе как .crdownload другой части)
+        return name in known or name + TEMP_SUFFIX in known or name.removesuffix(TEMP_SUFFIX) in known
+
+    def begin(self, part_name: str) -> dict:
+        """
+        Регистрирует часть перед кликом по ее кнопке (повторный вызов - новая попытка)
+
+        Args:
+            part_name: Название части (текст кнопки)
+
+        Returns:
+            dict: Состояние части
+        """
+        self.poll()
+        part = self.parts.setdefault(part_name, {'part': part_name, 'attempts': 0})
+        if part.get('guid'):
+            self.guids.pop(part['guid'], None)
+        part.update(
+            state=self.STATE_WAITING, file=None, guid=None, error=None, received=0, total=0,
+            clicked=time.time(), started=None, updated=time.time(), finished=None,
+            known=set(self._list_files()),
+        )
+        part['attempts'] += 1
+        self.clicks.append((part['clicked'], part_name, part['attempts']))
+        return part
+
+    def poll(self) -> List[dict]:
+        """
+        Обновляет состояние частей по событиям браузера и файлам в папке скачивания
+
+        Returns:
+            List[dict]: Части, которые начались, завершились или завершились ошибкой с прошлой проверки
+        """
+        now = time.time()
+        before = {name: part['state'] for name, part in self.parts.items()}
+
+        for message in self._read_events():
+            params = message.get('params', {})
+            guid = params.get('guid')
+            self.events_seen = True
+            if message['method'].endswith('.downloadWillBegin'):
+                part = self._clicked_part(message['time'] or now)
+                if part:
+                    self._start(part, params.get('suggestedFilename'), now, guid)
+                else:
+                    self._reject(params)
+                continue
+
+            part = self.parts.get(self.guids.get(guid))
+            if part is None or part['state'] != self.STATE_PROGRESS:
+                continue
+            received = params.get('receivedBytes', part['received'])
+            if received != part['received']:
+                part['updated'] = now
+            part['received'] = received
+            part['total'] = params.get('totalBytes') or part['total']
+            if params.get('state') == 'completed':
+                self._finish(part, self.STATE_COMPLETED, now)
+            elif params.get('state') == 'canceled':
+                self._finish(part, self.STATE_FAILED, now, 'canceled')
+
+        files = self._list_files()
+        # Начало скачивания по новым файлам - только если браузер не присылает события
+        for name in ([] if self.events_seen else files):
+            if name.startswith('Unconfirmed ') or any(part.get('file') in (name, name.removesuffix(TEMP_SUFFIX)) for part in self.parts.values()):
+                continue
+            part = self._waiting_part()
+            if part and not self._is_known(name, part['known']):
+                self._start(part, name.removesuffix(TEMP_SUFFIX), now)
+
+        for part in self.parts.values():
+            if part['state'] == self.STATE_PROGRESS and part['file']:
+                if part['file'] + TEMP_SUFFIX in files:
+                    size = files[part['file'] + TEMP_SUFFIX]
+                    if size > part['received']:
+                        part.update(received=size, updated=now)
+                elif part['file'] in files and part['file'] not in part['known']:
+                    # Без событий завершение видно по переименованию .crdownload в итоговый файл
+                    part['received'] = max(part['received'], files[part['file']])
+                    self._finish(part, self.STATE_COMPLETED, now)
+
+            if part['state'] == self.STATE_WAITING and now - part['clicked'] > pauses.download['download_start']:
+                self._finish(part, self.STATE_FAILED, now, 'not started')
+            elif part['state'] == self.STATE_PROGRESS and now - part['updated'] > pauses.download['stall_timeout']:
+                self._finish(part, self.STATE_FAILED, now, 'stalled')
+
+        return [part for name, part in self.parts.items() if before.get(name) != part['state']]
+
+    def wait_started(self, part_name: str, timeout: float = None) -> bool:
+        """
+        Дожидается начала скачивания части
+
+        Returns:
+            bool: True если скачивание началось, False по таймауту или при остановке планировщика
+        """
+        deadline = time.monotonic() + (pauses.download['download_start'] if timeout is None else timeout)
+        while True:
+            self.poll()
+            if self.parts[part_name]['state'] != self.STATE_WAITING:
+                return self.parts[part_name]['state'] != self.STATE_FAILED
+            if time.monotonic() >= deadline:
+                return False
+            if scheduler.wait(pauses.download['progress_poll'], self.task_name) and scheduler.stopped:
+                return False
+
+    def pending(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: Части, которые еще скачиваются или ждут начала
+        """
+        return [part for part in self.parts.values() if part['state'] in (self.STATE_WAITING, self.STATE_PROGRESS)]
+
+    def failed(self) -> List[dict]:
+        """
+        Returns:
+            List[dict]: Части, скачивание которых отменено, зависло или не началось
+        """
+        return [part for part in self.parts.values() if part['state'] == self.STATE_FAILED]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns:
+            Dict[str, int]: Количество частей по состояниям, объем скачанных файлов и количество отмененных поздних скачиваний
+        """
+        result = {'parts': len(self.parts), 'completed': 0, 'failed': 0, 'pending': 0, 'bytes': 0, 'rejected': len(self.rejected)}
+        for part in self.parts.values():
+            if part['state'] == self.STATE_COMPLETED:
+                result['completed'] += 1
+                result['bytes'] += part['received']
+            elif part['state'] == self.STATE_FAILED:
+                result['failed'] += 1
+            else:
+                result['pending'] += 1
+        return result
+
+
+class DirectDownloader:
+    """
+    Прямое скачивание частей архива по HTTP
+
+    Обеспечивает:
+    - Скачивание с cookies сеанса браузера через httpx (HTTP/2, общий пул соединений)
+    - Параллельное скачивание частей с ограничением количества одновременных загрузок
+    - Докачку части с места обрыва (Range, If-Range) - в следующей попытке и в следующий запуск
+    - Проверку размера и CRC файлов архива; часть, не прошедшая проверку, скачивается заново
+    - Запись готовой части в папку скачивания под итоговым именем, где ее забирает ArchiveManager
+    """
+
+    def __init__(self, download_folder: Path, cookies: List[dict], user_agent: str = None):
+        """
+        Инициализация
+
+        Args:
+            download_folder: Папка скачивания
+            cookies: Cookies сеанса (driver.get_cookies())
+            user_agent: User-Agent браузера
+        """
+        self.download_folder = Path(download_folder)
+        self.cookies = httpx.Cookies()
+        for cookie in cookies:
+            self.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+        self.headers = {'User-Agent': user_agent} if user_agent else {}
+        self.parts: Dict[str, dict] = {}
+
+    def _temp_path(self, part_name: str) -> Path:
+        name = re.sub(r'[^\w.-]+', '_', part_name).strip('_') or 'part'
+        return self.download_folder / f"{name}{direct_config['temp_suffix']}"
+
+    @staticmethod
+    def _meta_path(temp_path: Path) -> Path:
+        return temp_path.with_name(temp_path.name + '.json')
+
+    @staticmethod
+    def _file_name(response: httpx.Response, part_name: str) -> str:
+        disposition = response.headers.get('Content-Disposition', '')
+        match = re.search(r"filename\*=(?:UTF-8'')?([^;]+)", disposition) or re.search(r'filename="?([^";]+)"?', disposition)
+        if match:
+            return Path(unquote(match.group(1).strip())).name
+        name = Path(unquote(urlparse(str(response.url)).path)).name
+        return name if name.endswith('.zip') else re.sub(r'[^\w.-]+', '_', part_name).strip('_') + '.zip'
+
+    @staticmethod
+    def _test_zip(path: Path) -> Optional[str]:
+        # Имя первого поврежденного файла архива или None
+        with zipfile.ZipFile(path) as archive:
+            return archive.testzip()
+
+    async def _fetch(self, client: httpx.AsyncClient, part: dict) -> Path:
+        temp_path = self._temp_path(part['part'])
+        meta_path = self._meta_path(temp_path)
+        meta = {}
+        if temp_path.exists() and meta_path.exists():
+            try:
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            except (json.JSONDecodeError, OSError):
+                meta = {}
+
+        # Докачка только если сервер отдал валидатор: If-Range вернет весь файл, если часть на сервере изменилась
+        offset = temp_path.stat().st_size if meta.get('validator') else 0
+        headers = {'Range': f"bytes={offset}-", 'If-Range': meta['validator']} if offset else {}
+
+        async with client.stream('GET', part['url'], headers=headers) as response:
+            content_range = response.headers.get('Content-Range', '')
+            if offset and (response.status_code == 416 and offset != meta.get('total')
+                           or response.status_code == 206 and not content_range.startswith(f"bytes {offset}-")):
+                # Сервер не продолжает с места обрыва - часть скачивается заново
+                temp_path.unlink()
+                meta_path.unlink(missing_ok=True)
+                raise ValueError(f"докачка с {offset} невозможна (HTTP {response.status_code}, {content_range})")
+
+            if response.status_code == 416 and offset:
+                total = offset
+            else:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    offset = 0
+                total_match = re.search(r'/(\d+)$', content_range)
+                length = response.headers.get('Content-Length')
+                total = int(total_match.group(1)) if total_match else (offset + int(length) if length else None)
+
+                meta = {
+                    'name': self._file_name(response, part['part']),
+                    'validator': response.headers.get('ETag') or response.headers.get('Last-Modified'),
+                    'total': total,
+                }
+                meta_path.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+
+                part.update(total=total, received=offset, resumed_from=offset)
+                with open(temp_path, 'ab' if offset else 'wb') as f:
+                    async for chunk in response.aiter_bytes():
+                        f.write(chunk)
+                        part['received'] += len(chunk)
+                        part['downloaded'] += len(chunk)
+
+        size = temp_path.stat().st_size
+        if total is not None and size != total:
+            if size > total:
+                temp_path.unlink()
+            # Меньше - соединение оборвалось, следующая попытка докачает часть
+            raise ValueError(f"размер {size} вместо {total}")
+
+        if direct_config['verify_zip'] and meta['name'].endswith('.zip'):
+            try:
+                broken = await asyncio.to_thread(self._test_zip, temp_path)
+            except zipfile.BadZipFile:
+                broken = temp_path.name
+            if broken:
+                temp_path.unlink()
+                meta_path.unlink(missing_ok=True)
+                raise ValueError(f"ошибка CRC в архиве: {broken}")
+
+        target = get_unique_filename(self.download_folder / meta['name'])
+        os.replace(temp_path, target)
+        meta_path.unlink(missing_ok=True)
+        return target
+
+    async def _download_part(self, client: httpx.AsyncClient, semaphore: asyncio.Semaphore, part: dict) -> None:
+        async with semaphore:
+            for attempt in range(1, retries.download['max_part_attempts'] + 1):
+                part.update(attempts=attempt, started=time.time(), downloaded=0)
+                try:
+                    target = await self._fetch(client, part)
+                except (httpx.HTTPError, OSError, ValueError) as e:
+                    part['error'] = f"{type(e).__name__}: {e}"
+                    gb.rc.print(f"❌ {part['part']}: ошибка скачивания ({part['error']}, попытка {attempt})", style="red")
+                    if attempt < retries.download['max_part_attempts']:
+                        await asyncio.sleep(direct_config['retry_delay'] * attempt)
+                    continue
+
+                part.update(state=DownloadTracker.STATE_COMPLETED, file=target.name, finished=time.time(), error=None)
+                return
+
+            part.update(state=DownloadTracker.STATE_FAILED, finished=time.time())
+
+    async def download(self, urls: Dict[str, str]) -> Dict[str, dict]:
+        """
+        Скачивает части архива
+
+        Args:
+            urls: Адреса частей {название части: url}
+
+        Returns:
+            Dict[str, dict]: Состояние частей {название: {state, file, received, total, resumed_from, attempts, error, ...}}
+        """
+        self.download_folder.mkdir(parents=True, exist_ok=True)
+        for part_name, url in urls.items():
+            self.parts[part_name] = {
+                'part': part_name, 'url': url, 'state': DownloadTracker.STATE_PROGRESS, 'file': None, 'error': None,
+                'received': 0, 'downloaded': 0, 'total': None, 'resumed_from': 0, 'attempts': 0,
+                'started': None, 'finished': None,
+            }
+
+        concurrency = max(1, direct_config['concurrency'])
+        async with httpx.AsyncClient(
+            http2=True,
+            cookies=self.cookies,
+            headers=self.headers,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            timeout=httpx.Timeout(direct_config['read_timeout'], connect=direct_config['connect_timeout']),
+        ) as client:
+            semaphore = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(self._download_part(client, semaphore, part) for part in self.parts.values()))
+
+        return self.parts
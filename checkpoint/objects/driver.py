@@ -1,28 +1,44 @@
 import threading
+from pathlib import Path
+from typing import List
 
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium import webdriver
 
 
+def get_chrome_options(is_headless=False, profile_dir: Path = None, network_log=False, page_log=False) -> webdriver.ChromeOptions:
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_experimental_option("detach", True)
+    chrome_options.add_argument("--disable-infobars")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.default_content_setting_values.notifications": 2  # 1:allow, 2:block
+    })
+    if is_headless:
+        chrome_options.add_argument("--headless")
+    if profile_dir:
+        chrome_options.add_argument(f"--user-data-dir={Path(profile_dir).resolve()}")
+    if network_log:
+        # События Network (CDP) доступны через driver.get_log('performance')
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    elif page_log:
+        # Только события Page (в том числе скачивания) - без событий Network лог остается небольшим
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': False, 'enablePage': True})
+
+    return chrome_options
+
+
 class DriverManager():
-    def __init__(self, is_headless=False):
+    def __init__(self, is_headless=False, page_log=False):
         self.is_headless = is_headless
+        self.page_log = page_log
         self.driver = None
         self.threadLocal = threading.local()
 
     def get_driver(self) -> WebDriver:
         self.driver = getattr(self.threadLocal, 'driver', None)
         if self.driver is None:
-            chrome_options = webdriver.ChromeOptions()
-            chrome_options.add_experimental_option("detach", True)
-            chrome_options.add_argument("--disable-infobars")
-            chrome_options.add_experimental_option("prefs", {
-                "profile.default_content_setting_values.notifications": 2  # 1:allow, 2:block
-            })
-            if self.is_headless:
-                chrome_options.add_argument("--headless")
-
-            self.driver = webdriver.Chrome(options=chrome_options)
+            self.driver = webdriver.Chrome(options=get_chrome_options(self.is_headless, page_log=self.page_log))
             setattr(self.threadLocal, 'driver', self.driver)
 
         return self.driver
@@ -31,3 +47,54 @@ class DriverManager():
         if self.driver:
             self.driver.quit()
             self.driver = None
+
+
+class DriverPool():
+    """
+    Пул браузеров для параллельной работы
+
+    Обеспечивает:
+    - Запуск N экземпляров Chrome, у каждого свой профиль (--user-data-dir), чтобы сессии не мешали друг другу
+    - Закрытие всех браузеров пула
+    """
+
+    def __init__(self, size: int, profiles_path: Path, is_headless=False, network_log=False):
+        """
+        Инициализация пула
+
+        Args:
+            size: Количество браузеров
+            profiles_path: Папка, в которой создаются профили браузеров
+            is_headless: Запуск без графического интерфейса
+            network_log: Включить лог событий Network для отслеживания запросов
+        """
+        self.size = size
+        self.profiles_path = Path(profiles_path)
+        self.is_headless = is_headless
+        self.network_log = network_log
+        self.drivers: List[WebDriver] = []
+
+    def start(self) -> List[WebDriver]:
+        """
+        Запускает браузеры пула
+
+        Returns:
+            List[WebDriver]: Браузеры пула
+        """
+        while len(self.drivers) < self.size:
+            profile_dir = self.profiles_path / f"worker_{len(self.drivers)}"
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            self.drivers.append(webdriver.Chrome(options=get_chrome_options(self.is_headless, profile_dir, self.network_log)))
+
+        return self.drivers
+
+    def close(self) -> None:
+        """
+        Закрывает все браузеры пула
+        """
+        for driver in self.drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.drivers = []
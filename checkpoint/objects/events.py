@@ -0,0 +1,238 @@
+"""
+События страницы, собираемые в браузере
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from checkpoint.knowledge import pauses
+from checkpoint.knowledge.pages import events as page_events
+from checkpoint.objects.scheduler import scheduler
+
+
+# Устанавливается в страницу: MutationObserver пересчитывает видимые элементы каждого события
+# и складывает изменения количества в очередь. Возвращает накопленные события
+INSTALL_SCRIPT = """
+var watches = arguments[0];
+var debounce = arguments[1];
+var bus = window.__checkpointEvents;
+if (!bus) {
+    bus = {watches: watches, state: {}, queue: [], dropped: 0, scheduled: false};
+    bus.visible = function (node) {
+        return node.nodeType !== 1 || node.getClientRects().length > 0;
+    };
+    bus.check = function () {
+        bus.scheduled = false;
+        for (var name in bus.watches) {
+            var result = document.evaluate(bus.watches[name], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var count = 0;
+            var text = '';
+            for (var i = 0; i < result.snapshotLength; i++) {
+                var node = result.snapshotItem(i);
+                if (!bus.visible(node)) continue;
+                if (!count) text = (node.textContent || '').slice(0, 200);
+                count++;
+            }
+            var previous = bus.state[name] ? bus.state[name].count : 0;
+            if (count !== previous) {
+                bus.queue.push({name: name, count: count, previous: previous, text: text, time: Date.now()});
+                if (bus.queue.length > 1000) { bus.queue.shift(); bus.dropped++; }
+            }
+            bus.state[name] = {count: count, text: text};
+        }
+    };
+    bus.drain = function () {
+        var events = bus.queue;
+        bus.queue = [];
+        return {events: events, state: bus.state, dropped: bus.dropped};
+    };
+    new MutationObserver(function () {
+        if (!bus.scheduled) {
+            bus.scheduled = true;
+            setTimeout(bus.check, debounce);
+        }
+    }).observe(document.documentElement || document, {childList: true, subtree: true, characterData: true, attributes: true, attributeFilter: ['style', 'class', 'hidden', 'aria-hidden']});
+    window.__checkpointEvents = bus;
+}
+bus.watches = watches;
+bus.check();
+return bus.drain();
+"""
+
+DRAIN_SCRIPT = """
+var bus = window.__checkpointEvents;
+return bus ? bus.drain() : null;
+"""
+
+
+class PageEventBus:
+    """
+    Шина событий страницы
+
+    Обеспечивает:
+    - Отслеживание появления и исчезновения элементов (попапы, сообщения "Вы офлайн." и "Страница сейчас недоступна",
+      диалоги "Добавить в альбом") в самом браузере, через MutationObserver, без поиска элементов из Python
+    - Выборку всех накопленных событий одним вызовом execute_script
+    - Повторную установку наблюдателя после перехода на другую страницу
+    - Подписку на события по названию и текущее состояние (количество видимых элементов, текст первого)
+    - Ожидание события (wait): из любого потока, выборку может делать как сам ожидающий, так и Watcher
+    - Замер стоимости выборки (количество, среднее и максимальное время)
+    """
+
+    _buses: Dict[int, 'PageEventBus'] = {}
+    _buses_lock = threading.Lock()
+
+    def __init__(self, driver: WebDriver, watches: Dict[str, str] = None):
+        """
+        Инициализация шины
+
+        Args:
+            driver: WebDriver instance
+            watches: Отслеживаемые элементы {название события: XPath}
+        """
+        self.driver = driver
+        self.watches = dict(watches or page_events)
+        self.state: Dict[str, dict] = {}
+        self.subscribers: Dict[str, List[Callable[[dict], None]]] = {}
+        self.round_trips = 0
+        self.installs = 0
+        self.probes = 0
+        self.probe_seconds = 0.0
+        self.max_probe_seconds = 0.0
+        self.dropped = 0
+        self.changes: Dict[str, int] = {}
+        self.channel = f"page_events:{id(driver)}"
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_driver(cls, driver: WebDriver) -> 'PageEventBus':
+        """
+        Возвращает общую шину событий браузера (создает при первом обращении)
+        """
+        with cls._buses_lock:
+            bus = cls._buses.get(id(driver))
+            if bus is None or bus.driver is not driver:
+                bus = cls(driver)
+                cls._buses[id(driver)] = bus
+            return bus
+
+    def subscribe(self, name: str, callback: Callable[[dict], None]) -> None:
+        """
+        Подписка на событие
+
+        Args:
+            name: Название события из watches, '*' - все события
+            callback: Вызывается с событием {name, count, previous, text, time}
+        """
+        self.subscribers.setdefault(name, []).append(callback)
+
+    def poll(self) -> List[dict]:
+        """
+        Забирает накопленные в браузере события и передает их подписчикам
+
+        Returns:
+            List[dict]: События в порядке появления
+        """
+        with self._lock:
+            started = time.monotonic()
+            result = self.driver.execute_script(DRAIN_SCRIPT)
+            self.round_trips += 1
+            if result is None:
+                # Новая страница: наблюдатель устанавливается заново
+                result = self.driver.execute_script(INSTALL_SCRIPT, self.watches, pauses.events['mutation_debounce'])
+                self.round_trips += 1
+                self.installs += 1
+                events = self._reinstalled(result)
+            else:
+                events = result['events']
+
+            self.state = result['state']
+            self.dropped = result.get('dropped', 0)
+            for event in events:
+                self.changes[event['name']] = self.changes.get(event['name'], 0) + 1
+
+            probe_seconds = time.monotonic() - started
+            self.probes += 1
+            self.probe_seconds += probe_seconds
+            self.max_probe_seconds = max(self.max_probe_seconds, probe_seconds)
+
+        for event in events:
+            for callback in self.subscribers.get(event['name'], []) + self.subscribers.get('*', []):
+                callback(event)
+        if events:
+            scheduler.signal(self.channel)
+
+        return events
+
+    def mark(self, name: str) -> int:
+        """
+        Returns:
+            int: Отметка для wait() - количество событий name, полученных до этого момента
+        """
+        return self.changes.get(name, 0)
+
+    def wait(self, name: str, since: int, timeout: float) -> bool:
+        """
+        Ждет событие name, полученное после отметки since
+
+        Args:
+            name: Название события из watches
+            since: Отметка mark(), взятая до действия, после которого ожидается событие
+            timeout: Максимальное ожидание в секундах
+
+        Returns:
+            bool: True если событие получено, False по таймауту или при остановке планировщика
+        """
+        deadline = time.monotonic() + timeout
+        while self.changes.get(name, 0) <= since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # Выборка Watcher будит ожидание сигналом, иначе выборка делается здесь с периодом poll_interval
+            if scheduler.wait(min(pauses.events['poll_interval'], remaining), self.channel) and scheduler.stopped:
+                return False
+            self.poll()
+        return True
+
+    def _reinstalled(self, result: dict) -> List[dict]:
+        # На новой странице наблюдатель начинает с пустого состояния - исчезновение элементов старой страницы
+        # добавляется отдельно
+        events = list(result['events'])
+        reported = {event['name'] for event in events}
+        for name, state in self.state.items():
+            if state['count'] and name not in reported and not result['state'].get(name, {}).get('count'):
+                events.append({'name': name, 'count': 0, 'previous': state['count'], 'text': '', 'time': None})
+        return events
+
+    def count(self, name: str) -> int:
+        """
+        Returns:
+            int: Количество видимых элементов события на момент последней выборки
+        """
+        return self.state.get(name, {}).get('count', 0)
+
+    def present(self, name: str) -> bool:
+        return self.count(name) > 0
+
+    def text(self, name: str) -> Optional[str]:
+        """
+        Returns:
+            str: Текст первого видимого элемента события или None
+        """
+        state = self.state.get(name)
+        return state['text'] if state and state['count'] else None
+
+    def probe_stats(self) -> Dict:
+        """
+        Returns:
+            Dict: Статистика выборок (probes, round_trips, installs, avg_seconds, max_seconds)
+        """
+        return {
+            'probes': self.probes,
+            'round_trips': self.round_trips,
+            'installs': self.installs,
+            'avg_seconds': self.probe_seconds / self.probes if self.probes else 0.0,
+            'max_seconds': self.max_probe_seconds,
+        }
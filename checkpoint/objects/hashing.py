@@ -0,0 +1,492 @@
+"""
+Хеширование файлов и персистентный индекс хешей
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from queue import Queue
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from checkpoint.knowledge.fs import hashing as hashing_config
+
+
+HASH_ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'blake2b': hashlib.blake2b,
+}
+
+_buffers = threading.local()
+
+
+def _get_buffer(buffer_size: int) -> memoryview:
+    """
+    Возвращает буфер чтения, переиспользуемый в пределах потока
+    """
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None or len(buffer) != buffer_size:
+        buffer = memoryview(bytearray(buffer_size))
+        _buffers.buffer = buffer
+    return buffer
+
+
+def hash_file(file_path, algorithm: str = hashing_config['algorithm'], buffer_size: int = hashing_config['buffer_size']) -> str:
+    """
+    Вычисляет хеш содержимого файла, читая его в переиспользуемый буфер потока
+
+    Args:
+        file_path: Путь к файлу
+        algorithm: Алгоритм хеширования ('md5', 'sha1', 'sha256', 'blake2b')
+        buffer_size: Размер буфера чтения
+
+    Returns:
+        str: Хеш файла в виде строки
+
+    Raises:
+        ValueError: Если алгоритм не поддерживается
+    """
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}. Доступны: {list(HASH_ALGORITHMS.keys())}")
+
+    hash_obj = HASH_ALGORITHMS[algorithm]()
+    buffer = _get_buffer(buffer_size)
+
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hash_obj.update(buffer[:read])
+
+    return hash_obj.hexdigest()
+
+
+def hash_file_edges(file_path, algorithm: str = hashing_config['algorithm'], chunk_size: int = hashing_config['partial_chunk_size']) -> Tuple[str, int]:
+    """
+    Вычисляет частичный хеш файла по его размеру, началу и концу. Для файлов не больше
+    двух блоков читается весь файл, и результат совпадает с полным хешем
+
+    Args:
+        file_path: Путь к файлу
+        algorithm: Алгоритм хеширования
+        chunk_size: Размер блока в начале и в конце файла
+
+    Returns:
+        Tuple[str, int]: (хеш, количество прочитанных байт)
+    """
+    if algorithm not in HASH_ALGORITHMS:
+        raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}. Доступны: {list(HASH_ALGORITHMS.keys())}")
+
+    file_size = os.path.getsize(file_path)
+    if file_size <= chunk_size * 2:
+        return hash_file(file_path, algorithm), file_size
+
+    hash_obj = HASH_ALGORITHMS[algorithm]()
+    hash_obj.update(str(file_size).encode())
+    with open(file_path, 'rb') as f:
+        head = f.read(chunk_size)
+        f.seek(-chunk_size, os.SEEK_END)
+        tail = f.read(chunk_size)
+    hash_obj.update(head)
+    hash_obj.update(tail)
+
+    return hash_obj.hexdigest(), len(head) + len(tail)
+
+
+class HashIndex:
+    """
+    Персистентный индекс хешей содержимого файлов
+
+    Обеспечивает:
+    - Хранение хешей в append-only JSONL файле (одна запись на строку)
+    - Ключ записи: путь, размер, mtime и inode файла
+    - Повторное хеширование только измененных файлов
+    - Инвалидацию и компактирование индекса
+    - Счетчики попаданий и промахов
+    """
+
+    def __init__(self, index_path: Path, algorithm: str = hashing_config['algorithm']):
+        """
+        Инициализация индекса хешей
+
+        Args:
+            index_path: Путь к файлу индекса
+            algorithm: Алгоритм хеширования, записи с другим алгоритмом считаются промахами
+        """
+        self.index_path = Path(index_path)
+        self.algorithm = algorithm
+        self.entries: Dict[str, Tuple[int, int, int, str, str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_records = 0
+        self._lock = threading.Lock()
+        self._file = None
+
+    @staticmethod
+    def _normalize(path) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _signature(st: os.stat_result) -> Tuple[int, int, int]:
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    @classmethod
+    def _matches(cls, entry: Tuple[int, int, int, str, str], st: os.stat_result) -> bool:
+        size, mtime, inode = cls._signature(st)
+        # os.DirEntry.stat() на Windows не заполняет st_ino, нулевой inode не сравниваем
+        return entry[0] == size and entry[1] == mtime and (not entry[2] or not inode or entry[2] == inode)
+
+    def load(self) -> int:
+        """
+        Загружает индекс с диска. Более поздние записи перекрывают более ранние,
+        поврежденные строки (например, недописанные при аварийном завершении) пропускаются
+
+        Returns:
+            int: Количество актуальных записей в индексе
+        """
+        self.entries.clear()
+        self.stale_records = 0
+
+        if not self.index_path.exists():
+            return 0
+
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    key = record['path']
+                    entry = (record['size'], record['mtime'], record['inode'], record['algorithm'], record['hash'])
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    self.stale_records += 1
+                    continue
+
+                if key in self.entries:
+                    self.stale_records += 1
+                self.entries[key] = entry
+
+        return len(self.entries)
+
+    def _append(self, record: dict) -> None:
+        if self._file is None:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.index_path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def lookup(self, path, st: Optional[os.stat_result] = None) -> Optional[str]:
+        """
+        Возвращает сохраненный хеш файла, если файл не изменился с момента индексации
+
+        Args:
+            path: Путь к файлу
+            st: Результат os.stat для файла (чтобы не вызывать stat повторно)
+
+        Returns:
+            str: Хеш файла или None при промахе
+        """
+        key = self._normalize(path)
+        if st is None:
+            st = os.stat(path)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and self._matches(entry, st) and entry[3] == self.algorithm:
+                self.hits += 1
+                return entry[4]
+            self.misses += 1
+            return None
+
+    def store(self, path, digest: str, st: Optional[os.stat_result] = None) -> None:
+        """
+        Добавляет хеш файла в индекс
+
+        Args:
+            path: Путь к файлу
+            digest: Хеш содержимого файла
+            st: Результат os.stat для файла, снятый до вычисления хеша
+        """
+        key = self._normalize(path)
+        if st is None:
+            st = os.stat(path)
+        size, mtime, inode = self._signature(st)
+
+        with self._lock:
+            if key in self.entries:
+                self.stale_records += 1
+            self.entries[key] = (size, mtime, inode, self.algorithm, digest)
+            self._append({
+                'path': key,
+                'size': size,
+                'mtime': mtime,
+                'inode': inode,
+                'algorithm': self.algorithm,
+                'hash': digest,
+            })
+
+    def get_hash(self, path, hasher: Callable[[str], str]) -> str:
+        """
+        Возвращает хеш файла из индекса или вычисляет и сохраняет его
+
+        Args:
+            path: Путь к файлу
+            hasher: Функция вычисления хеша по пути к файлу
+
+        Returns:
+            str: Хеш файла
+        """
+        st = os.stat(path)
+        digest = self.lookup(path, st)
+        if digest is None:
+            digest = hasher(path)
+            self.store(path, digest, st)
+        return digest
+
+    def invalidate(self, prefix: Optional[str] = None) -> int:
+        """
+        Удаляет записи из индекса
+
+        Args:
+            prefix: Путь к папке или файлу, записи для которых нужно удалить.
+                    Если не задан, индекс очищается полностью
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        with self._lock:
+            if not prefix:
+                removed = len(self.entries)
+                self.entries.clear()
+            else:
+                prefix = self._normalize(prefix)
+                keys = [key for key in self.entries if key == prefix or key.startswith(prefix.rstrip(os.sep) + os.sep)]
+                for key in keys:
+                    del self.entries[key]
+                removed = len(keys)
+
+        self.compact(prune_missing=False)
+        return removed
+
+    def compact(self, prune_missing: bool = True) -> Tuple[int, int]:
+        """
+        Перезаписывает файл индекса, оставляя только актуальные записи
+
+        Args:
+            prune_missing: Удалять записи для файлов, которых больше нет на диске
+                           или которые изменились с момента индексации
+
+        Returns:
+            Tuple[int, int]: (количество оставшихся записей, количество удаленных записей)
+        """
+        with self._lock:
+            dropped = self.stale_records
+
+            if prune_missing:
+                for key, entry in list(self.entries.items()):
+                    try:
+                        st = os.stat(key)
+                    except OSError:
+                        st = None
+
+                    if st is None or not self._matches(entry, st):
+                        del self.entries[key]
+                        dropped += 1
+
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, (size, mtime, inode, algorithm, digest) in self.entries.items():
+                    f.write(json.dumps({
+                        'path': key,
+                        'size': size,
+                        'mtime': mtime,
+                        'inode': inode,
+                        'algorithm': algorithm,
+                        'hash': digest,
+                    }, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.index_path)
+
+            self.stale_records = 0
+            return len(self.entries), dropped
+
+    def close(self) -> None:
+        """
+        Закрывает файл индекса
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class HashEngine:
+    """
+    Параллельное хеширование файлов пулом потоков
+
+    Обеспечивает:
+    - Хеширование в нескольких потоках (hashlib отпускает GIL на больших блоках)
+    - Переиспользуемые буферы чтения в каждом потоке
+    - Ограничение суммарного объема одновременно хешируемых файлов
+    - Выбор алгоритма хеширования
+    - Использование индекса хешей, чтобы не хешировать неизмененные файлы
+    """
+
+    def __init__(
+        self,
+        algorithm: str = hashing_config['algorithm'],
+        workers: int = hashing_config['workers'],
+        buffer_size: int = hashing_config['buffer_size'],
+        max_inflight_bytes: int = hashing_config['max_inflight_bytes'],
+        index: Optional[HashIndex] = None
+    ):
+        """
+        Инициализация движка хеширования
+
+        Args:
+            algorithm: Алгоритм хеширования
+            workers: Количество потоков хеширования
+            buffer_size: Размер буфера чтения на поток
+            max_inflight_bytes: Максимальный суммарный размер одновременно хешируемых файлов
+            index: Индекс хешей для пропуска неизмененных файлов
+        """
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}. Доступны: {list(HASH_ALGORITHMS.keys())}")
+
+        self.algorithm = algorithm
+        self.workers = max(1, workers)
+        self.buffer_size = buffer_size
+        self.max_inflight_bytes = max_inflight_bytes
+        self.index = index
+        self.hashed_files = 0
+        self.hashed_bytes = 0
+        self._inflight_bytes = 0
+        self._inflight = threading.Condition()
+
+    def hash(self, file_path) -> str:
+        """
+        Вычисляет хеш одного файла в текущем потоке
+
+        Args:
+            file_path: Путь к файлу
+
+        Returns:
+            str: Хеш файла
+        """
+        return hash_file(file_path, self.algorithm, self.buffer_size)
+
+    def _acquire(self, size: int) -> int:
+        # Файл больше лимита занимает весь лимит, но не блокирует движок навсегда
+        size = min(size, self.max_inflight_bytes)
+        with self._inflight:
+            self._inflight.wait_for(lambda: self._inflight_bytes == 0 or self._inflight_bytes + size <= self.max_inflight_bytes)
+            self._inflight_bytes += size
+        return size
+
+    def _release(self, size: int) -> None:
+        with self._inflight:
+            self._inflight_bytes -= size
+            self._inflight.notify_all()
+
+    def _hash_task(self, file_path, st: os.stat_result, reserved: int) -> Tuple[str, Optional[str], Optional[Exception]]:
+        try:
+            digest = self.hash(file_path)
+            if self.index is not None:
+                self.index.store(file_path, digest, st)
+            return file_path, digest, None
+        except OSError as e:
+            return file_path, None, e
+        finally:
+            self._release(reserved)
+
+    def map(self, items: Iterable[Union[str, Path, Tuple[Union[str, Path], os.stat_result]]]) -> Iterator[Tuple[str, Optional[str], Optional[Exception]]]:
+        """
+        Хеширует файлы параллельно и отдает результаты по мере готовности (порядок не сохраняется)
+
+        Файлы ставятся в очередь отдельным потоком, поэтому готовый результат отдается сразу,
+        даже если следующий путь из items еще не получен (медленный обход диска).
+        Одновременно в работе не больше workers * 4 файлов и max_inflight_bytes байт
+
+        Args:
+            items: Пути к файлам или пары (путь, результат os.stat)
+
+        Yields:
+            Tuple[str, Optional[str], Optional[Exception]]: (путь, хеш, ошибка чтения файла)
+        """
+        results: Queue = Queue()
+        slots = threading.Semaphore(self.workers * 4)
+        stop = threading.Event()
+
+        def feed(pool: ThreadPoolExecutor) -> None:
+            total = 0
+            try:
+                for item in items:
+                    # Слот освобождается, когда результат забран - очередь результатов не растет без предела
+                    while not slots.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    total += 1
+                    file_path, st = item if isinstance(item, tuple) else (item, None)
+
+                    try:
+                        if st is None:
+                            st = os.stat(file_path)
+                        if self.index is not None:
+                            digest = self.index.lookup(file_path, st)
+                            if digest is not None:
+                                results.put((file_path, digest, None))
+                                continue
+                    except OSError as e:
+                        results.put((file_path, None, e))
+                        continue
+
+                    reserved = self._acquire(st.st_size)
+                    pool.submit(self._hash_task, file_path, st, reserved).add_done_callback(results.put)
+                    self.hashed_files += 1
+                    self.hashed_bytes += st.st_size
+            except BaseException as e:
+                results.put(_FeedError(e))
+            finally:
+                results.put(_FeedDone(total))
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="HashWorker") as pool:
+            feeder = threading.Thread(target=feed, args=(pool,), daemon=True, name="HashFeeder")
+            feeder.start()
+            try:
+                received = 0
+                total = None
+                while total is None or received < total:
+                    result = results.get()
+                    if isinstance(result, _FeedDone):
+                        total = result.total
+                        continue
+                    if isinstance(result, _FeedError):
+                        raise result.error
+                    received += 1
+                    slots.release()
+                    yield result.result() if isinstance(result, Future) else result
+            finally:
+                stop.set()
+                feeder.join()
+
+
+class _FeedDone:
+    # Все пути из items поставлены в очередь: total - сколько результатов ждать
+    def __init__(self, total: int):
+        self.total = total
+
+
+class _FeedError:
+    # Ошибка при обходе items - пробрасывается в потоке, который читает результаты
+    def __init__(self, error: BaseException):
+        self.error = error
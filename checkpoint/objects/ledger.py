@@ -0,0 +1,229 @@
+"""
+Журнал загрузки файлов в альбомы
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+
+def _ends_with_newline(file_path: Path) -> bool:
+    with open(file_path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class UploadLedger:
+    """
+    Журнал загрузки файлов
+
+    Обеспечивает:
+    - Append-only JSONL журнал: каждая смена статуса файла или альбома - отдельная запись
+    - Запись на диск с fsync, после аварийного завершения журнал читается до последней целой строки
+    - Проверку за O(1), загружен ли файл в альбом, по ключу содержимого
+    - Сохранение альбома, в который загружается папка, для продолжения после перезапуска
+    - Итоги по альбомам без обращения к браузеру
+    """
+
+    STATUS_ATTACHED = 'attached'
+    STATUS_UPLOADED = 'uploaded'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, ledger_path: Path):
+        """
+        Инициализация журнала
+
+        Args:
+            ledger_path: Путь к файлу журнала
+        """
+        self.ledger_path = Path(ledger_path)
+        self.files: Dict[str, dict] = {}
+        self.uploaded: Dict[str, Set[str]] = {}
+        self.albums: Dict[str, dict] = {}
+        self.totals: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> int:
+        """
+        Загружает журнал с диска. Поврежденные строки (недописанные при аварийном завершении) пропускаются
+
+        Returns:
+            int: Количество файлов в журнале
+        """
+        self.files.clear()
+        self.uploaded.clear()
+        self.albums.clear()
+        self.totals.clear()
+
+        if not self.ledger_path.exists():
+            return 0
+
+        with open(self.ledger_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    self._apply(record)
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+
+        return len(self.files)
+
+    def _apply(self, record: dict) -> None:
+        if record['type'] == 'album':
+            self.albums[record['folder']] = record
+            return
+
+        # Один и тот же файл может быть загружен в несколько альбомов: учитывается каждый альбом
+        albums = self.uploaded.setdefault(record['key'], set())
+        album_id = str(record.get('album_id'))
+        if record['status'] == self.STATUS_UPLOADED:
+            if album_id not in albums:
+                albums.add(album_id)
+                self._count(record, 1)
+        elif album_id in albums:
+            albums.discard(album_id)
+            self._count(record, -1)
+        self.files[record['key']] = record
+
+    def _count(self, record: dict, sign: int) -> None:
+        totals = self.totals.setdefault(str(record.get('album_id')), {'files': 0, 'bytes': 0})
+        totals['files'] += sign
+        totals['bytes'] += sign * record.get('size', 0)
+
+    def _write(self, records: Iterable[dict]) -> None:
+        if self._file is None:
+            self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+            torn = self.ledger_path.exists() and not _ends_with_newline(self.ledger_path)
+            self._file = open(self.ledger_path, 'a', encoding='utf-8')
+            if torn:
+                # Недописанная строка после аварийного завершения не должна склеиться с новой записью
+                self._file.write("\n")
+
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._apply(record)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record_files(self, files: list, status: str, album_id=None, batch: Optional[int] = None) -> None:
+        """
+        Записывает статус пачки файлов одной операцией записи на диск
+
+        Args:
+            files: Список файлов [(ключ, (название, размер, полное название))]
+            status: Статус файлов (attached, uploaded, failed)
+            album_id: ID альбома
+            batch: Номер пачки
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        records = []
+        for key, (name, size, full_name) in files:
+            previous = self.files.get(key, {})
+            records.append({
+                'type': 'file',
+                'key': key,
+                'path': full_name,
+                'size': size,
+                'album_id': str(album_id) if album_id is not None else previous.get('album_id'),
+                'batch': batch if batch is not None else previous.get('batch'),
+                'status': status,
+                'created': previous.get('created', now),
+                'updated': now,
+            })
+
+        with self._lock:
+            self._write(records)
+
+    def is_uploaded(self, key: str, album_id=None) -> bool:
+        """
+        Проверяет, загружен ли файл
+
+        Args:
+            key: Ключ содержимого файла
+            album_id: ID альбома (None - любой альбом)
+
+        Returns:
+            bool: True если файл уже загружен в альбом
+        """
+        albums = self.uploaded.get(key)
+        if not albums:
+            return False
+        return album_id is None or str(album_id) in albums
+
+    def uploaded_albums(self, key: str) -> Set[str]:
+        """
+        Возвращает ID альбомов, в которые загружен файл
+        """
+        return set(self.uploaded.get(key, ()))
+
+    def set_album(self, folder: str, album_id, album_name: str) -> None:
+        """
+        Сохраняет альбом, в который загружается папка (если альбом папки не изменился, запись не добавляется)
+        """
+        record = self.albums.get(folder)
+        if record and record['status'] == 'active' and record['album_id'] == str(album_id) and record['album_name'] == album_name:
+            return
+
+        with self._lock:
+            self._write([{
+                'type': 'album',
+                'folder': folder,
+                'album_id': str(album_id),
+                'album_name': album_name,
+                'status': 'active',
+                'updated': datetime.now().isoformat(timespec='seconds'),
+            }])
+
+    def get_album(self, folder: str) -> Optional[dict]:
+        """
+        Возвращает незавершенный альбом папки
+
+        Returns:
+            dict: Запись альбома (album_id, album_name) или None
+        """
+        record = self.albums.get(folder)
+        if record and record['status'] == 'active':
+            return record
+        return None
+
+    def is_album_done(self, folder: str) -> bool:
+        """
+        Проверяет, завершена ли загрузка папки
+        """
+        record = self.albums.get(folder)
+        return bool(record) and record['status'] == 'done'
+
+    def close_album(self, folder: str) -> None:
+        """
+        Отмечает загрузку папки завершенной
+        """
+        record = self.albums.get(folder)
+        if not record or record['status'] != 'active':
+            return
+
+        with self._lock:
+            self._write([dict(record, status='done', updated=datetime.now().isoformat(timespec='seconds'))])
+
+    def album_totals(self) -> Dict[str, Dict[str, int]]:
+        """
+        Возвращает итоги загрузки по альбомам
+
+        Returns:
+            Dict[str, Dict[str, int]]: {ID альбома: {'files': количество файлов, 'bytes': объем}}
+        """
+        return {album_id: dict(totals) for album_id, totals in self.totals.items() if totals['files']}
+
+    def close(self) -> None:
+        """
+        Закрывает файл журнала
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
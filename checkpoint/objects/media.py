@@ -9,6 +9,7 @@ from checkpoint import globals as gb
 from checkpoint.knowledge import pauses
 from checkpoint.helpers.utils import sleep
 from checkpoint.helpers.fs import get_unique_filename, merge_directories, clean_folder_name
+from checkpoint.objects.scheduler import scheduler
 
 
 class MediaManager:
@@ -20,7 +21,10 @@ class MediaManager:
     - Очистка имен папок от случайных суффиксов
     - Объединение папок с одинаковыми именами
     - Перемещение папок в директорию PHOTO
+    - Пробуждение монитора сразу после появления новой папки и немедленную остановку
     """
+
+    task_name = "MediaManager"
     
     def __init__(self, media_path: Path, photo_path: Path):
         """
@@ -34,6 +38,8 @@ class MediaManager:
         self.photo_path = photo_path
         self.monitor_running = False
         self.monitor_thread = None
+        self.watch_timer = None
+        self.watched_folders: Set[str] = set()
         self.processed_folders: Set[str] = set()
     
     def process_folder(self, folder_path: Path) -> bool:
@@ -106,7 +112,7 @@ class MediaManager:
         Мониторит папку медиа и обрабатывает новые папки
         """
         gb.rc.print(f"🔍 Запущен мониторинг медиа папок в: {self.media_path}", style="blue")
-        task_name = "MediaManager"
+        task_name = self.task_name
 
         while self.monitor_running:
             try:
@@ -114,12 +120,12 @@ class MediaManager:
                 if not gb.task_sync.can_run_task(task_name):
                     # Другой таск уже выполняется, пропускаем этот цикл
                     gb.rc.print(f"⏸️ MediaManager: ожидание завершения {gb.task_sync.get_current_running_task()}", style="yellow")
-                    sleep(pauses.media['folder_scan'], "Пауза - ожидание освобождения таска")
+                    sleep(pauses.media['folder_scan'], "Пауза - ожидание освобождения таска", (task_name,))
                     continue
 
                 if not self.media_path.exists():
                     gb.rc.print(f"⚠️ Папка медиа не найдена: {self.media_path}", style="yellow")
-                    sleep(pauses.media['folder_scan'], "Ожидание появления папки медиа")
+                    sleep(pauses.media['folder_scan'], "Ожидание появления папки медиа", (task_name,))
                     continue
 
                 # Устанавливаем себя как активный таск
@@ -147,20 +153,31 @@ class MediaManager:
                     gb.rc.print(f"⏸️ MediaManager: переход в паузу", style="cyan")
 
                 # Пауза между сканированием
-                sleep(pauses.media['folder_scan'], "Пауза между сканированием папок медиа")
+                sleep(pauses.media['folder_scan'], "Пауза между сканированием папок медиа", (task_name,))
 
             except Exception as e:
                 gb.rc.print(f"❌ Ошибка в мониторе медиа папок: {e}", style="red")
                 # Освобождаем глобальную переменную при ошибке
                 if gb.task_sync.is_task_running(task_name):
                     gb.task_sync.set_current_running_task(None)
-                sleep(pauses.media['error_recovery'], "Восстановление после ошибки в мониторинге медиа")
+                sleep(pauses.media['error_recovery'], "Восстановление после ошибки в мониторинге медиа", (task_name,))
 
         # Освобождаем глобальную переменную при завершении работы
         if gb.task_sync.is_task_running(task_name):
             gb.task_sync.set_current_running_task(None)
 
         gb.rc.print("🛑 Мониторинг медиа папок остановлен", style="red")
+
+    def watch_media_folders(self) -> None:
+        """
+        Проверяет папку медиа (на потоке планировщика): появилась новая папка - монитор просыпается сразу
+        """
+        if not self.media_path.exists():
+            return
+        names = {item.name for item in self.media_path.iterdir() if item.is_dir()}
+        if names - self.watched_folders - self.processed_folders:
+            scheduler.signal(self.task_name)
+        self.watched_folders = names
     
     def start_monitor(self) -> None:
         """
@@ -168,12 +185,15 @@ class MediaManager:
         """
         if not self.monitor_running:
             self.monitor_running = True
+            # Сигнал остановки прошлого запуска не должен прервать первую паузу
+            scheduler.clear(self.task_name)
             self.monitor_thread = threading.Thread(
                 target=self.monitor_media_folders,
                 daemon=True,
                 name="MediaProcessorThread"
             )
             self.monitor_thread.start()
+            self.watch_timer = scheduler.every(pauses.media['watch_interval'], self.watch_media_folders)
             gb.rc.print("🚀 Поток мониторинга медиа папок запущен", style="green")
     
     def stop_monitor(self) -> None:
@@ -182,6 +202,10 @@ class MediaManager:
         """
         if self.monitor_running:
             self.monitor_running = False
+            if self.watch_timer:
+                self.watch_timer.cancel()
+            # Прерываем паузу монитора, чтобы поток завершился сразу
+            scheduler.signal(self.task_name)
             if self.monitor_thread and self.monitor_thread.is_alive():
                 self.monitor_thread.join(timeout=10)
             gb.rc.print("🛑 Поток мониторинга медиа папок остановлен", style="red")
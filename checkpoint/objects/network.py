@@ -0,0 +1,213 @@
+"""
+Отслеживание запросов загрузки и публикации по событиям Network (Chrome DevTools Protocol)
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.webdriver import WebDriver
+
+from checkpoint.knowledge.upload import network as network_config
+from checkpoint.objects.scheduler import scheduler
+
+
+class NetworkTracker:
+    """
+    Отслеживание сетевых запросов браузера
+
+    Обеспечивает:
+    - Выборку событий Network.* из лога performance (браузер запускается с goog:loggingPrefs performance)
+    - Распознавание запросов загрузки файлов и публикации по адресу и телу запроса
+    - Завершение запроса: задержка ответа сервера, HTTP статус, ошибка сети или ошибка в ответе GraphQL
+    - Ожидание завершения запроса публикации после заданной отметки
+    - Подписку на завершенные запросы и статистику по видам запросов
+    - Ожидание через общий планировщик: остановка планировщика прерывает ожидание
+    """
+
+    task_name = "NetworkTracker"
+
+    KIND_UPLOAD = 'upload'
+    KIND_PUBLISH = 'publish'
+
+    _trackers: Dict[int, 'NetworkTracker'] = {}
+    _trackers_lock = threading.Lock()
+
+    def __init__(self, driver: WebDriver):
+        """
+        Инициализация
+
+        Args:
+            driver: WebDriver instance, запущенный с логом performance
+        """
+        self.driver = driver
+        self.pending: Dict[str, dict] = {}
+        self.completed = deque(maxlen=network_config['history'])
+        self.sequence = 0
+        self.stats_by_kind: Dict[str, dict] = {}
+        self.subscribers: List[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_driver(cls, driver: WebDriver) -> 'NetworkTracker':
+        """
+        Возвращает общий трекер браузера (лог performance читается одним потребителем)
+        """
+        with cls._trackers_lock:
+            tracker = cls._trackers.get(id(driver))
+            if tracker is None or tracker.driver is not driver:
+                tracker = cls(driver)
+                cls._trackers[id(driver)] = tracker
+            return tracker
+
+    def subscribe(self, callback: Callable[[dict], None]) -> None:
+        """
+        Подписка на завершенные запросы
+
+        Args:
+            callback: Вызывается с запросом {seq, kind, url, latency, status, error, ok}
+        """
+        self.subscribers.append(callback)
+
+    @staticmethod
+    def classify(request: dict) -> Optional[str]:
+        """
+        Вид запроса по адресу и телу
+
+        Returns:
+            str: 'upload', 'publish' или None
+        """
+        url = request.get('url', '')
+        if any(pattern in url for pattern in network_config['upload_urls']):
+            return NetworkTracker.KIND_UPLOAD
+        if request.get('method') == 'POST' and any(pattern in url for pattern in network_config['publish_urls']):
+            post_data = request.get('postData', '')
+            if any(marker in post_data for marker in network_config['publish_markers']):
+                return NetworkTracker.KIND_PUBLISH
+        return None
+
+    def _response_error(self, request_id: str) -> Optional[str]:
+        # Ошибка публикации приходит с HTTP 200 и полем errors в ответе GraphQL
+        try:
+            body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id}).get('body', '')
+        except WebDriverException:
+            return None
+        return 'graphql errors' if '"errors"' in body else None
+
+    def _finish(self, request_id: str, timestamp: float, error: Optional[str] = None) -> Optional[dict]:
+        request = self.pending.pop(request_id, None)
+        if request is None:
+            return None
+
+        status = request.get('status')
+        if error is None and status and status >= 400:
+            error = f"HTTP {status}"
+        if error is None and request['kind'] == self.KIND_PUBLISH:
+            error = self._response_error(request_id)
+
+        self.sequence += 1
+        record = {
+            'seq': self.sequence,
+            'kind': request['kind'],
+            'url': request['url'],
+            'latency': max(0.0, timestamp - request['started']),
+            'status': status,
+            'error': error,
+            'ok': error is None,
+        }
+        self.completed.append(record)
+
+        stats = self.stats_by_kind.setdefault(request['kind'], {'count': 0, 'failed': 0, 'latency': 0.0, 'max_latency': 0.0})
+        stats['count'] += 1
+        stats['failed'] += 0 if record['ok'] else 1
+        stats['latency'] += record['latency']
+        stats['max_latency'] = max(stats['max_latency'], record['latency'])
+        return record
+
+    def poll(self) -> List[dict]:
+        """
+        Забирает события из лога performance
+
+        Returns:
+            List[dict]: Запросы загрузки и публикации, завершенные с прошлой выборки
+        """
+        finished = []
+        with self._lock:
+            for entry in self.driver.get_log('performance'):
+                try:
+                    message = json.loads(entry['message'])['message']
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+
+                method = message.get('method')
+                params = message.get('params', {})
+                request_id = params.get('requestId')
+
+                if method == 'Network.requestWillBeSent':
+                    kind = self.classify(params.get('request', {}))
+                    if kind:
+                        self.pending[request_id] = {'kind': kind, 'url': params['request']['url'], 'started': params.get('timestamp', 0.0)}
+                elif request_id not in self.pending:
+                    continue
+                elif method == 'Network.responseReceived':
+                    self.pending[request_id]['status'] = params.get('response', {}).get('status')
+                elif method == 'Network.loadingFinished':
+                    finished.append(self._finish(request_id, params.get('timestamp', 0.0)))
+                elif method == 'Network.loadingFailed':
+                    finished.append(self._finish(request_id, params.get('timestamp', 0.0), params.get('errorText') or 'failed'))
+
+        finished = [record for record in finished if record]
+        for record in finished:
+            for callback in self.subscribers:
+                callback(record)
+        return finished
+
+    def mark(self) -> int:
+        """
+        Отметка перед действием: запросы, завершенные до нее, не учитываются в wait
+
+        Returns:
+            int: Номер последнего завершенного запроса
+        """
+        self.poll()
+        return self.sequence
+
+    def wait(self, kind: str, since: int, timeout: float) -> Optional[dict]:
+        """
+        Дожидается завершения запроса после отметки
+
+        Args:
+            kind: Вид запроса ('upload', 'publish')
+            since: Отметка из mark()
+            timeout: Максимальное ожидание в секундах
+
+        Returns:
+            dict: Завершенный запрос или None, если запрос не завершился за timeout или планировщик остановлен
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            self.poll()
+            for record in self.completed:
+                if record['seq'] > since and record['kind'] == kind:
+                    return record
+            if time.monotonic() >= deadline:
+                return None
+            if scheduler.wait(network_config['poll_interval'], self.task_name) and scheduler.stopped:
+                return None
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Returns:
+            Dict[str, dict]: Статистика по видам запросов {вид: {count, failed, avg_latency, max_latency}}
+        """
+        return {
+            kind: {
+                'count': stats['count'],
+                'failed': stats['failed'],
+                'avg_latency': stats['latency'] / stats['count'] if stats['count'] else 0.0,
+                'max_latency': stats['max_latency'],
+            }
+            for kind, stats in self.stats_by_kind.items()
+        }
@@ -0,0 +1,162 @@
+"""
+Уменьшение изображений перед загрузкой
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image
+
+from checkpoint.knowledge.upload import optimize as optimize_config
+from checkpoint.objects.hashing import hash_file
+
+
+class ImageOptimizer:
+    """
+    Уменьшение и пересжатие изображений перед загрузкой
+
+    Обеспечивает:
+    - Уменьшение изображений больше max_edge по большей стороне и пересжатие в JPEG с заданным качеством
+      в пуле потоков (декодирование и кодирование Pillow отпускают GIL)
+    - Кэш уменьшенных изображений на диске по хешу содержимого оригинала: в следующий запуск файл не пересжимается
+    - Подготовку файлов заранее, пока загружается предыдущая пачка
+    - Учет сэкономленного объема
+    """
+
+    def __init__(
+        self,
+        cache_path: Path,
+        max_edge: int = optimize_config['max_edge'],
+        quality: int = optimize_config['quality'],
+        workers: int = optimize_config['workers']
+    ):
+        """
+        Инициализация
+
+        Args:
+            cache_path: Папка кэша уменьшенных изображений
+            max_edge: Максимальный размер большей стороны
+            quality: Качество JPEG
+            workers: Количество потоков пересжатия
+        """
+        self.cache_path = Path(cache_path)
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.max_edge = max_edge
+        self.quality = quality
+        self.workers = max(1, workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ImageOptimizer")
+        self.futures: Dict[str, Future] = {}
+        self.optimized_files = 0
+        self.cached_files = 0
+        self.kept_files = 0
+        self.failed_files = 0
+        self.original_bytes = 0
+        self.optimized_bytes = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _cache_file(self, digest: str) -> Path:
+        return self.cache_path / f"{digest}_{self.max_edge}_{self.quality}.jpg"
+
+    def _count(self, counter: str, original_size: int = 0, optimized_size: int = 0, seconds: float = 0.0) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.original_bytes += original_size
+            self.optimized_bytes += optimized_size
+            self.seconds += seconds
+
+    def _encode(self, path: str, target: Path) -> bool:
+        # False - формат не пересжимается
+        with Image.open(path) as img:
+            if img.format not in optimize_config['formats'] or getattr(img, 'is_animated', False):
+                return False
+            exif = img.info.get('exif')
+            icc_profile = img.info.get('icc_profile')
+            # Изображение не больше max_edge тоже пересжимается: выигрыш проверяется по min_saving.
+            # Для JPEG декодер сразу уменьшает изображение кратно 1/2, 1/4, 1/8
+            img.draft('RGB', (self.max_edge, self.max_edge))
+            image = img if img.mode in ('RGB', 'L') else img.convert('RGB')
+            image.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+
+            tmp_path = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+            params = {'quality': self.quality, 'optimize': True}
+            if exif:
+                params['exif'] = exif
+            if icc_profile and image is img:
+                # После преобразования из CMYK профиль оригинала к изображению не подходит
+                params['icc_profile'] = icc_profile
+            image.save(tmp_path, 'JPEG', **params)
+            os.replace(tmp_path, target)
+        return True
+
+    def _optimize(self, path: str, digest: Optional[str]) -> str:
+        started = time.monotonic()
+        try:
+            original_size = os.path.getsize(path)
+            digest = digest or hash_file(path)
+            target = self._cache_file(digest)
+            marker = target.with_suffix('.keep')
+
+            if target.exists():
+                self._count('cached_files', original_size, target.stat().st_size)
+                return str(target)
+            if marker.exists():
+                self._count('kept_files', original_size, original_size)
+                return path
+
+            if self._encode(path, target):
+                optimized_size = target.stat().st_size
+                if optimized_size <= original_size * (1 - optimize_config['min_saving']):
+                    self._count('optimized_files', original_size, optimized_size, time.monotonic() - started)
+                    return str(target)
+                target.unlink()
+
+            # Оригинал не хуже уменьшенного - отмечается, чтобы не пересжимать его в следующий раз
+            marker.touch()
+            self._count('kept_files', original_size, original_size, time.monotonic() - started)
+            return path
+        except Exception as e:
+            print(f"Ошибка уменьшения изображения {path}: {e}")
+            self._count('failed_files')
+            return path
+
+    def submit(self, file_id: str, path: str, digest: Optional[str] = None) -> Future:
+        """
+        Ставит файл в очередь на уменьшение (повторная постановка того же файла ничего не делает)
+
+        Args:
+            file_id: Ключ файла
+            path: Путь к оригиналу
+            digest: Хеш содержимого оригинала, если уже вычислен (иначе вычисляется)
+
+        Returns:
+            Future: Путь к файлу для загрузки
+        """
+        with self._lock:
+            future = self.futures.get(file_id)
+            if future is None:
+                future = self.pool.submit(self._optimize, path, digest)
+                self.futures[file_id] = future
+            return future
+
+    def path(self, file_id: str, path: str, digest: Optional[str] = None) -> str:
+        """
+        Дожидается уменьшения файла
+
+        Returns:
+            str: Путь к уменьшенному изображению или к оригиналу, если уменьшать не нужно
+        """
+        return self.submit(file_id, path, digest).result()
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.optimized_bytes
+
+    def close(self) -> None:
+        """
+        Останавливает пул (файлы, которые еще не начали уменьшаться, отменяются)
+        """
+        self.pool.shutdown(wait=True, cancel_futures=True)
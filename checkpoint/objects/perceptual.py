@@ -0,0 +1,265 @@
+"""
+Перцептивные хеши изображений и поиск похожих изображений
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import imagehash
+from PIL import Image
+
+from checkpoint.knowledge.fs import perceptual as perceptual_config
+from checkpoint.objects.hashing import HashIndex
+
+
+PERCEPTUAL_ALGORITHMS = {
+    'phash': imagehash.phash,
+    'dhash': imagehash.dhash,
+    'ahash': imagehash.average_hash,
+}
+
+
+def compute_perceptual_hash(file_path, algorithm: str = perceptual_config['algorithm'], hash_size: int = perceptual_config['hash_size']) -> str:
+    """
+    Вычисляет перцептивный хеш изображения
+
+    Args:
+        file_path: Путь к изображению
+        algorithm: Алгоритм ('phash', 'dhash', 'ahash')
+        hash_size: Размер хеша
+
+    Returns:
+        str: Хеш в шестнадцатеричном виде
+    """
+    if algorithm not in PERCEPTUAL_ALGORITHMS:
+        raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}. Доступны: {list(PERCEPTUAL_ALGORITHMS.keys())}")
+
+    with Image.open(file_path) as img:
+        # Для JPEG декодер сразу уменьшает изображение, полное декодирование не нужно
+        img.draft('L', (hash_size * 8, hash_size * 8))
+        return str(PERCEPTUAL_ALGORITHMS[algorithm](img, hash_size=hash_size))
+
+
+class BKTree:
+    """
+    BK-дерево по расстоянию Хэмминга для поиска близких хешей без попарного сравнения
+    """
+
+    def __init__(self):
+        # Узел: [хеш, список элементов с этим хешем, {расстояние: дочерний узел}]
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item) -> None:
+        """
+        Добавляет элемент с хешем value
+        """
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = (node[0] ^ value).bit_count()
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, int, list]]:
+        """
+        Находит все хеши на расстоянии не больше max_distance
+
+        Returns:
+            List[Tuple[int, int, list]]: [(расстояние, хеш, элементы с этим хешем)]
+        """
+        result = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = (node[0] ^ value).bit_count()
+            if distance <= max_distance:
+                result.append((distance, node[0], node[1]))
+            # Неравенство треугольника отсекает поддеревья, в которых не может быть близких хешей
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return result
+
+    def values(self) -> Iterable[int]:
+        """
+        Перебирает все различные хеши дерева
+        """
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            yield node[0]
+            stack.extend(node[2].values())
+
+
+class PerceptualIndex:
+    """
+    Индекс перцептивных хешей изображений
+
+    Обеспечивает:
+    - Вычисление хешей в пуле потоков (декодирование Pillow отпускает GIL)
+    - Хранение хешей на диске в HashIndex, неизмененные файлы не декодируются повторно
+    - Поиск похожих на заданное изображение через BK-дерево
+    - Поиск всех групп похожих изображений под корневой папкой
+    """
+
+    def __init__(
+        self,
+        index_path: Path,
+        algorithm: str = perceptual_config['algorithm'],
+        hash_size: int = perceptual_config['hash_size'],
+        workers: int = perceptual_config['workers']
+    ):
+        """
+        Инициализация индекса
+
+        Args:
+            index_path: Путь к файлу индекса
+            algorithm: Алгоритм перцептивного хеша
+            hash_size: Размер хеша
+            workers: Количество потоков вычисления хешей
+        """
+        if algorithm not in PERCEPTUAL_ALGORITHMS:
+            raise ValueError(f"Неподдерживаемый алгоритм: {algorithm}. Доступны: {list(PERCEPTUAL_ALGORITHMS.keys())}")
+
+        self.algorithm = algorithm
+        self.hash_size = hash_size
+        self.workers = max(1, workers)
+        self.store = HashIndex(index_path, f"{algorithm}{hash_size}")
+        self.store.load()
+        self.tree = BKTree()
+        self.hashes: Dict[Path, int] = {}
+        self.errors: List[Tuple[Path, Exception]] = []
+
+    def _compute(self, file_path: Path) -> Tuple[Path, Optional[str], Optional[Exception]]:
+        try:
+            return file_path, compute_perceptual_hash(file_path, self.algorithm, self.hash_size), None
+        except Exception as e:
+            return file_path, None, e
+
+    def update(self, root: Path, extensions: Optional[List[str]] = None, recursive: bool = True) -> int:
+        """
+        Индексирует изображения под корневой папкой и перестраивает дерево поиска
+
+        Args:
+            root: Корневая папка
+            extensions: Расширения изображений (по умолчанию из конфигурации)
+            recursive: Рекурсивный поиск по поддиректориям
+
+        Returns:
+            int: Количество проиндексированных изображений
+        """
+        allowed_extensions = {ext.lower() for ext in (extensions or perceptual_config['extensions'])}
+        file_paths = root.rglob('*') if recursive else root.glob('*')
+
+        self.tree = BKTree()
+        self.hashes = {}
+        self.errors = []
+        missing = []
+
+        for file_path in file_paths:
+            if file_path.suffix.lower() not in allowed_extensions or not file_path.is_file():
+                continue
+            try:
+                st = file_path.stat()
+            except OSError as e:
+                self.errors.append((file_path, e))
+                continue
+
+            digest = self.store.lookup(file_path, st)
+            if digest is None:
+                missing.append((file_path, st))
+            else:
+                self._add(file_path, digest)
+
+        batch_size = perceptual_config['batch_size']
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="PerceptualHashWorker") as pool:
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                stats = dict(batch)
+                for file_path, digest, error in pool.map(self._compute, [file_path for file_path, _ in batch]):
+                    if error:
+                        self.errors.append((file_path, error))
+                        continue
+                    self.store.store(file_path, digest, stats[file_path])
+                    self._add(file_path, digest)
+
+        self.store.close()
+        return len(self.hashes)
+
+    def _add(self, file_path: Path, digest: str) -> None:
+        value = int(digest, 16)
+        file_path = self._normalize(file_path)
+        self.hashes[file_path] = value
+        self.tree.add(value, file_path)
+
+    @staticmethod
+    def _normalize(file_path) -> Path:
+        # Один и тот же файл, заданный относительным или иначе записанным путем, должен совпадать с путем в индексе
+        return Path(os.path.abspath(file_path))
+
+    def near_duplicates(self, file_path: Path, max_distance: int = perceptual_config['max_distance']) -> List[Tuple[int, Path]]:
+        """
+        Находит изображения, похожие на заданное
+
+        Args:
+            file_path: Путь к изображению (не обязательно из индекса)
+            max_distance: Максимальное расстояние Хэмминга
+
+        Returns:
+            List[Tuple[int, Path]]: [(расстояние, абсолютный путь)] по возрастанию расстояния, без самого изображения
+        """
+        file_path = self._normalize(file_path)
+        value = self.hashes.get(file_path)
+        if value is None:
+            value = int(compute_perceptual_hash(file_path, self.algorithm, self.hash_size), 16)
+
+        result = [
+            (distance, path)
+            for distance, _, paths in self.tree.search(value, max_distance)
+            for path in paths
+            if path != file_path
+        ]
+        return sorted(result, key=lambda item: (item[0], str(item[1])))
+
+    def clusters(self, max_distance: int = perceptual_config['max_distance']) -> List[List[Path]]:
+        """
+        Находит все группы похожих изображений в индексе
+
+        Args:
+            max_distance: Максимальное расстояние Хэмминга между соседями в группе
+
+        Returns:
+            List[List[Path]]: Группы из двух и более похожих изображений
+        """
+        parent: Dict[int, int] = {}
+
+        def find(value: int) -> int:
+            parent.setdefault(value, value)
+            while parent[value] != value:
+                parent[value] = parent[parent[value]]
+                value = parent[value]
+            return value
+
+        for value in self.tree.values():
+            for _, other, _ in self.tree.search(value, max_distance):
+                root_a, root_b = find(value), find(other)
+                if root_a != root_b:
+                    parent[root_a] = root_b
+
+        groups: Dict[int, List[Path]] = {}
+        for file_path, value in self.hashes.items():
+            groups.setdefault(find(value), []).append(file_path)
+
+        return [sorted(paths) for paths in groups.values() if len(paths) > 1]
@@ -0,0 +1,208 @@
+"""
+Общий темп действий на Facebook
+"""
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from checkpoint.knowledge import pauses
+from checkpoint.knowledge.upload import rate as rate_config
+from checkpoint.objects.scheduler import scheduler
+
+
+class RateController:
+    """
+    Регулятор темпа действий на Facebook
+
+    Обеспечивает:
+    - Token bucket: действия (открытие страниц, прикрепление файлов, клики по диалогам) выполняются не чаще
+      текущего темпа, с запасом в burst действий подряд. Один регулятор на все браузеры
+    - Паузу после ошибки: экспоненциальная от количества ошибок подряд, с ограничением сверху и случайным отклонением
+    - Подбор безопасного темпа: после "Вы временно заблокированы" темп снижается, а его потолок запоминается;
+      после успешных действий темп медленно растет до потолка
+    - Сохранение темпа, потолка и времени следующего разрешенного действия между запусками
+    - Ожидание темпа через общий планировщик: остановка планировщика прерывает ожидание
+    """
+
+    task_name = "RateController"
+
+    def __init__(self, state_path: Optional[Path] = None):
+        """
+        Инициализация регулятора
+
+        Args:
+            state_path: Путь к файлу состояния. Без файла состояние не сохраняется
+        """
+        self.state_path = Path(state_path) if state_path else None
+        self.rate = float(rate_config['initial_rate'])
+        self.ceiling = float(rate_config['max_rate'])
+        self.tokens = float(rate_config['burst'])
+        self.failures = 0
+        self.blocks = 0
+        self.last_block: Optional[str] = None
+        self.next_allowed = 0.0
+        self.waited_seconds = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """
+        Загружает состояние с диска
+
+        Returns:
+            bool: True если состояние загружено
+        """
+        if not self.state_path or not self.state_path.exists():
+            return False
+
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.rate = float(state['rate'])
+            self.ceiling = float(state['ceiling'])
+            self.blocks = state.get('blocks', 0)
+            self.last_block = state.get('last_block')
+            self.next_allowed = float(state.get('next_allowed', 0.0))
+        except (json.JSONDecodeError, OSError, KeyError, TypeError, ValueError):
+            return False
+
+        self.rate = min(max(self.rate, rate_config['min_rate']), self.ceiling)
+        return True
+
+    def save(self) -> None:
+        """
+        Сохраняет состояние на диск (через временный файл)
+        """
+        if not self.state_path:
+            return
+
+        with self._lock:
+            state = {
+                'rate': self.rate,
+                'ceiling': self.ceiling,
+                'blocks': self.blocks,
+                'last_block': self.last_block,
+                'next_allowed': self.next_allowed,
+            }
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(self.state_path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(rate_config['burst'], self.tokens + (now - self._updated) * self.rate / 60)
+        self._updated = now
+
+    def delay(self) -> float:
+        """
+        Returns:
+            float: Сколько секунд осталось до следующего разрешенного действия после ошибки
+        """
+        return max(0.0, self.next_allowed - time.time())
+
+    def reserve(self) -> float:
+        """
+        Берет разрешение на действие, если оно доступно сейчас
+
+        Returns:
+            float: 0 если действие разрешено, иначе сколько секунд подождать перед повторной попыткой
+        """
+        with self._lock:
+            self._refill()
+            wait = self.delay()
+            if wait <= 0 and self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return max(wait, (1 - self.tokens) * 60 / self.rate)
+
+    def acquire(self) -> float:
+        """
+        Дожидается разрешения на действие (без разрешения, если планировщик остановлен)
+
+        Returns:
+            float: Время ожидания в секундах
+        """
+        waited = 0.0
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                break
+            started = time.monotonic()
+            interrupted = scheduler.wait(wait, self.task_name)
+            waited += time.monotonic() - started
+            if interrupted and scheduler.stopped:
+                break
+
+        with self._lock:
+            self.waited_seconds += waited
+        return waited
+
+    def success(self) -> None:
+        """
+        Действие выполнено без ошибок: счетчик ошибок сбрасывается, темп растет до потолка
+        """
+        with self._lock:
+            self.failures = 0
+            self.ceiling = min(rate_config['max_rate'], self.ceiling + rate_config['ceiling_recovery'])
+            self.rate = min(self.ceiling, self.rate + rate_config['increase_step'])
+
+    def failure(self, blocked: bool = False) -> float:
+        """
+        Ошибка действия: назначается пауза до следующего действия
+
+        Args:
+            blocked: Ошибка - "Вы временно заблокированы", темп снижается
+
+        Returns:
+            float: Пауза в секундах
+        """
+        with self._lock:
+            self.failures += 1
+            jitter = pauses.throttling['jitter']
+            delay = pauses.throttling['base_delay'] * 2 ** min(self.failures, 30) * random.uniform(1 - jitter, 1 + jitter)
+            delay = min(pauses.throttling['max_delay'], delay)
+
+            if blocked:
+                self.blocks += 1
+                self.last_block = datetime.now().isoformat(timespec='seconds')
+                self.ceiling = max(rate_config['min_rate'], self.rate * rate_config['ceiling_margin'])
+                self.rate = max(rate_config['min_rate'], self.rate * rate_config['block_factor'])
+                delay = max(delay, pauses.throttling['block_delay'])
+
+            self.next_allowed = max(self.next_allowed, time.time() + delay)
+            self.tokens = 0.0
+            self._updated = time.monotonic()
+
+        if blocked:
+            self.save()
+        return delay
+
+    @property
+    def next_allowed_at(self) -> Optional[datetime]:
+        """
+        Returns:
+            datetime: Время следующего разрешенного действия или None, если действие разрешено сейчас
+        """
+        return datetime.fromtimestamp(self.next_allowed) if self.delay() > 0 else None
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            Dict: Состояние регулятора (rate, ceiling, failures, blocks, last_block, delay, waited_seconds)
+        """
+        return {
+            'rate': self.rate,
+            'ceiling': self.ceiling,
+            'failures': self.failures,
+            'blocks': self.blocks,
+            'last_block': self.last_block,
+            'delay': self.delay(),
+            'waited_seconds': self.waited_seconds,
+        }
@@ -0,0 +1,157 @@
+"""
+Общий планировщик фоновых задач: отменяемые ожидания и таймеры на одном потоке
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from checkpoint import globals as gb
+
+
+class Timer:
+    """
+    Таймер планировщика (см. Scheduler.call_later, Scheduler.every)
+    """
+
+    def __init__(self, callback: Callable[[], None], interval: Optional[float] = None):
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """
+        Отменяет таймер (уже запущенный вызов callback не прерывается)
+        """
+        self.cancelled = True
+
+
+class Scheduler:
+    """
+    Общий планировщик фоновых задач
+
+    Обеспечивает:
+    - Отменяемые ожидания: wait() заканчивается по истечении времени, по сигналу канала или при остановке планировщика
+    - Сигналы каналам (signal): задача, для которой появилась работа, просыпается сразу.
+      Сигнал, пришедший, пока задача работала, не теряется - следующее ожидание завершится сразу
+    - Таймеры call_later/every: все таймеры выполняются на одном потоке
+    - Остановку (shutdown): все ожидания прерываются, таймеры отменяются. После start() планировщик снова работает
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._signals: Dict[str, bool] = {}
+        self._timers: List[tuple] = []
+        self._sequence = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self.stopped = False
+
+    def wait(self, seconds: float, *channels: str) -> bool:
+        """
+        Ожидание, которое можно прервать
+
+        Args:
+            seconds: Максимальное ожидание в секундах
+            *channels: Каналы, сигнал любого из которых прерывает ожидание
+
+        Returns:
+            bool: True если ожидание прервано сигналом или остановкой планировщика, False если время истекло
+        """
+        deadline = time.monotonic() + seconds
+        with self._condition:
+            while True:
+                if self.stopped:
+                    return True
+                woken = [channel for channel in channels if self._signals.pop(channel, False)]
+                if woken:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+
+    def signal(self, channel: str) -> None:
+        """
+        Будит задачу, ожидающую на канале
+        """
+        with self._condition:
+            self._signals[channel] = True
+            self._condition.notify_all()
+
+    def clear(self, *channels: str) -> None:
+        """
+        Сбрасывает сигналы каналов, не дошедшие до задачи (например, сигнал остановки прошлого запуска)
+        """
+        with self._condition:
+            for channel in channels:
+                self._signals.pop(channel, None)
+
+    def _schedule(self, delay: float, timer: Timer) -> Timer:
+        with self._condition:
+            if self.stopped:
+                timer.cancel()
+                return timer
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._sequence), timer))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_timers, daemon=True, name="SchedulerThread")
+                self._thread.start()
+            self._condition.notify_all()
+        return timer
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """
+        Вызывает callback один раз через delay секунд (на потоке планировщика)
+        """
+        return self._schedule(delay, Timer(callback))
+
+    def every(self, interval: float, callback: Callable[[], None]) -> Timer:
+        """
+        Вызывает callback каждые interval секунд (на потоке планировщика), пока таймер не отменен
+        """
+        return self._schedule(interval, Timer(callback, interval))
+
+    def _run_timers(self) -> None:
+        while True:
+            with self._condition:
+                while not self.stopped and self._thread is threading.current_thread():
+                    if self._timers and self._timers[0][0] <= time.monotonic():
+                        break
+                    self._condition.wait(self._timers[0][0] - time.monotonic() if self._timers else None)
+                if self.stopped or self._thread is not threading.current_thread():
+                    return
+                _, _, timer = heapq.heappop(self._timers)
+
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback()
+            except Exception as e:
+                gb.rc.print(f"❌ Ошибка в таймере планировщика: {e}", style="red")
+            if timer.interval is not None and not timer.cancelled and self._thread is threading.current_thread():
+                self._schedule(timer.interval, timer)
+
+    def start(self) -> None:
+        """
+        Возобновляет работу планировщика после shutdown()
+        """
+        with self._condition:
+            self.stopped = False
+            self._signals.clear()
+
+    def shutdown(self) -> None:
+        """
+        Останавливает планировщик: все текущие и последующие (до start()) ожидания завершаются сразу
+        """
+        with self._condition:
+            self.stopped = True
+            self._timers.clear()
+            self._signals.clear()
+            thread, self._thread = self._thread, None
+            self._condition.notify_all()
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=10)
+
+
+# Общий планировщик процесса
+scheduler = Scheduler()
@@ -9,6 +9,10 @@ from checkpoint import globals as gb
 from checkpoint.knowledge import pauses
 from checkpoint.helpers.utils import sleep
 from checkpoint.helpers.email import send_notification_email
+from checkpoint.helpers.fs import get_temp_path
+from checkpoint.knowledge.fs import files as fs_files, perceptual as perceptual_config
+from checkpoint.objects.perceptual import PerceptualIndex
+from checkpoint.objects.scheduler import scheduler
 from checkpoint import config
 
 
@@ -20,10 +24,20 @@ class PhotoStatsManager:
     - Мониторинг папки PHOTO каждый час
     - Анализ файлов по дате добавления
     - Разделение на новые файлы и дубли (с суффиксами _2, _3 и т.д.)
+    - Поиск изображений, похожих на новые файлы (пережатые, уменьшенные копии), по индексу перцептивных хешей
     - Запись статистики в ежедневные лог-файлы
     """
+
+    task_name = "PhotoStatsManager"
     
-    def __init__(self, photo_path: Path, stats_logs_path: Path, send_email: bool = False, email_to: Optional[str] = None):
+    def __init__(
+        self,
+        photo_path: Path,
+        stats_logs_path: Path,
+        send_email: bool = False,
+        email_to: Optional[str] = None,
+        near_duplicates: bool = perceptual_config['stats_report']
+    ):
         """
         Инициализация менеджера статистики
         
@@ -32,11 +46,13 @@ class PhotoStatsManager:
             stats_logs_path: Путь к папке для логов статистики
             send_email: Отправлять ли статистику на email автоматически
             email_to: Email получателя (по умолчанию из config.NOTIFY_EMAIL)
+            near_duplicates: Искать изображения, похожие на новые файлы
         """
         self.photo_path = photo_path
         self.stats_logs_path = stats_logs_path
         self.send_email = send_email
         self.email_to = email_to
+        self.near_duplicates = near_duplicates
         self.monitor_running = False
         self.monitor_thread = None
         
@@ -108,12 +124,47 @@ class PhotoStatsManager:
             gb.rc.print(f"❌ Ошибка при сканировании папки {self.photo_path}: {e}", style="red")
             return 0, 0, [], []
     
+    def get_near_duplicates(self, new_names: List[str]) -> List[Tuple[str, List[str]]]:
+        """
+        Находит для новых изображений похожие изображения в папке PHOTO.
+        Хеши хранятся в индексе на диске, при повторном сборе декодируются только новые и измененные файлы
+        
+        Args:
+            new_names: Список имен новых файлов
+            
+        Returns:
+            List[Tuple[str, List[str]]]: [(новый файл, похожие изображения)] для новых файлов, у которых есть похожие
+        """
+        extensions = {ext.lower() for ext in perceptual_config['extensions']}
+        images = [name for name in new_names if Path(name).suffix.lower() in extensions]
+        if not images:
+            return []
+        
+        try:
+            index = PerceptualIndex(get_temp_path(fs_files['perceptual_index_file']))
+            index.update(self.photo_path)
+        except Exception as e:
+            gb.rc.print(f"❌ Ошибка при индексации изображений {self.photo_path}: {e}", style="red")
+            return []
+        
+        result = []
+        for name in images:
+            try:
+                similar = [str(path) for _, path in index.near_duplicates(Path(name))]
+            except Exception as e:
+                gb.rc.print(f"⚠️ Ошибка при поиске похожих на {name}: {e}", style="yellow")
+                continue
+            if similar:
+                result.append((name, similar))
+        return result
+    
     def write_daily_stats(
         self, 
         new_files: int, 
         duplicates: int, 
         new_names: Optional[List[str]] = None, 
-        dup_names: Optional[List[str]] = None
+        dup_names: Optional[List[str]] = None,
+        near_duplicates: Optional[List[Tuple[str, List[str]]]] = None
     ) -> None:
         """
         Записывает статистику в ежедневный лог-файл
@@ -123,6 +174,7 @@ class PhotoStatsManager:
             duplicates: Количество дублей
             new_names: Список имен новых файлов
             dup_names: Список имен дублированных файлов
+            near_duplicates: Новые изображения и похожие на них (get_near_duplicates)
         """
         try:
             # Формируем имя файла в формате DD.MM.YYYY.log
@@ -140,6 +192,9 @@ class PhotoStatsManager:
             if dup_names:
                 stats_lines.append("Дубли:")
                 stats_lines.extend([f"  - {name}" for name in dup_names])
+            if near_duplicates:
+                stats_lines.append("Похожие изображения:")
+                stats_lines.extend([f"  - {name} ~ {', '.join(similar)}" for name, similar in near_duplicates])
             
             stats_entry = "\n".join(stats_lines) + "\n"
             
@@ -157,7 +212,8 @@ class PhotoStatsManager:
         new_files: int, 
         duplicates: int, 
         new_names: Optional[List[str]] = None, 
-        dup_names: Optional[List[str]] = None
+        dup_names: Optional[List[str]] = None,
+        near_duplicates: Optional[List[Tuple[str, List[str]]]] = None
     ) -> None:
         """
         Выводит поименные списки новых файлов и дублей
@@ -167,6 +223,7 @@ class PhotoStatsManager:
             duplicates: Количество дублей
             new_names: Список имен новых файлов
             dup_names: Список имен дублированных файлов
+            near_duplicates: Новые изображения и похожие на них (get_near_duplicates)
         """
         try:
             # Поименно выводим списки файлов, если они есть
@@ -178,6 +235,10 @@ class PhotoStatsManager:
                 gb.rc.print("♻️ Дубли:", style="yellow")
                 for name in dup_names:
                     gb.rc.print(f"  - {name}", style="yellow")
+            if near_duplicates:
+                gb.rc.print("🖼️ Похожие изображения:", style="yellow")
+                for name, similar in near_duplicates:
+                    gb.rc.print(f"  - {name} ~ {', '.join(similar)}", style="yellow")
                 
             
             gb.rc.print(f"✅ Статистика собрана: новых файлов {new_files}, дублей {duplicates}", style="green")
@@ -191,7 +252,8 @@ class PhotoStatsManager:
         new_files: int, 
         duplicates: int, 
         new_names: Optional[List[str]] = None, 
-        dup_names: Optional[List[str]] = None
+        dup_names: Optional[List[str]] = None,
+        near_duplicates: Optional[List[Tuple[str, List[str]]]] = None
     ) -> bool:
         """
         Отправляет статистику на email
@@ -202,6 +264,7 @@ class PhotoStatsManager:
             duplicates: Количество дублей
             new_names: Список имен новых файлов
             dup_names: Список имен дублированных файлов
+            near_duplicates: Новые изображения и похожие на них (get_near_duplicates)
             
         Returns:
             bool: True если email успешно отправлен
@@ -246,6 +309,15 @@ class PhotoStatsManager:
                     message_lines.append(f"{i:3d}. {name}")
                 message_lines.append("")
             
+            if near_duplicates:
+                message_lines.extend([
+                    "🖼️ ПОХОЖИЕ ИЗОБРАЖЕНИЯ:",
+                    ""
+                ])
+                for i, (name, similar) in enumerate(near_duplicates, 1):
+                    message_lines.append(f"{i:3d}. {name} ~ {', '.join(similar)}")
+                message_lines.append("")
+            
             # Завершаем сообщение
             message_lines.extend([
                 "---",
@@ -279,19 +351,20 @@ class PhotoStatsManager:
         try:
             # Получаем количество новых файлов и дублей за сегодня
             new_files, duplicates, new_names, dup_names = self.get_files_added_today()
+            near_duplicates = self.get_near_duplicates(new_names) if self.near_duplicates else []
             
             # Записываем статистику в лог (включая списки файлов)
-            self.write_daily_stats(new_files, duplicates, new_names, dup_names)
+            self.write_daily_stats(new_files, duplicates, new_names, dup_names, near_duplicates)
 
             # Выводим статистику в консоль
-            self.print_daily_stats(new_files, duplicates, new_names, dup_names)
+            self.print_daily_stats(new_files, duplicates, new_names, dup_names, near_duplicates)
             
             # Отправляем по email, если требуется
             if self.send_email:
                 # Определяем email получателя
                 recipient_email = self.email_to or config.NOTIFY_EMAIL
                 if recipient_email:
-                    self.send_stats_email(recipient_email, new_files, duplicates, new_names, dup_names)
+                    self.send_stats_email(recipient_email, new_files, duplicates, new_names, dup_names, near_duplicates)
                 else:
                     gb.rc.print("⚠️ Email получатель не указан. Проверьте config.NOTIFY_EMAIL", style="yellow")
             
@@ -313,6 +386,7 @@ class PhotoStatsManager:
             
             # Получаем статистику
             new_files, duplicates, new_names, dup_names = self.get_files_added_today()
+            near_duplicates = self.get_near_duplicates(new_names) if self.near_duplicates else []
             
             # Определяем email получателя
             recipient_email = email_to or config.NOTIFY_EMAIL
@@ -321,7 +395,7 @@ class PhotoStatsManager:
                 return False
             
             # Отправляем email
-            return self.send_stats_email(recipient_email, new_files, duplicates, new_names, dup_names)
+            return self.send_stats_email(recipient_email, new_files, duplicates, new_names, dup_names, near_duplicates)
             
         except Exception as e:
             gb.rc.print(f"❌ Ошибка при отправке статистики на email: {e}", style="red")
@@ -356,11 +430,11 @@ class PhotoStatsManager:
                 self.collect_and_log_stats()
                 
                 # Ждем час до следующей проверки
-                sleep(pauses.stats['hourly_check'], "Ожидание до следующего сбора статистики")
+                sleep(pauses.stats['hourly_check'], "Ожидание до следующего сбора статистики", (self.task_name,))
                 
             except Exception as e:
                 gb.rc.print(f"❌ Ошибка в мониторе статистики: {e}", style="red")
-                sleep(pauses.stats['error_recovery'], "Восстановление после ошибки в мониторинге статистики")
+                sleep(pauses.stats['error_recovery'], "Восстановление после ошибки в мониторинге статистики", (self.task_name,))
         
         gb.rc.print("🛑 Мониторинг статистики остановлен", style="red")
     
@@ -371,6 +445,8 @@ class PhotoStatsManager:
         """
         if not self.monitor_running:
             self.monitor_running = True
+            # Сигнал остановки прошлого запуска не должен прервать первую паузу
+            scheduler.clear(self.task_name)
             self.monitor_thread = threading.Thread(
                 target=self.monitor_photo_stats,
                 daemon=True,
@@ -385,6 +461,8 @@ class PhotoStatsManager:
         """
         if self.monitor_running:
             self.monitor_running = False
+            # Прерываем паузу монитора, чтобы поток завершился сразу
+            scheduler.signal(self.task_name)
             if self.monitor_thread and self.monitor_thread.is_alive():
                 self.monitor_thread.join(timeout=10)
             gb.rc.print("🛑 Поток мониторинга статистики остановлен", style="red")
@@ -0,0 +1,153 @@
+"""
+Телеметрия загрузки: длительность этапов
+"""
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    Перцентиль по ближайшему рангу
+
+    Args:
+        values: Отсортированные значения
+        percent: Перцентиль от 0 до 100
+
+    Returns:
+        float: Значение перцентиля (0.0 для пустого списка)
+    """
+    if not values:
+        return 0.0
+    rank = math.ceil(percent / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class Telemetry:
+    """
+    Телеметрия этапов загрузки
+
+    Обеспечивает:
+    - Замер этапов (прикрепление файлов, диалоги, публикация, создание альбома, паузы, загрузка страниц)
+      через контекстный менеджер, декоратор или готовую длительность
+    - Запись каждого замера в JSONL файл: время, этап, длительность, поток и дополнительные поля
+    - Итоги по этапам: количество, суммарное время, p50, p95, максимум, суммы числовых полей
+    """
+
+    def __init__(self, log_path: Optional[Path] = None):
+        """
+        Инициализация телеметрии
+
+        Args:
+            log_path: Путь к файлу событий. Без файла замеры только накапливаются для итогов
+        """
+        self.log_path = Path(log_path) if log_path else None
+        self.started = time.monotonic()
+        self.durations: Dict[str, List[float]] = {}
+        self.fields: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def start(self, log_path: Path) -> None:
+        """
+        Начинает запись событий в файл (файл дописывается, запуск отмечается событием run)
+        """
+        self.close()
+        self.log_path = Path(log_path)
+        self.started = time.monotonic()
+        self.record('run', 0.0, event='start')
+
+    def record(self, phase: str, seconds: float, **fields) -> None:
+        """
+        Записывает замер
+
+        Args:
+            phase: Название этапа
+            seconds: Длительность в секундах
+            **fields: Дополнительные поля события (количество файлов, байт, номер попытки, ...)
+        """
+        event = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'phase': phase,
+            'seconds': round(seconds, 4),
+            'thread': threading.current_thread().name,
+            **fields
+        }
+        with self._lock:
+            self.durations.setdefault(phase, []).append(seconds)
+            totals = self.fields.setdefault(phase, {})
+            for name, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[name] = totals.get(name, 0) + value
+
+            if self.log_path:
+                if self._file is None:
+                    self.log_path.parent.mkdir(parents=True, exist_ok=True)
+                    self._file = open(self.log_path, 'a', encoding='utf-8')
+                self._file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+                self._file.flush()
+
+    @contextmanager
+    def span(self, phase: str, **fields):
+        """
+        Замер блока кода. В блоке можно дополнить поля события: with telemetry.span('attach') as fields: fields['files'] = 10
+        Если блок завершился исключением, в событие добавляется поле error
+        """
+        started = time.monotonic()
+        try:
+            yield fields
+        except BaseException as e:
+            fields['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(phase, time.monotonic() - started, **fields)
+
+    def timed(self, phase: str):
+        """
+        Декоратор замера функции
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(phase):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def elapsed(self) -> float:
+        """
+        Returns:
+            float: Время с начала запуска в секундах
+        """
+        return time.monotonic() - self.started
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        Returns:
+            Dict[str, dict]: Итоги по этапам {этап: {count, total, p50, p95, max, fields}}
+        """
+        with self._lock:
+            result = {}
+            for phase, durations in self.durations.items():
+                values = sorted(durations)
+                result[phase] = {
+                    'count': len(values),
+                    'total': sum(values),
+                    'p50': percentile(values, 50),
+                    'p95': percentile(values, 95),
+                    'max': values[-1] if values else 0.0,
+                    'fields': dict(self.fields.get(phase, {})),
+                }
+            return result
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
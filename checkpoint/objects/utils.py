@@ -7,6 +7,8 @@ import threading
 
 from rich.console import Console
 
+from checkpoint.objects.scheduler import scheduler
+
 class TMPrinter():
     """
         Print temporary text, on the same line.
@@ -31,12 +33,21 @@ class TaskSynchronizer:
     
     Обеспечивает механизм взаимного исключения для задач,
     позволяя только одной задаче выполняться в определенный момент времени.
+    Задачи, которым было отказано, будятся через канал планировщика с именем задачи, как только таск освобождается.
     """
     
     def __init__(self):
         """Инициализация синхронизатора задач."""
         self._current_running_task: Optional[str] = None
+        self._waiting_tasks: Set[str] = set()
         self._lock = threading.Lock()
+
+    def _release(self) -> None:
+        # Вызывается под self._lock
+        self._current_running_task = None
+        for task_name in self._waiting_tasks:
+            scheduler.signal(task_name)
+        self._waiting_tasks.clear()
     
     def get_current_running_task(self) -> Optional[str]:
         """Получить имя текущего выполняющегося таска.
@@ -54,7 +65,10 @@ class TaskSynchronizer:
             task_name: Имя таска или None для освобождения
         """
         with self._lock:
-            self._current_running_task = task_name
+            if task_name is None:
+                self._release()
+            else:
+                self._current_running_task = task_name
     
     def is_task_running(self, task_name: Optional[str] = None) -> bool:
         """Проверить, выполняется ли какой-либо таск или конкретный таск.
@@ -80,9 +94,12 @@ class TaskSynchronizer:
             bool: True если таск может начать выполнение (нет других активных тасков или это уже активный таск)
         """
         with self._lock:
-            return self._current_running_task is None or self._current_running_task == task_name
+            if self._current_running_task is None or self._current_running_task == task_name:
+                return True
+            self._waiting_tasks.add(task_name)
+            return False
     
     def reset(self) -> None:
         """Сбросить синхронизатор, освободив текущий таск."""
         with self._lock:
-            self._current_running_task = None
\ No newline at end of file
+            self._release()
\ No newline at end of file
@@ -3,21 +3,20 @@ from __future__ import annotations
 
 import argparse
 import inspect
+import itertools
 import os
 import pickle
-import re
 import sys
 import threading
 import time
 from datetime import datetime
 from functools import wraps
 from os import listdir
-from os.path import isfile, isdir, join
+from os.path import isdir, join
 from pathlib import Path
 from time import sleep
 from typing import Any
 from urllib import parse
-import hashlib
 import filetype
 import requests
 from hurry.filesize import size
@@ -32,23 +31,38 @@ from selenium.webdriver.support.ui import WebDriverWait
 import speech_recognition as sr
 from pydub import AudioSegment
 from threading import Thread
+from collections import deque
+from fnmatch import fnmatch
+from queue import Queue, Empty
 
 
 import config
+from checkpoint import globals as gb
+from checkpoint.helpers.pages import classify_page
+from checkpoint.objects.hashing import HashIndex, HashEngine, HASH_ALGORITHMS, hash_file
+from checkpoint.objects.ledger import UploadLedger
+from checkpoint.objects.batching import BatchSizeController
+from checkpoint.objects.driver import DriverPool, get_chrome_options
+from checkpoint.objects.events import PageEventBus
+from checkpoint.objects.albums import AlbumRegistry
+from checkpoint.objects.optimizer import ImageOptimizer
+from checkpoint.objects.telemetry import Telemetry
+from checkpoint.objects.rate import RateController
+from checkpoint.objects.network import NetworkTracker
+from checkpoint.knowledge.fs import hashing as hashing_config
+from checkpoint.knowledge.upload import batching as batching_config, workers as workers_config, optimize as optimize_config, rate as rate_config, network as network_config
+from checkpoint.knowledge import pauses
 
 #todo для работы с глобальными переменными нужен другой способ
 home: str = 'https://www.facebook.com/'
 folder = ""
-index_file = 1#todo в конфиг поубирать
-index_to_album = 0
-count_all_files = 0
-size_to_album = 0
-size_all_files = 0
 cookie_filename = "fb.pkl"
-progress_filename = f"progress.pkl"
+ledger_filename = "upload_ledger.jsonl"
+album_registry_filename = "albums.json"
+telemetry_filename = "telemetry.jsonl"
+hash_index_filename = "hashes.jsonl"
 profile_id = 0
 profile_name = 'Сергей Гладышев'
-album_name = ""
 album_id = None
 
 splited_size = 20
@@ -57,10 +71,58 @@ root_folder = ''
 is_headless = False
 check_duplicates = False
 recursive = False
-connection_status = True
+watcher_interval = pauses.events['poll_interval']
+compact_hash_index = False
+show_ledger_stats = False
+ledger: UploadLedger = None
+album_registry: AlbumRegistry = None
+refresh_albums = False
+optimize_images = False
+optimize_max_edge = optimize_config['max_edge']
+optimize_quality = optimize_config['quality']
+image_optimizer: ImageOptimizer = None
+telemetry = Telemetry()
+rate_controller: RateController = None
+blocked_popup_text = 'Вы временно заблокированы'
+network_tracking = False
+fixed_batch_size = False
+max_batch_size = batching_config['max_size']
+hash_algorithm = hashing_config['algorithm']
+hash_workers = hashing_config['workers']
+invalidate_hash_index = None
+tree_root = None
+tree_order = 'size'
+tree_priority = []
+tree_rescan = False
+upload_workers = workers_config['count']
+max_concurrent_uploads = workers_config['max_concurrent']
+upload_slots = threading.BoundedSemaphore(1)
+bulk_attach = True
+bench_attach = False
+batch_counter = itertools.count(1)
 
 threadLocal = threading.local()
 
+
+class UploadState(threading.local):
+    """
+    Состояние загрузки текущей папки. У каждого потока загрузки (своего браузера) - свое состояние
+    """
+    def __init__(self):
+        self.folder = ""
+        self.album_name = ""
+        self.index_file = 1#todo в конфиг поубирать
+        self.index_to_album = 0
+        self.count_all_files = 0
+        self.size_to_album = 0
+        self.size_all_files = 0
+        self.batch_number = 0
+        self.batch_controller: BatchSizeController = None
+        self.network_mark = 0
+
+
+upload_state = UploadState()
+
 def print_function_name(func):#todo еще данные с параметров тоже выводить
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -73,16 +135,7 @@ def print_function_name(func):#todo еще данные с параметров
 def get_driver() -> WebDriver:
     driver = getattr(threadLocal, 'driver', None)
     if driver is None:
-        chrome_options = webdriver.ChromeOptions()
-        chrome_options.add_experimental_option("detach", True)
-        chrome_options.add_argument("--disable-infobars")
-        chrome_options.add_experimental_option("prefs", {
-            "profile.default_content_setting_values.notifications": 2  # 1:allow, 2:block
-        })
-        if is_headless:
-            chrome_options.add_argument("--headless")
-
-        driver = webdriver.Chrome(options=chrome_options)
+        driver = webdriver.Chrome(options=get_chrome_options(is_headless, network_log=network_tracking))
         setattr(threadLocal, 'driver', driver)
 
     return driver
@@ -167,46 +220,17 @@ def solve_audio_captcha(driver):
 
     return captcha_text
 
+# Ожидание появления признака страницы, по умолчанию 3 секунды
+page_timeouts = {
+    'index': 30,
+}
+
 @print_function_name
 def check_page(driver: WebDriver, page: str) -> str | bool:
-    match page:
-        case 'captcha': # страница запроса капчи
-            try:
-                WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Введите символы, которые вы видите']")))
-            except WebDriverException:
-                return False
-            return True
-
-        case 'index':
-            try:
-                WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.XPATH, "//*[@aria-label='Ваш профиль']")))
-            except WebDriverException as e:
-                return False
-            return True
-
-        case 'login':
-            try:
-                WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Недавние входы']"))) # or
-            except WebDriverException:
-                return False
-            return True
-
-        case 'two_step_verification':
-            try:
-                WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Проверьте уведомления на другом устройстве' or text()='Проверьте сообщения WhatsApp']")))
-            except WebDriverException:
-                return False
-            return True
-
-        case 'add_trusted_device':
-            try:
-                WebDriverWait(driver, 3).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Проверьте уведомления на другом устройстве']")))
-            except WebDriverException:
-                return False
-            return True
-
-        case _:
-            return False
+    """
+    Проверка страницы по общим признакам страниц (checkpoint.knowledge.pages.signatures), одним вызовом скрипта
+    """
+    return page in classify_page(driver, [page], page_timeouts.get(page, 3))
 
 #todo для паузы доработать форматированный вывод оставшегося времени, часы тоже выводить
 
@@ -273,23 +297,32 @@ def add_cookies(driver: WebDriver, filename):
         return False
 
 @print_function_name
-def save_progress(album_id, file_number, album_name):
-    pickle.dump([album_id, file_number, album_name], open(progress_filename, 'wb'))
+def save_progress(album_id, album_name):
+    ledger.set_album(upload_state.folder, album_id, album_name)
 
 @print_function_name
 def clear_saved_progress():
-    if os.path.isfile(progress_filename):
-        os.remove(progress_filename)
-    print(f"Сохраненный прогресс {progress_filename} очищен")
+    ledger.close_album(upload_state.folder)
+    print(f"Сохраненный прогресс папки {upload_state.folder} в журнале {ledger_filename} очищен")
 
 @print_function_name
 def restore_progress() -> bool | tuple[Any]:
-    try:
-        progress = pickle.load(open(progress_filename, 'rb'))
-    except FileNotFoundError:
+    record = ledger.get_album(upload_state.folder)
+    if not record:
         return False
 
-    return *progress,
+    return record['album_id'], record['album_name']
+
+@print_function_name
+def print_ledger_stats():
+    """
+    Вывести итоги загрузки по альбомам из журнала
+    """
+    totals = ledger.album_totals()
+    album_names = {record['album_id']: record['album_name'] for record in ledger.albums.values()}
+    for album, album_totals in totals.items():
+        print(f"Альбом {album_names.get(album, '')} (ID {album}): загружено файлов {album_totals['files']} {size(album_totals['bytes'])}")
+    print(f"Всего альбомов: {len(totals)}, файлов в журнале: {len(ledger.files)}")
 
 
 # todo подумать как отрефакторить эти циклы и оптимизировать
@@ -298,25 +331,119 @@ def restore_progress() -> bool | tuple[Any]:
 # todo вести статистику ошибок сохранения конкретных файлов и перезапускать сохранение, исключив проблемные файлы из списка
 
 @print_function_name
-def sleep_throttling(attempt):
+def sleep_throttling(popup_text: str = None):
     """
-    Function to implement an Exponential Backoff throttling mechanism based on the given attempt number.
-    The delay between retries increases exponentially with the number of attempts,
-    allowing controlled retries and avoiding excessive immediate retries. During
-    the delay period, a countdown is displayed with progress feedback.
+    Пауза после ошибки. Длительность назначает общий регулятор темпа: экспоненциальная от количества ошибок подряд
+    во всех браузерах, не больше pauses.throttling['max_delay'], со случайным отклонением.
+    После "Вы временно заблокированы" регулятор дополнительно снижает темп действий и запоминает безопасный темп
 
-    :param attempt: The current attempt number, starting from 0, that determines
-                    the delay duration. The delay is calculated as 2 ** attempt.
-    :type attempt: int
+    :param popup_text: Текст попапа, из-за которого нужна пауза (None - ошибка без попапа)
     :return: None
     """
-    delay = 2 ** attempt
-    for i in range(delay, 0, -1):
-        sys.stdout.write(str(i) + ' ')
-        sys.stdout.flush()
-        minutes, seconds = divmod(i, 60)
-        print_progress_bar(i, delay, prefix='sleep:', suffix=f"Осталось{' ' + str(minutes) + ' минут и' if minutes > 0 else ''} {seconds} секунд", length=50)
-        time.sleep(1)
+    blocked = bool(popup_text) and blocked_popup_text in popup_text
+    rate_controller.failure(blocked)
+    delay = rate_controller.delay()
+    with telemetry.span('throttling', delay=round(delay, 1), blocked=blocked, failures=rate_controller.failures):
+        remaining = delay
+        while remaining > 0:
+            minutes, seconds = divmod(int(remaining), 60)
+            print_progress_bar(delay - remaining, delay, prefix='sleep:', suffix=f"Осталось{' ' + str(minutes) + ' минут и' if minutes > 0 else ''} {seconds} секунд", length=50)
+            time.sleep(min(1, remaining))
+            remaining = rate_controller.delay()
+
+    if blocked:
+        print(f"Темп действий снижен до {rate_controller.rate:.1f} в минуту")
+
+def wait_rate():
+    """
+    Дождаться разрешения регулятора темпа на действие на Facebook
+    """
+    waited = rate_controller.acquire()
+    if waited:
+        telemetry.record('rate_wait', waited)
+
+def print_rate_state():
+    """
+    Вывести текущий темп действий и время следующего разрешенного действия
+    """
+    stats = rate_controller.stats()
+    next_allowed_at = rate_controller.next_allowed_at
+    print(
+        f"Темп действий: {stats['rate']:.1f} в минуту (потолок {stats['ceiling']:.1f}), блокировок {stats['blocks']}"
+        f"{', последняя ' + stats['last_block'] if stats['last_block'] else ''}"
+        f"{', следующее действие не раньше ' + next_allowed_at.strftime('%H:%M:%S') if next_allowed_at else ''}"
+        f"{', ожидание темпа ' + format(stats['waited_seconds'], '.0f') + ' сек' if stats['waited_seconds'] else ''}"
+    )
+
+# Устанавливается в страницу перед прикреплением пачки: запоминает, из какого файла создан каждый blob: адрес.
+# По такому адресу страница показывает миниатюру фото в диалоге "Добавить в альбом"
+FILE_PREVIEWS_SCRIPT = """
+if (!window.__checkpointPreviews) {
+    var previews = window.__checkpointPreviews = {};
+    var createObjectURL = URL.createObjectURL;
+    URL.createObjectURL = function (object) {
+        var url = createObjectURL.apply(this, arguments);
+        if (object && typeof object.name === 'string') previews[url] = object.name;
+        return url;
+    };
+}
+"""
+
+# Названия файлов, показанных в диалоге кнопки "Добавить в альбом": по миниатюрам (blob: адреса из FILE_PREVIEWS_SCRIPT),
+# если миниатюр нет - по названиям файлов пачки в тексте диалога.
+# Диалог - самый внешний предок кнопки, в котором нет других кнопок "Добавить в альбом"
+DIALOG_FILES_SCRIPT = """
+var button = arguments[0];
+var names = arguments[1];
+var previews = window.__checkpointPreviews || {};
+var dialog = button;
+while (dialog.parentElement && dialog.parentElement.querySelectorAll('[aria-label="Добавить в альбом"]').length <= 1) {
+    dialog = dialog.parentElement;
+}
+var found = {};
+var nodes = dialog.querySelectorAll('img, video, [style*="blob:"]');
+for (var i = 0; i < nodes.length; i++) {
+    var sources = [nodes[i].currentSrc, nodes[i].src, nodes[i].poster, nodes[i].getAttribute('style')];
+    for (var j = 0; j < sources.length; j++) {
+        var match = sources[j] && /blob:[^"')\\s]+/.exec(sources[j]);
+        if (match && previews[match[0]]) found[previews[match[0]]] = true;
+    }
+}
+if (!Object.keys(found).length) {
+    var text = dialog.textContent || '';
+    for (var k = 0; k < names.length; k++) {
+        if (text.indexOf(names[k]) !== -1) found[names[k]] = true;
+    }
+}
+return Object.keys(found);
+"""
+
+def dialog_file(driver: WebDriver, button: WebElement, pending: list):
+    """
+    Файл пачки, показанный в диалоге "Добавить в альбом" (по миниатюре или названию файла)
+    :param button: Кнопка диалога из get_add_dialogs
+    :param pending: Неподтвержденные файлы пачки
+    :return: Файл из pending или None, если файл диалога однозначно не определить
+    """
+    names = [os.path.basename(file[1][-1]) for file in pending]
+    try:
+        found = driver.execute_script(DIALOG_FILES_SCRIPT, button, names)
+    except WebDriverException:
+        return None
+    if len(found) != 1 or names.count(found[0]) != 1:
+        return None
+    return pending[names.index(found[0])]
+
+def checkpoint_dialog(album_id, pending: list, file) -> None:
+    """
+    Отметить в журнале файл подтвержденного диалога "Добавить в альбом", чтобы при откате пачки
+    и после перезапуска он не загружался повторно
+    :param pending: Неподтвержденные файлы пачки, подтвержденный файл из него удаляется
+    :param file: Файл диалога (dialog_file)
+    """
+    pending.remove(file)
+    ledger.record_files([file], UploadLedger.STATUS_UPLOADED, album_id, upload_state.batch_number)
+    save_progress(album_id, get_album_name())
 
 @print_function_name
 def get_add_dialogs(driver):
@@ -324,15 +451,95 @@ def get_add_dialogs(driver):
     return add_dialogs[::-1]
 
 @print_function_name
-def upload_to_album(driver: WebDriver, album_id: int, files: list[str]):
-    # Открытие созданного альбома на редактирование и догрузка в него остальных файлов
-    global index_file, index_to_album, size_to_album
+def report_batch_stats(stats: dict):
+    """
+    Вывести статистику пачки и записать ее в телеметрию
+    """
+    telemetry.record(
+        'batch', stats['seconds'], batch=upload_state.batch_number, size=stats['size'], success=stats['success'],
+        reason=stats['reason'], uploaded_files=stats['files'] if stats['success'] else 0,
+        uploaded_bytes=stats['bytes'] if stats['success'] else 0
+    )
+    result = "успешно" if stats['success'] else "откат"
+    reason = f", перегрузка: {stats['reason']}" if stats['reason'] else ""
+    print(f"Пачка {upload_state.batch_number}: {stats['files']} файлов из {stats['size']}, {result} за {stats['seconds']:.1f} сек, "
+          f"{stats['files_per_second']:.2f} файлов/сек, {size(int(stats['bytes_per_second']))}/сек, "
+          f"диалоги {stats['dialog_seconds']:.1f} сек, публикация {stats['publication_seconds']:.1f} сек, "
+          f"попапов {stats['popups']}{reason}. Следующая пачка: {stats['next_size']}")
+
+def network_mark(driver: WebDriver) -> int:
+    """
+    Отметка в потоке сетевых запросов браузера перед действием (0, если запросы не отслеживаются)
+    """
+    return NetworkTracker.for_driver(driver).mark() if network_tracking else 0
+
+def failed_uploads(driver: WebDriver) -> list:
+    """
+    Запросы загрузки файлов, завершившиеся ошибкой после прикрепления пачки
+    """
+    if not network_tracking:
+        return []
+    tracker = NetworkTracker.for_driver(driver)
+    tracker.poll()
+    return [request for request in tracker.completed
+            if request['seq'] > upload_state.network_mark and request['kind'] == NetworkTracker.KIND_UPLOAD and not request['ok']]
+
+def wait_publication(driver: WebDriver, since: int) -> bool:
+    """
+    Дождаться публикации фото после клика "Добавить в альбом".
+    С --networktrack - до ответа сервера на запрос публикации. Если запрос публикации не распознан
+    за network_config['publish_timeout'], и без --networktrack - до исчезновения текста "Публикация"
+    :param since: Отметка сетевых запросов перед кликом
+    :return: False если сервер ответил на публикацию ошибкой
+    """
+    if network_tracking:
+        request = NetworkTracker.for_driver(driver).wait(NetworkTracker.KIND_PUBLISH, since, network_config['publish_timeout'])
+        if request:
+            if not request['ok']:
+                print(f"Ошибка публикации: {request['error']}")
+            return request['ok']
+
+    WebDriverWait(driver, 500).until(lambda x: not driver.find_elements(By.XPATH, "//*[text()='Публикация']"))
+    return True
+
+def record_network_request(request: dict):
+    """
+    Записать завершенный запрос загрузки или публикации в телеметрию (задержка ответа сервера)
+    """
+    telemetry.record(f"network_{request['kind']}", request['latency'], status=request['status'], ok=request['ok'], error=request['error'])
+
+def print_network_stats(drivers: list):
+    """
+    Вывести статистику запросов загрузки и публикации по браузерам
+    """
+    for index, driver in enumerate(drivers):
+        for kind, stats in NetworkTracker.for_driver(driver).stats().items():
+            print(f"Браузер {index + 1}, запросы {kind}: {stats['count']}, ошибок {stats['failed']}, "
+                  f"ответ сервера в среднем {stats['avg_latency']:.2f} сек, максимум {stats['max_latency']:.2f} сек")
+
+def load_page(driver: WebDriver, url: str):
+    """
+    Открыть страницу с замером времени загрузки
+    """
+    wait_rate()
+    with telemetry.span('page_load', url=url):
+        driver.get(url)
+
+@telemetry.timed('upload_to_album')
+@print_function_name
+def upload_to_album(driver: WebDriver, album_id: int, files: list[str]) -> list:
+    """
+    Открытие созданного альбома на редактирование и догрузка в него остальных файлов
+    :return: Файлы, отложенные до следующей пачки (пачка уменьшена после отката)
+    """
+    deferred = []
 
     print(f"ID альбома: {album_id}")
 
     check_connection(driver)
-    driver.get(f"{home}media/set/edit/a.{album_id}")
-    add_dialogs = None
+    load_page(driver, f"{home}media/set/edit/a.{album_id}")
+    events = PageEventBus.for_driver(driver)
+    dialogs_count = 0
     problems_count = 0
 
     while True:
@@ -340,19 +547,31 @@ def upload_to_album(driver: WebDriver, album_id: int, files: list[str]):
         popup_text = check_popups(driver)
         if popup_text:
             print(f"Обнаружен попап {popup_text}")
-            print_progress_bar(size_to_album, size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
+            print_progress_bar(upload_state.size_to_album, upload_state.size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
             problems_count += 1
-            sleep_throttling(problems_count)
+            sleep_throttling(popup_text)
             print(f"Ошибок загрузки файлов: {problems_count}")
             continue
 
 
         print("Загрузка файлов")
         files_input = WebDriverWait(driver, 1000).until(EC.presence_of_element_located((By.XPATH, "//input[@type='file']")))
+        upload_state.batch_controller.start_batch()
+        upload_state.batch_number = next(batch_counter)
+        ledger.record_files(files, UploadLedger.STATUS_ATTACHED, album_id, upload_state.batch_number)
+        events.poll()
+        dialogs_mark = events.mark('add_dialogs')
+        driver.execute_script(FILE_PREVIEWS_SCRIPT)
         set_files_to_field(files_input, files)
+        # Файлы пачки, диалоги которых еще не подтверждены
+        pending = list(files)
+        confirmed_count = 0
+        unmatched_count = 0
 
-        # Кнопка "Добавить в альбом"
-        WebDriverWait(driver, 300).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Добавление в альбом']")))
+        # Кнопки "Добавить в альбом": о появлении диалогов сообщает браузер (PageEventBus)
+        if not events.wait('add_dialogs', dialogs_mark, pauses.events['add_dialogs_appear']):
+            raise TimeoutException("Диалоги 'Добавить в альбом' не появились")
+        dialogs_count = events.count('add_dialogs')
 
         prev_dialogs_count = 0
         problems_count = 0
@@ -362,19 +581,24 @@ def upload_to_album(driver: WebDriver, album_id: int, files: list[str]):
                 popup_text = check_popups(driver)
                 if popup_text:
                     print(f"Обнаружен попап {popup_text}")
-                    print_progress_bar(size_to_album, size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
+                    print_progress_bar(upload_state.size_to_album, upload_state.size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
+                    upload_state.batch_controller.observe_popup()
                     problems_count += 1
-                    sleep_throttling(problems_count)
+                    sleep_throttling(popup_text)
                     print(f"Ошибок добавления: {problems_count}")
 
-                add_dialogs = get_add_dialogs(driver)
-                dialogs_count = len(add_dialogs)
+                if prev_dialogs_count:
+                    # Диалоги не ищутся заново, пока браузер не сообщит, что их количество изменилось
+                    events.wait('add_dialogs', dialogs_mark, pauses.events['add_dialogs_change'])
+                dialogs_mark = events.mark('add_dialogs')
+                dialogs_count = events.count('add_dialogs')
                 print(f"Открытых диалоговых окон: {dialogs_count}")
 
                 if prev_dialogs_count != 0 and prev_dialogs_count == dialogs_count:
-                    print_progress_bar(size_to_album, size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
+                    print_progress_bar(upload_state.size_to_album, upload_state.size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
+                    upload_state.batch_controller.observe_stall()
                     problems_count += 1
-                    sleep_throttling(problems_count)
+                    sleep_throttling()
                     print(f"Ошибок добавления: {problems_count}")
 
                 if problems_count >= 100:
@@ -384,45 +608,91 @@ def upload_to_album(driver: WebDriver, album_id: int, files: list[str]):
 
                 prev_dialogs_count = dialogs_count
 
-                if not add_dialogs:
+                if not dialogs_count:
                     break
 
-                for index, button in enumerate(add_dialogs):
+                for button in get_add_dialogs(driver):
                     check_connection(driver)
+                    dialog_started = time.monotonic()
                     try:
                         button_container = button.find_element(By.XPATH, ".//ancestor::div[@aria-label=\"Добавить в альбом\"]")
-                        WebDriverWait(driver, 500).until(lambda x: button_container.get_attribute("aria-disabled") != "true" or button_container.get_attribute("aria-disabled") is None)
+                        WebDriverWait(driver, 500).until(lambda x: button_container.get_attribute("aria-disabled") != "true" or button_container.get_attribute("aria-disabled") is None or failed_uploads(driver))
+                        failed = failed_uploads(driver)
+                        if failed:
+                            # Сервер не принял файл - диалог не дождаться, пачка уйдет на повтор
+                            print(f"Ошибка загрузки файлов на сервер: {len(failed)}, {failed[-1]['error']}")
+                            upload_state.network_mark = failed[-1]['seq']
+                            upload_state.batch_controller.observe_timeout()
+                            break
+                        since = network_mark(driver)
+                        # После публикации диалог исчезает - его файл определяется до клика
+                        file = dialog_file(driver, button, pending)
+                        wait_rate()
                         button.click()
                     except WebDriverException:
                         continue
 
-                    print(f"Сохранение фото")
+                    gb.rc.print("Сохранение фото")
 
 
                     # После клика дождаться пока опубликуется
-                    WebDriverWait(driver, 500).until(lambda x: not driver.find_elements(By.XPATH, "//*[text()='Публикация']"))
-                    
-                    del add_dialogs[index]
+                    publication_started = time.monotonic()
+                    if not wait_publication(driver, since):
+                        problems_count += 1
+                        sleep_throttling()
+                        break
+                    publication_seconds = time.monotonic() - publication_started
+                    dialog_seconds = time.monotonic() - dialog_started
+                    upload_state.batch_controller.observe_publication(publication_seconds)
+                    upload_state.batch_controller.observe_dialog(dialog_seconds)
+                    telemetry.record('publication', publication_seconds, batch=upload_state.batch_number)
+                    telemetry.record('dialog', dialog_seconds, batch=upload_state.batch_number)
+                    rate_controller.success()
+                    confirmed_count += 1
+                    if file:
+                        checkpoint_dialog(album_id, pending, file)
+                    else:
+                        # Файл остается в pending: при откате он будет прикреплен повторно
+                        unmatched_count += 1
+                        print("Файл подтвержденного диалога не определен")
 
                     break  # После отправки формы список диалоговых окон нужно получать заново, т.к. самого верхнего окна в списке больше не осталось
 
             except TimeoutException:
-                print(f"Ошибка добавления: таймаут")
+                gb.rc.print("Ошибка добавления: таймаут", style="red")
+                upload_state.batch_controller.observe_timeout()
                 break
 
-        if add_dialogs:
-            print("Сброс счетчиков для текущего блока файлов")
-            for file in files:
-                index_file -= 1
-                index_to_album -= 1
-                size_to_album -= file[1][1]
+        if dialogs_count and pending:
+            ledger.record_files(pending, UploadLedger.STATUS_FAILED, album_id, upload_state.batch_number)
+            report_batch_stats(upload_state.batch_controller.finish_batch(False, len(files), sum(file[1][1] for file in files)))
+            if confirmed_count:
+                album_registry.add_items(album_id, confirmed_count, get_album_name())
+            print(f"Подтверждено диалогов {confirmed_count} из {len(files)}, файл не определен у {unmatched_count}. "
+                  f"Сброс счетчиков для неподтвержденных файлов")
+            for file in pending:
+                upload_state.index_file -= 1
+                upload_state.index_to_album -= 1
+                upload_state.size_to_album -= file[1][1]
+
+            # Повторно прикрепляются только файлы, диалоги которых не подтверждены
+            files = pending
 
             driver.refresh()
+
+            # Пачка уменьшена - лишние файлы откладываются до следующей пачки
+            next_size = upload_state.batch_controller.next_size()
+            if len(files) > next_size:
+                deferred = files[next_size:] + deferred
+                files = files[:next_size]
                     
             print("Идем грузить блок файлов заново")
             continue
 
         print("Сохранение списка фото успешно, идем за новым списком")
+        ledger.record_files(pending, UploadLedger.STATUS_UPLOADED, album_id, upload_state.batch_number)
+        report_batch_stats(upload_state.batch_controller.finish_batch(True, len(files), sum(file[1][1] for file in files)))
+        album_registry.add_items(album_id, len(files), get_album_name())
         break
 
     check_connection(driver)
@@ -438,13 +708,17 @@ def upload_to_album(driver: WebDriver, album_id: int, files: list[str]):
             if submit_label.get_attribute('aria-disabled'):
                 continue
 
+            wait_rate()
             submit_button.click()
         except WebDriverException:
             continue
         print("Отправка формы")
+        rate_controller.success()
         break
 
-    save_progress(album_id, index_file, get_album_name())
+    save_progress(album_id, get_album_name())
+
+    return deferred
 
 @print_function_name
 def get_album_name(driver: WebDriver = None, album_id: int = None) -> str:
@@ -455,29 +729,29 @@ def get_album_name(driver: WebDriver = None, album_id: int = None) -> str:
     :rtype: str
     :return: 
     """
-    global album_name
 
     if driver and album_id:
         current_page = driver.current_url
         driver.get(f"{home}media/set/edit/a.{album_id}")
-        album_name = WebDriverWait(driver, 100).until(EC.presence_of_element_located((By.XPATH, "//input[@type='text']"))).get_attribute("value")
+        upload_state.album_name = WebDriverWait(driver, 100).until(EC.presence_of_element_located((By.XPATH, "//input[@type='text']"))).get_attribute("value")
         driver.get(current_page)
 
-        return album_name
+        return upload_state.album_name
     else:
-        if album_name and album_name != "":
-            return album_name
+        if upload_state.album_name and upload_state.album_name != "":
+            return upload_state.album_name
         else:
-            album_name = folder.split("\\")
+            album_name = upload_state.folder.split("\\")
             album_name = list(filter(None, album_name))
 
             del album_name[0]
             del album_name[0]
             album_name = '\\'.join(album_name)
-            album_name = album_name.replace('\\\\', '\\')
+            upload_state.album_name = album_name.replace('\\\\', '\\')
 
-            return album_name
+            return upload_state.album_name
 
+@telemetry.timed('create_album')
 @print_function_name
 def create_album(driver: WebDriver, album_name, files: list[str]):
     """
@@ -494,13 +768,15 @@ def create_album(driver: WebDriver, album_name, files: list[str]):
     :rtype: tuple[int, str]
     """
     print(inspect.currentframe().f_code.co_name.replace("_", " "))
-    global index_file, index_to_album
 
     check_connection(driver)
-    driver.get(home + "media/set/create")
+    load_page(driver, home + "media/set/create")
 
     check_connection(driver)
     files_input = WebDriverWait(driver, 100).until(EC.presence_of_element_located((By.XPATH, "//input[@type='file']")))
+    upload_state.batch_controller.start_batch()
+    upload_state.batch_number = next(batch_counter)
+    ledger.record_files(files, UploadLedger.STATUS_ATTACHED, batch=upload_state.batch_number)
     set_files_to_field(files_input, files)
 
     check_connection(driver)
@@ -522,9 +798,10 @@ def create_album(driver: WebDriver, album_name, files: list[str]):
         popup_text = check_popups(driver)
         if popup_text:
             print(f"Обнаружен попап {popup_text}")
-            print_progress_bar(size_to_album, size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
+            print_progress_bar(upload_state.size_to_album, upload_state.size_all_files, prefix='Текущий прогресс:', suffix='Complete', length=50)
+            upload_state.batch_controller.observe_popup()
             popup_count += 1
-            sleep_throttling(popup_count)
+            sleep_throttling(popup_text)
             print(f"Ошибок добавления: {popup_count}")
 
         # проверка на ошибки загрузки отдельных файлов
@@ -558,6 +835,7 @@ def create_album(driver: WebDriver, album_name, files: list[str]):
             album_description = driver.find_element(By.XPATH, "//*[text()='Описание (необязательно)']").find_element(By.XPATH, "..").find_element(By.XPATH, '//textarea')
             album_description.send_keys(album_name)
 
+            wait_rate()
             submit_button.click()
         except WebDriverException:
             continue
@@ -572,7 +850,12 @@ def create_album(driver: WebDriver, album_name, files: list[str]):
 
     query_def = parse.parse_qs(parse.urlparse(driver.current_url).query).get('set')[0]
     album_id = query_def.lstrip('a.')
-    save_progress(album_id, index_file, album_name)
+    rate_controller.success()
+    ledger.record_files(files, UploadLedger.STATUS_UPLOADED, album_id, upload_state.batch_number)
+    report_batch_stats(upload_state.batch_controller.finish_batch(True, len(files), sum(file[1][1] for file in files)))
+    album_registry.update(album_id, album_name, len(files))
+    album_registry.save()
+    save_progress(album_id, album_name)
 
     return int(album_id)
 
@@ -592,14 +875,14 @@ def set_album_confidentiality(driver: WebDriver, album_id: int):
         if popup_text:
             print(f"Обнаружен попап {popup_text}")
             problems_count += 1
-            sleep_throttling(problems_count)
+            sleep_throttling(popup_text)
             continue
         else:
             break
     
     check_connection(driver)
     print('Настройка видимости альбома')
-    driver.get(f"{home}media/set/edit/a.{album_id}")
+    load_page(driver, f"{home}media/set/edit/a.{album_id}")
     button = WebDriverWait(driver, 100).until(EC.presence_of_element_located((By.XPATH, "//*[contains(@aria-label,'Изменить конфиденциальность.')]")))
     button.click()
     WebDriverWait(driver, 100).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Выберите аудиторию']")))
@@ -623,20 +906,65 @@ def parse_cli_args():
     run.py --folder "Узбекистан" --splitedsize=3 --rootfolder G:\\PHOTO
     run.py --folder "Узбекистан" --splitedsize=1 --rootfolder G:\\PHOTO --headless
     run.py --folder "Узбекистан" --splitedsize=5 --rootfolder G:\\PHOTO --headless --albumid=4003113339960597
+    run.py --folder "Домашние" --rootfolder D:\\PHOTO --checkduplicates --compacthashindex
+    run.py --invalidatehashindex "D:\\PHOTO\\Домашние"
+    run.py --folder "Домашние" --rootfolder D:\\PHOTO --checkduplicates --hashworkers=16 --hashalgorithm=blake2b
+    run.py --ledgerstats
+    run.py --folder "Узбекистан" --splitedsize=5 --maxbatchsize=50 --rootfolder G:\\PHOTO --headless
+    run.py --folder "Узбекистан" --splitedsize=10 --fixedbatch --rootfolder G:\\PHOTO
+    run.py --tree "D:\\PHOTO\\Домашние" --checkduplicates --headless
+    run.py --tree "G:\\PHOTO" --treeorder=size_desc --treepriority "Узбекистан" "Хабаровск"
+    run.py --tree "G:\\PHOTO" --workers=3 --maxconcurrent=2 --headless
+    run.py --folder "Узбекистан" --rootfolder G:\\PHOTO --watchinterval=2
+    run.py --folder "Узбекистан" --rootfolder G:\\PHOTO --benchattach
+    run.py --folder "Узбекистан" --rootfolder G:\\PHOTO --refreshalbums
+    run.py --folder "Узбекистан" --rootfolder G:\\PHOTO --optimize --maxedge=2048 --quality=85
+    run.py --folder "Узбекистан" --rootfolder G:\\PHOTO --networktrack
 
     """
     global folder, renew_cookie, splited_size, root_folder, is_headless, check_duplicates, recursive, album_id
+    global compact_hash_index, invalidate_hash_index, hash_algorithm, hash_workers, show_ledger_stats
+    global fixed_batch_size, max_batch_size, tree_root, tree_order, tree_priority, tree_rescan
+    global upload_workers, max_concurrent_uploads, watcher_interval, bulk_attach, bench_attach, refresh_albums
+    global optimize_images, optimize_max_edge, optimize_quality, network_tracking
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('--folder', dest='folder', type=str, help='Full path to the folder', required=True)
-    parser.add_argument('--splitedsize', help='How many files to send to the album per iteration', type=int, default=20)
+    parser.add_argument('--folder', dest='folder', type=str, help='Full path to the folder')
+    parser.add_argument('--splitedsize', help='How many files to send to the album in the first iteration, adapted at runtime', type=int, default=20)
+    parser.add_argument('--maxbatchsize', help='Upper limit for the adaptive batch size', type=int, default=batching_config['max_size'])
+    parser.add_argument('--fixedbatch', help='Keep --splitedsize for every iteration', action="store_true")
     parser.add_argument('--rootfolder', help='Root folder for target folder', type=str)
     parser.add_argument('--headless', help='Run without any GUI', action="store_true")#todo очистку прогресса добавить
     parser.add_argument('--renewcookie', help='Force renew cookie', action="store_true")
     parser.add_argument('--checkduplicates', help='Check for duplicates before uploading', action="store_true")
     parser.add_argument('--recursive', help='Search files in subfolders', action="store_true")
     parser.add_argument('--albumid', help='Album id for upload', type=int)
+    parser.add_argument('--compacthashindex', help='Compact the hash index and drop entries of missing files', action="store_true")
+    parser.add_argument('--invalidatehashindex', help='Drop hash index entries under the path (whole index if no path given)', nargs='?', const='', type=str)
+    parser.add_argument('--hashworkers', help='How many threads hash files for duplicate check', type=int, default=hashing_config['workers'])
+    parser.add_argument('--hashalgorithm', help='Hash algorithm for duplicate check', choices=list(HASH_ALGORITHMS.keys()), default=hashing_config['algorithm'])
+    parser.add_argument('--ledgerstats', help='Print uploaded files per album from the upload ledger', action="store_true")
+    parser.add_argument('--tree', help='Upload every folder with images under the root, one album per folder, in one browser session', type=str)
+    parser.add_argument('--treeorder', help='Order of folders in tree mode', choices=list(TreeScheduler.orders.keys()), default='size')
+    parser.add_argument('--treepriority', help='Folder name patterns uploaded first in tree mode', nargs='*', default=[])
+    parser.add_argument('--treerescan', help='Upload new files in folders already finished in tree mode', action="store_true")
+    parser.add_argument('--workers', help='How many browsers upload in parallel, each with its own Chrome profile', type=int, default=workers_config['count'])
+    parser.add_argument('--refreshalbums', help='Look the album up on the albums page even if it is in the local album registry', action="store_true")
+    parser.add_argument('--singleattach', help='Attach files to the upload field one by one instead of in one call', action="store_true")
+    parser.add_argument('--benchattach', help='Measure attach time for 1/20/100-file batches on a local test page and exit', action="store_true")
+    parser.add_argument('--watchinterval', help='Seconds between page checks for offline and unavailable messages', type=float, default=pauses.events['poll_interval'])
+    parser.add_argument('--optimize', help='Downscale and re-encode images before upload, cached between runs', action="store_true")
+    parser.add_argument('--maxedge', help='Longest image side in pixels for --optimize', type=int, default=optimize_config['max_edge'])
+    parser.add_argument('--quality', help='JPEG quality for --optimize', type=int, default=optimize_config['quality'])
+    parser.add_argument('--networktrack', help='Track upload and publish requests through Chrome DevTools Network events instead of page texts', action="store_true")
+    parser.add_argument('--maxconcurrent', help='How many batches may upload at the same time across all browsers', type=int, default=workers_config['max_concurrent'])
     args = parser.parse_args()
+    if args.folder and args.tree:
+        parser.error('argument --tree: not allowed with argument --folder')
+    if args.benchattach and not args.folder:
+        parser.error('argument --benchattach: requires --folder')
+    if not args.folder and not args.tree and not args.compacthashindex and args.invalidatehashindex is None and not args.ledgerstats:
+        parser.error('the following arguments are required: --folder or --tree')
     folder = args.folder
     renew_cookie = args.renewcookie
     splited_size = args.splitedsize
@@ -645,6 +973,27 @@ def parse_cli_args():
     check_duplicates = args.checkduplicates
     recursive = args.recursive
     album_id = args.albumid
+    compact_hash_index = args.compacthashindex
+    invalidate_hash_index = args.invalidatehashindex
+    hash_workers = args.hashworkers
+    hash_algorithm = args.hashalgorithm
+    show_ledger_stats = args.ledgerstats
+    max_batch_size = args.maxbatchsize
+    fixed_batch_size = args.fixedbatch
+    tree_root = args.tree
+    tree_order = args.treeorder
+    tree_priority = args.treepriority
+    tree_rescan = args.treerescan
+    upload_workers = max(1, args.workers)
+    max_concurrent_uploads = max(1, args.maxconcurrent)
+    watcher_interval = args.watchinterval
+    bulk_attach = not args.singleattach
+    bench_attach = args.benchattach
+    refresh_albums = args.refreshalbums
+    optimize_images = args.optimize
+    optimize_max_edge = args.maxedge
+    optimize_quality = args.quality
+    network_tracking = args.networktrack
 
 #todo надо проверить клик по окну "Вы врененно заблокированы", возможно он не работает
 #todo если время паузы стало очень большое, то пробуем ребутнуть страницу и загрузить заново
@@ -670,26 +1019,122 @@ def print_progress_bar(iteration, total, prefix = '', suffix = '', decimals = 1,
         print()
 
 @print_function_name
+def attach_files(files_input: WebElement, paths: list[str], bulk: bool = True) -> bool:
+    """
+    Передать файлы в поле <input type="file">
+    :param bulk: Передать все файлы одной командой (пути через перевод строки), иначе по одному
+    :return: True если файлы переданы одной командой
+    """
+    if bulk and len(paths) > 1:
+        try:
+            files_input.send_keys("\n".join(paths))
+            return True
+        except WebDriverException as e:
+            # Поле не принимает несколько файлов - передаем по одному
+            print(f"Не удалось передать файлы одной командой: {e}")
+
+    for path in paths:
+        files_input.send_keys(path)
+        sleep(0.2)
+    return False
+
 def set_files_to_field(files_input: WebElement, files: list):
-    global index_file, index_to_album, count_all_files, size_to_album, size_all_files
 
     # Initial call to print 0% progress
-    print_progress_bar(size_to_album, size_all_files, prefix='Progress:', suffix='Complete', length=50)
+    print_progress_bar(upload_state.size_to_album, upload_state.size_all_files, prefix='Progress:', suffix='Complete', length=50)
+
+    upload_state.network_mark = network_mark(files_input.parent)
+    wait_rate()
+    started = time.monotonic()
+    is_bulk = attach_files(files_input, [file[1][-1] for file in files], bulk_attach)
+    attach_seconds = time.monotonic() - started
+    telemetry.record('attach', attach_seconds, batch=upload_state.batch_number, files=len(files), bytes=sum(file[1][1] for file in files), bulk=is_bulk)
 
     for file in files:
-        ipath = file[1][-1]
         print(f"Загрузка фото: {file[1][0]} {size(file[1][1])}")
-        files_input.send_keys(ipath)
-        sys.stdout.flush()
-        index_file += 1
-        index_to_album += 1
-        size_to_album += file[1][1]
-        print(
-            f"Загружено {index_to_album} фото из {count_all_files} ({size(size_to_album)} из {size(size_all_files)})",
-            flush=True
-        )
-        print_progress_bar(size_to_album, size_all_files, prefix='Progress:', suffix='Complete', length=50)
-        sleep(0.2)
+        upload_state.index_file += 1
+        upload_state.index_to_album += 1
+        upload_state.size_to_album += file[1][1]
+
+    print(
+        f"Загружено {upload_state.index_to_album} фото из {upload_state.count_all_files} ({size(upload_state.size_to_album)} из {size(upload_state.size_all_files)}), "
+        f"файлы переданы {'одной командой' if is_bulk else 'по одному'} за {attach_seconds:.2f} сек",
+        flush=True
+    )
+    print_progress_bar(upload_state.size_to_album, upload_state.size_all_files, prefix='Progress:', suffix='Complete', length=50)
+
+def print_telemetry_summary():
+    """
+    Итоги запуска по телеметрии: скорость загрузки, время этапов (p50/p95), время, потерянное на паузах
+    """
+    summary = telemetry.summary()
+    elapsed = telemetry.elapsed()
+    batches = summary.get('batch', {}).get('fields', {})
+    files_count = batches.get('uploaded_files', 0)
+    bytes_count = batches.get('uploaded_bytes', 0)
+
+    print(f"Телеметрия ({telemetry_filename}): {elapsed:.0f} сек, загружено {files_count} файлов {size(bytes_count)}, "
+          f"{files_count / elapsed if elapsed else 0:.2f} файлов/сек, {bytes_count / elapsed / 1024 / 1024 if elapsed else 0:.2f} МБ/сек")
+    for phase, stats in sorted(summary.items(), key=lambda item: -item[1]['total']):
+        if phase == 'run':
+            continue
+        print(f"  {phase}: {stats['count']} раз, всего {stats['total']:.1f} сек, "
+              f"p50 {stats['p50']:.2f} сек, p95 {stats['p95']:.2f} сек, макс {stats['max']:.2f} сек")
+
+    throttling = summary.get('throttling', {}).get('total', 0.0)
+    offline = summary.get('offline', {}).get('total', 0.0)
+    rate_wait = summary.get('rate_wait', {}).get('total', 0.0)
+    print(f"Потеряно на паузах после ошибок: {throttling:.0f} сек ({throttling / elapsed * 100 if elapsed else 0:.1f}%), "
+          f"на ожидании темпа: {rate_wait:.0f} сек, без соединения: {offline:.0f} сек")
+
+def print_optimizer_stats():
+    """
+    Вывести статистику уменьшения изображений: сколько файлов уменьшено и сколько байт не пришлось загружать
+    """
+    optimizer = image_optimizer
+    print(
+        f"Уменьшение изображений: уменьшено {optimizer.optimized_files}, из кэша {optimizer.cached_files}, "
+        f"без изменений {optimizer.kept_files}, ошибок {optimizer.failed_files}, "
+        f"{size(optimizer.original_bytes)} -> {size(optimizer.optimized_bytes)}, сэкономлено {size(optimizer.saved_bytes)} "
+        f"({optimizer.seconds:.1f} сек в {optimizer.workers} потоков)"
+    )
+
+# Тестовая страница замера передачи файлов: только поле загрузки
+BENCHMARK_PAGE = "data:text/html,<input type='file' multiple>"
+
+@print_function_name
+def benchmark_attach(driver: WebDriver, pipeline: DiscoveryPipeline, batch_sizes: tuple = (1, 20, 100)):
+    """
+    Сравнить время передачи пачки файлов в поле загрузки одной командой и по одному.
+    Файлы передаются в поле отдельной тестовой страницы, не связанной с Facebook: ничего не загружается
+    и не остается открытых диалогов. Замеры пишутся в телеметрию (фаза benchmark_attach)
+    """
+    files = pipeline.next_batch(max(batch_sizes))
+    paths = [file[1][-1] for file in files]
+    if not paths:
+        print("Файлы для замера не найдены")
+        return
+
+    results = []
+    for batch_size in batch_sizes:
+        if batch_size > len(paths):
+            print(f"Пачка {batch_size}: недостаточно файлов в папке ({len(paths)})")
+            continue
+
+        for bulk in (False, True):
+            driver.get(BENCHMARK_PAGE)
+            files_input = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.XPATH, "//input[@type='file']")))
+            started = time.monotonic()
+            is_bulk = attach_files(files_input, paths[:batch_size], bulk)
+            seconds = time.monotonic() - started
+            telemetry.record('benchmark_attach', seconds, files=batch_size, bulk=is_bulk)
+            results.append((batch_size, 'одной командой' if is_bulk else 'по одному', seconds))
+
+    driver.get("about:blank")
+
+    print("Передача файлов в поле загрузки:")
+    for batch_size, mode, seconds in results:
+        print(f"Пачка {batch_size}: {mode} {seconds:.2f} сек, {seconds / batch_size * 1000:.0f} мс на файл")
 
 @print_function_name
 def check_popups(driver):
@@ -700,8 +1145,13 @@ def check_popups(driver):
     need_return = False
     popup_text = None
     try:
-        popup = driver.find_element(By.XPATH, "//*[text()='Вы временно заблокированы' or text()='Мы удалили вашу публикацию' or text()='Что произошло']")
-        popup_text = popup.text
+        # Попапы отслеживаются в браузере, здесь только одна выборка событий
+        events = PageEventBus.for_driver(driver)
+        events.poll()
+        if not events.present('popup'):
+            return False
+
+        popup_text = events.text('popup')
         buttons = driver.find_elements(By.XPATH, "//*[text()='OK' or @aria-label='Закрыть']")
 
         for button in buttons:
@@ -752,19 +1202,27 @@ def search_folder_recursive(folder: str, root_path: str = '.') -> str|None:
     return paths[0] if paths else None
 
 def get_hash(f):
-    # BUF_SIZE is totally arbitrary, change for your app!
-    BUF_SIZE = 65536  # lets read stuff in 64kb chunks!
+    return hash_file(f, hash_algorithm)
+
+@print_function_name
+def open_hash_index() -> HashIndex:
+    """
+    Загрузить индекс хешей и выполнить запрошенные команды обслуживания индекса
+    :return: Загруженный индекс хешей
+    """
+    hash_index = HashIndex(Path(hash_index_filename), hash_algorithm)
+    loaded = hash_index.load()
+    print(f"Индекс хешей {hash_index_filename}: записей {loaded}, устаревших записей {hash_index.stale_records}")
 
-    md5 = hashlib.md5()
+    if invalidate_hash_index is not None:
+        removed = hash_index.invalidate(invalidate_hash_index)
+        print(f"Индекс хешей: удалено записей {removed}")
 
-    with open(f, 'rb') as f:
-        while True:
-            data = f.read(BUF_SIZE)
-            if not data:
-                break
-            md5.update(data)
+    if compact_hash_index:
+        kept, dropped = hash_index.compact()
+        print(f"Индекс хешей сжат: осталось записей {kept}, удалено {dropped}")
 
-    return md5.hexdigest()
+    return hash_index
 
 @print_function_name
 def get_files_size(files: list, print: bool = True) -> int|str:
@@ -790,59 +1248,123 @@ def get_profile_id(driver):
         return profile_id
 #todo кэш для вычисленных значений
 
+# Альбомы, видимые на странице альбомов: ID из ссылки, название, количество объектов
+COLLECT_ALBUMS_SCRIPT = """
+var albums = [];
+document.querySelectorAll("a[href*='set=a.']").forEach(function (link) {
+    var match = /set=a\\.(\\d+)/.exec(link.href);
+    if (!match) return;
+    var name = null;
+    var count = null;
+    link.querySelectorAll('span').forEach(function (span) {
+        var text = (span.textContent || '').trim();
+        if (!text || span.children.length) return;
+        if (/объект/.test(text)) {
+            if (count === null) count = parseInt(text.replace(/\\D/g, ''), 10) || 0;
+        } else if (name === null) {
+            name = text;
+        }
+    });
+    if (name !== null) albums.push({id: match[1], name: name, count: count});
+});
+return albums;
+"""
+
 @print_function_name
-def find_album(driver: WebDriver, album_name):
+def find_album(driver: WebDriver, album_name) -> tuple:
     """
     https://www.facebook.com/profile.php?id=100007859116486&sk=photos_albums
+    Альбом ищется в локальном реестре. Страница альбомов открывается, только если альбома нет в реестре
+    или задан --refreshalbums, и прокручивается, пока не найден альбом или не встретился уже известный альбом
+    (новые альбомы на странице идут первыми)
     @todo поиск альбома сделать опциональным
-    @todo оптимизировать поиск, чтобы искал в процессе прокрутки
+    :return: (ID альбома, количество объектов), (None, 0) если альбом не найден
     """
-    driver.get(f"{home}profile.php?id={get_profile_id(driver)}&sk=photos_albums")
-
-    scroll_to_end(driver)
-
-    # Далее ищем текст внутри span
-    try:
-        """
-        Этот вариант корректно работает для случаев: 
-        ✅ "album_name"
-        ✅ "album_name 2"
-        ✅ "album_name 15"
-        ❌ "album_name xyz" (отфильтрует, так как нет числа в конце)
-        """
-        span_elements = driver.find_elements(By.XPATH,f"//span[text()='{album_name}' or (starts-with(text(), '{album_name} ') and text()[string-length() - string-length(translate(text(), '0123456789', ''))] > 0)]")
-        span_element = span_elements[-1]
-    except NoSuchElementException:
-        return None
-
-    # Найти родителя ссылку и выдернуть id из выражения href="https://www.facebook.com/media/set/?set=a.3784912368447363&type=3"
-    parent_link = span_element.find_element(By.XPATH, "./ancestor::a")
-    count_text = parent_link.find_element(By.XPATH, f"//*[contains(text(), 'объекта')]")
-    number = int(re.sub(r"\D", "", count_text))
-
-    # Извлечь id из href
-    href = parent_link.get_attribute("href")
-    match = re.search(r"set=a\.(\d+)", href)
-    if match:
-        media_id = match.group(1)
-        return (media_id, number)
-    else:
-        return None
+    if not refresh_albums:
+        found = album_registry.find(album_name)
+        if found:
+            print(f"Альбом {album_name} найден в реестре альбомов")
+            return found
+
+    load_page(driver, f"{home}profile.php?id={get_profile_id(driver)}&sk=photos_albums")
+
+    known_ids = set(album_registry.albums) if album_registry.complete and not refresh_albums else set()
+    state = {'found': False, 'boundary': False}
+
+    def scan_albums() -> bool:
+        albums = driver.execute_script(COLLECT_ALBUMS_SCRIPT)
+        album_registry.merge(albums)
+        state['found'] = any(AlbumRegistry.name_suffix(album['name'], album_name) is not None for album in albums)
+        state['boundary'] = any(album['id'] in known_ids for album in albums)
+        return state['found'] or state['boundary']
+
+    scroll_to_end(driver, until=scan_albums)
+    if not state['found'] and not state['boundary']:
+        # Страница просмотрена до конца - в реестре все альбомы профиля
+        scan_albums()
+        album_registry.mark_complete()
+    album_registry.save()
+
+    found = album_registry.find(album_name)
+    return found if found else (None, 0)
+
+# Один шаг прокрутки: прокрутка на высоту окна, и, если достигнут низ страницы, ожидание в браузере
+# роста scrollHeight или отсутствия новых сетевых запросов (performance resource entries) в течение idle мс
+SCROLL_STEP_SCRIPT = """
+var timeout = arguments[0], idle = arguments[1], interval = arguments[2];
+var done = arguments[arguments.length - 1];
+function height() {
+    return Math.max(document.body.scrollHeight, document.documentElement.scrollHeight);
+}
+function resources() {
+    return window.performance ? performance.getEntriesByType('resource').length : 0;
+}
+var before = height();
+var started = Date.now(), lastRequest = started, requests = resources();
+window.scrollBy(0, window.innerHeight);
+(function check() {
+    var now = Date.now(), current = height(), count = resources();
+    if (count !== requests) { requests = count; lastRequest = now; }
+    var result = {height: current, grew: current > before, atEnd: false, timedOut: false, waited: now - started};
+    if (window.scrollY + window.innerHeight < current - 1 || result.grew) return done(result);
+    if (now - lastRequest >= idle) { result.atEnd = true; return done(result); }
+    if (now - started >= timeout) { result.atEnd = true; result.timedOut = true; return done(result); }
+    setTimeout(check, interval);
+})();
+"""
 
 @print_function_name
-def scroll_to_end(driver: WebDriver, pause_time=3):
+def scroll_to_end(driver: WebDriver, timeout=None, until=None) -> dict:
     """
-    Функция для прокрутки страницы до конца и проверки, что прокрутка завершена.
+    Функция для прокрутки страницы до конца.
+    Страница прокручивается на высоту окна одним вызовом скрипта. Ожидание есть только внизу страницы:
+    до роста высоты страницы (подгрузился следующий фрагмент) или до окончания сетевых запросов
+    :param timeout: Максимальное ожидание подгрузки внизу страницы в секундах
+    :param until: Функция без аргументов, проверяется перед каждой прокруткой, True - прокрутка прекращается
+    :return: Статистика прокрутки (steps, waits, timeouts, seconds)
     """
+    timeout = timeout or pauses.scroll['growth_timeout']
+    driver.set_script_timeout(timeout + 5)
+
+    started = time.time()
+    stats = {'steps': 0, 'waits': 0, 'timeouts': 0, 'seconds': 0.0}
+    while not (until and until()):
+        result = driver.execute_async_script(
+            SCROLL_STEP_SCRIPT, int(timeout * 1000), int(pauses.scroll['network_idle'] * 1000),
+            pauses.scroll['check_interval']
+        )
+        stats['steps'] += 1
+        if result['grew']:
+            stats['waits'] += 1
+        if result['timedOut']:
+            stats['timeouts'] += 1
+        if result['atEnd']:
+            break
 
-    # Найти элемент body для прокрутки страницы
-    body = driver.find_element(By.TAG_NAME, 'body')
-
-    #last_height = driver.execute_script("return document.body.scrollHeight")
-
-    while can_scroll_down(driver):
-        body.send_keys(Keys.SPACE)
-        sleep(pause_time)  # Небольшая задержка, чтобы страница успела прогрузиться
+    stats['seconds'] = time.time() - started
+    print(f"Прокрутка: шагов {stats['steps']}, подгрузок {stats['waits']}, таймаутов {stats['timeouts']}, "
+          f"{stats['seconds']:.1f} сек")
+    return stats
 
 @print_function_name
 def wait_for_page_load(driver: WebDriver, timeout=1):
@@ -860,13 +1382,6 @@ def wait_for_page_load(driver: WebDriver, timeout=1):
     print("Тайм-аут: страница не загрузилась полностью.")
     return False
 
-def can_scroll_down(driver):
-    """ Функция для проверки возможности дальнейшей прокрутки вниз """
-    current_scroll = driver.execute_script("return window.scrollY + window.innerHeight;")
-    total_height = driver.execute_script("return document.body.scrollHeight;")
-    return current_scroll < total_height
-
-
 @print_function_name
 def wait_for_element(driver: WebDriver, by: str, timeout: int = 1) -> None:
     """
@@ -885,43 +1400,35 @@ def wait_for_element(driver: WebDriver, by: str, timeout: int = 1) -> None:
 
 def check_connection(driver: WebDriver):
     """
-    распознавать сообщение об отсуствии интернета и ставить процесс на паузу
+    распознавать сообщение об отсуствии интернета и ставить процесс на паузу.
+    Пока страница недоступна, загрузка тоже стоит; страница обновляется здесь, в потоке загрузчика,
+    чтобы обновление не прерывало работу с ней на середине
     """
-    while True:
-        if connection_status == False:
-            try:
-                WebDriverWait(driver, 500).until(lambda x: connection_status == True)
-            except TimeoutException:
-                continue    
-            break
-        break
+    watcher = Watcher.for_driver(driver)
+    if watcher is None:
+        return
 
+    if watcher.online.is_set() and watcher.page_available.is_set():
+        return
 
-def main():
-    global index_file, folder, size_all_files, count_all_files, album_id
-    # todo проверка если куки истекли, но по факту авторизаци с ними произошал успешно
-
-    # Your Facebook account user and password
-    usr = config.USER_NAME
-    pwd = config.PASSWORD
-
-    if not usr or not pwd:
-        print("Error: Missing Facebook credentials.")
-        sys.exit(1)
-    #cookie_filename = usr + ' ' + cookie_filename todo в название файла логин добавить
-    #todo Эта публикация нарушает наши Нормы сообщества - это сообщение обрабатывать
-    #todo Не удалось опубликовать фото - обрабатывать попап-ошибку - это такой же попап как и Вы временно заблокированы
-    #todo Вы временно заблокированы - страница /media/set/edit/a.3967419006863364
+    with telemetry.span('offline'):
+        while not watcher.online.wait(500):
+            continue
 
-    parse_cli_args()
+    with telemetry.span('page_unavailable'):
+        while not watcher.page_available.wait(pauses.events['page_unavailable_refresh']):
+            print("Страница сейчас недоступна. Обновление страницы")
+            try:
+                driver.refresh()
+            except WebDriverException:
+                pass
 
-    driver = get_driver()
 
+@print_function_name
+def authorize(driver: WebDriver, usr: str, pwd: str):
     # Go to facebook.com
     driver.get(home)
 
-    Watcher(driver)
-
     is_authorized = False
     # todo после сокрытия попапа "Что произошло" паузу не делать
     
@@ -959,49 +1466,81 @@ def main():
 
     driver.refresh()
 
-    #todo пройтись по структуре папок и собрать папки на аплоад и создание альбомов
+def uploaded_filter(folder_album_id):
+    """
+    Проверка, загружен ли файл в альбом папки
+    :param folder_album_id: ID альбома папки (None - альбом еще не создан)
+    :return: Функция, которая по ключу файла возвращает True, если файл нужно пропустить
+    """
 
-    if folder.split('\\').__len__() == 1:
-        # Задано только название папки, а не полный путь - найти папку
-        folder = search_folder_recursive(folder, root_folder.replace('\\\\', '\\') if root_folder else 'D:\\')
+    def is_uploaded(key) -> bool:
+        if not check_duplicates:
+            # Ключ файла содержит путь, поэтому файл не может оказаться в альбоме другой папки
+            return ledger.is_uploaded(key)
+        if folder_album_id and ledger.is_uploaded(key, folder_album_id):
+            return True
+        albums = ledger.uploaded_albums(key)
+        if albums:
+            print(f"Файл {key} уже загружен в альбом {', '.join(sorted(albums))}, загружается и в альбом папки")
+        return False
 
-    print(f"Полный путь к папке {folder}")
-    #todo при заблокированности теймер до повторной попытки выводить
+    return is_uploaded
 
-    files = {
-        (get_hash(join(root, f)) if check_duplicates else join(root, f)): (
-        f, os.path.getsize(join(root, f)), join(root, f))
-        for root, _, filenames in (os.walk(folder) if recursive else [(folder, [], listdir(folder))])
-        for f in filenames
-        if isfile(join(root, f))
-           and filetype.is_image(join(root, f))
-           and os.path.splitext(f)[1].lower() not in ['.psd', '.mpo', '.thm']
-    }
+@print_function_name
+def start_folder(hash_index: HashIndex, job_folder: str, files: list = None) -> DiscoveryPipeline:
+    """
+    Сделать папку текущей и запустить поиск файлов в ней
+    :param job_folder: Полный путь к папке
+    :param files: Файлы папки, уже найденные при обходе дерева [(полное название, название, stat)]
+    :return: Запущенный поиск файлов
+    """
 
-    driver.get(home)
+    upload_state.folder = job_folder
+    upload_state.album_name = ""
+    upload_state.index_file = 1
+    upload_state.index_to_album = 0
+    upload_state.size_to_album = 0
+    upload_state.count_all_files = 0
+    upload_state.size_all_files = 0
 
-    #files {id: (название, размер, полное название)}
-    if files:
-        files = [(id, (name, size, full_name)) for id, (name, size, full_name) in files.items()]
-        # files [(id, (название, размер, полное название))]
-        all_files = files.copy()
+    # Уже загруженные в альбом папки файлы пропускаются по журналу, независимо от их положения в папке
+    record = ledger.albums.get(job_folder)
+    pipeline = DiscoveryPipeline(upload_state.folder, recursive, hash_index if check_duplicates else None, skip=uploaded_filter(album_id or (record and record['album_id'])), files=files, optimizer=image_optimizer)
+    pipeline.start()
+
+    return pipeline
+
+@print_function_name
+def upload_batches(driver: WebDriver, pipeline: DiscoveryPipeline, album_id: int, files: list):
+    """
+    Догрузить в альбом все файлы папки пачками
+    """
+    while files:
+        upload_state.count_all_files, upload_state.size_all_files = pipeline.discovered_count, pipeline.discovered_size
+        with upload_slots:
+            deferred = upload_to_album(driver, album_id=album_id, files=files)
+        pipeline.requeue(deferred)
+        files = pipeline.next_batch(upload_state.batch_controller.next_size())
 
-        progress = restore_progress()
-        if progress:
-            index_file = progress[1]
-            del files[0:index_file]
+@print_function_name
+def upload_folder(driver: WebDriver, pipeline: DiscoveryPipeline, forced_album_id: int = None, workers: UploadWorkers = None) -> tuple[int, int]:
+    """
+    Загрузить файлы текущей папки в альбом: найти или создать альбом и догрузить в него все файлы
+    :param forced_album_id: ID альбома, заданный при запуске
+    :param workers: Браузеры, которые догружают пачки в альбом параллельно
+    :return: Количество и объем загруженных файлов
+    """
 
-        count_all_files = len(files)
-        if count_all_files == 0:
-            files = all_files
-        count_all_files = len(files)
+    album_id = forced_album_id
+    progress = restore_progress()
 
-        size_all_files = get_files_size(files, False)
-        size_all_files_formatted = get_files_size(files, True)
+    driver.get(home)
 
-        print(f"Найдено файлов для загрузки {count_all_files} {size_all_files_formatted}")
+    files = pipeline.next_batch(upload_state.batch_controller.next_size())
 
-        files_splited = [files[x:x + splited_size] for x in range(0, len(files), splited_size)]
+    #files [(id, (название, размер, полное название))]
+    if files:
+        upload_state.count_all_files, upload_state.size_all_files = pipeline.discovered_count, pipeline.discovered_size
 
         if album_id:# задан в параметрах при запуске
             album_name = get_album_name(driver, album_id)
@@ -1017,40 +1556,196 @@ def main():
 
                 if not album_id:
                     print(f"Альбом {album_name} не найден")
-                    album_id = create_album(driver, album_name, files_splited[0])
-                    del files_splited[0]
+                    with upload_slots:
+                        album_id = create_album(driver, album_name, files)
+                    files = pipeline.next_batch(upload_state.batch_controller.next_size())
                     print(f"Альбом {album_name} добавлен, ID альбома {album_id}")
                     set_album_confidentiality(driver, album_id)
                 else:
                     print(f"Альбом {album_name} найден, ID альбома {album_id}")
 
             else:
-                album_id = progress[0] #todo создать реестр в котором хранить информацию о заполненности альбомов и остальную информацию, которую можно не вычислять заново
-                album_name = progress[2]
+                album_id, album_name = progress #todo создать реестр в котором хранить информацию о заполненности альбомов и остальную информацию, которую можно не вычислять заново
 
 
         print(f"Название альбома: {album_name}, ID альбома: {album_id}")
 
-        while True:
-            if not files_splited:
-                clear_saved_progress()
-                break
-            upload_to_album(driver, album_id=album_id, files=files_splited[0])
-            del files_splited[0]
+        if workers:
+            workers.upload_album(pipeline, album_id, album_name, files)
+        else:
+            upload_batches(driver, pipeline, album_id, files)
 
+        upload_state.count_all_files, upload_state.size_all_files = pipeline.discovered_count, pipeline.discovered_size
         print("Загрузка завершена\n")
         print(f"Название альбома: {album_name}")
         print(f"ID альбома: {album_id}")
-        print(f"Загружено файлов: {count_all_files} {size_all_files_formatted}")
+        print(f"Загружено файлов: {upload_state.count_all_files} {size(upload_state.size_all_files)}")
     else:
         # если файлы для загрузки не найдены, сообщение об этом выводить
         print("Файлы для загрузки не найдены")
 
     clear_saved_progress()
 
+    return upload_state.count_all_files, upload_state.size_all_files
+
+@print_function_name
+def upload_job(driver: WebDriver, hash_index: HashIndex, job: dict, number: int, total: int) -> tuple[int, int] | None:
+    """
+    Загрузить одну папку дерева
+    :return: Количество и объем загруженных файлов, None при ошибке
+    """
+    print(f"Задание {number} из {total}: {job['folder']} ({job['count']} файлов, {size(job['size'])})")
+    pipeline = start_folder(hash_index, job['folder'], job['files'])
+    try:
+        return upload_folder(driver, pipeline)
+    except WebDriverException as e:
+        # Незавершенный альбом остается в журнале, при следующем запуске загрузка папки продолжится
+        print(f"Ошибка загрузки папки {job['folder']}: {e}")
+        driver.get(home)
+        return None
+
+@print_function_name
+def upload_tree(driver: WebDriver, hash_index: HashIndex, scheduler: TreeScheduler, workers: UploadWorkers = None):
+    """
+    Загрузить все папки дерева по плану, в одной сессии браузера или параллельно в нескольких браузерах
+    """
+    results = {}
+    jobs = Queue()
+    for number, job in enumerate(scheduler.jobs, start=1):
+        jobs.put((number, job))
+
+    def work(job_driver: WebDriver):
+        while True:
+            try:
+                number, job = jobs.get_nowait()
+            except Empty:
+                return
+            results[job['folder']] = upload_job(job_driver, hash_index, job, number, len(scheduler.jobs))
+
+    if workers:
+        workers.run(work)
+    else:
+        work(driver)
+
+    done = [result for result in results.values() if result]
+    print(f"Загрузка дерева {scheduler.root} завершена: папок {len(done)}, "
+          f"файлов {sum(count for count, _ in done)} {size(sum(total_size for _, total_size in done))}")
+    for job in scheduler.jobs:
+        if not results.get(job['folder']):
+            print(f"Папка не загружена: {job['folder']}")
+
+def main():
+    global folder, ledger, upload_slots, album_registry, image_optimizer, rate_controller
+    # todo проверка если куки истекли, но по факту авторизаци с ними произошал успешно
+
+    # Your Facebook account user and password
+    usr = config.USER_NAME
+    pwd = config.PASSWORD
+
+    if not usr or not pwd:
+        print("Error: Missing Facebook credentials.")
+        sys.exit(1)
+    #cookie_filename = usr + ' ' + cookie_filename todo в название файла логин добавить
+    #todo Эта публикация нарушает наши Нормы сообщества - это сообщение обрабатывать
+    #todo Не удалось опубликовать фото - обрабатывать попап-ошибку - это такой же попап как и Вы временно заблокированы
+    #todo Вы временно заблокированы - страница /media/set/edit/a.3967419006863364
+
+    parse_cli_args()
+
+    hash_index = open_hash_index()
+
+    ledger = UploadLedger(Path(ledger_filename))
+    print(f"Журнал загрузки {ledger_filename}: файлов {ledger.load()}")
+    album_registry = AlbumRegistry(Path(album_registry_filename))
+    print(f"Реестр альбомов {album_registry_filename}: альбомов {album_registry.load()}")
+    if show_ledger_stats:
+        print_ledger_stats()
+
+    if not folder and not tree_root:
+        hash_index.close()
+        ledger.close()
+        return
+
+    telemetry.start(Path(telemetry_filename))
+    # Темп действий общий для всех браузеров и сохраняется между запусками
+    rate_controller = RateController(Path(rate_config['state_file']))
+    rate_controller.load()
+    print_rate_state()
+    if optimize_images:
+        image_optimizer = ImageOptimizer(Path(optimize_config['cache_dir']), optimize_max_edge, optimize_quality)
+
+    scheduler = None
+    pipeline = None
+    if tree_root:
+        # Один обход дерева: каждая папка с изображениями - задание на загрузку в отдельный альбом
+        scheduler = TreeScheduler(tree_root, tree_order, tree_priority, skip_done=not tree_rescan)
+        scheduler.plan()
+        scheduler.print_plan()
+        if not scheduler.jobs:
+            print("Папки для загрузки не найдены")
+            hash_index.close()
+            ledger.close()
+            return
+    else:
+        if folder.split('\\').__len__() == 1:
+            # Задано только название папки, а не полный путь - найти папку
+            folder = search_folder_recursive(folder, root_folder.replace('\\\\', '\\') if root_folder else 'D:\\')
+
+        print(f"Полный путь к папке {folder}")
+        #todo при заблокированности теймер до повторной попытки выводить
+
+        # Поиск и хеширование файлов идут в фоне параллельно с запуском браузера, авторизацией и загрузкой
+        pipeline = start_folder(hash_index, folder)
+
+    pool = None
+    workers = None
+    if upload_workers > 1:
+        # Несколько браузеров с отдельными профилями, авторизация по очереди через общий файл cookies
+        pool = DriverPool(upload_workers, Path(workers_config['profiles_dir']), is_headless, network_tracking)
+        drivers = pool.start()
+        workers = UploadWorkers(drivers)
+        upload_slots = threading.BoundedSemaphore(max_concurrent_uploads)
+    else:
+        drivers = [get_driver()]
+    driver = drivers[0]
+
+    watchers = []
+    for worker_driver in drivers:
+        watchers.append(Watcher(worker_driver, watcher_interval))
+        if network_tracking:
+            NetworkTracker.for_driver(worker_driver).subscribe(record_network_request)
+        authorize(worker_driver, usr, pwd)
+
+    upload_state.batch_controller = BatchSizeController(splited_size, max_size=max_batch_size, adaptive=not fixed_batch_size)
+
+    if bench_attach and pipeline:
+        benchmark_attach(driver, pipeline)
+    elif scheduler:
+        upload_tree(driver, hash_index, scheduler, workers)
+    else:
+        upload_folder(driver, pipeline, album_id, workers)
+
+    ledger.close()
+    if image_optimizer:
+        image_optimizer.close()
+        print_optimizer_stats()
+    if network_tracking:
+        print_network_stats(drivers)
+    print_telemetry_summary()
+    telemetry.close()
+    rate_controller.save()
+    print_rate_state()
+
+    for watcher in watchers:
+        watcher.stop()
+        watcher.print_stats()
+
     sleep(20)
 
-    driver.close()# todo в wait паузы увеличить
+    if pool:
+        pool.close()
+    else:
+        driver.close()# todo в wait паузы увеличить
 
 class Inp:
     inp = None
@@ -1068,57 +1763,373 @@ class Inp:
         return self.inp
 
 
-class Watcher:
-    instance = None
-    problems_count = 0
+class DiscoveryPipeline:
+    """
+    Потоковый поиск файлов для загрузки. Обход папки через os.scandir, проверка что файл - изображение,
+    хеширование и отсев дубликатов идут в фоновом потоке, а загрузчик забирает файлы пачками,
+    как только они готовы, не дожидаясь обхода всей папки
+    """
+    excluded_extensions = ['.psd', '.mpo', '.thm']
 
-    def __init__(self, driver):
-        t = Thread(target=self.check_page_unavailable, args=(driver,))
+    def __init__(self, folder: str, recursive: bool = False, hash_index: HashIndex = None, skip=None, queue_size: int = 1000, files: list = None, optimizer: ImageOptimizer = None):
+        """
+        :param folder: Папка с файлами
+        :param recursive: Искать файлы в подпапках
+        :param hash_index: Индекс хешей, если задан - файлы хешируются и дубликаты отсеиваются
+        :param skip: Функция от ключа файла, True - файл пропускается (уже загружен в прошлый запуск)
+        :param queue_size: Сколько найденных файлов может ждать загрузки в очереди
+        :param files: Уже найденные файлы [(полное название, название, stat)], папка повторно не обходится
+        :param optimizer: Если задан - изображения уменьшаются заранее, в пачках отдаются пути к уменьшенным файлам
+        """
+        self.folder = folder
+        self.files = files
+        self.optimizer = optimizer
+        self.recursive = recursive
+        self.hash_index = hash_index
+        self.skip = skip
+        self.queue = Queue(maxsize=queue_size)
+        self.requeued = deque()
+        self.lock = threading.Lock()
+        self.hash_engine = None
+        self.discovered_count = 0
+        self.discovered_size = 0
+        self.skipped_count = 0
+        self.finished = False
+
+    def start(self):
+        t = Thread(target=self.run, name="DiscoveryPipeline")
         t.daemon = True
         t.start()
 
-        t2 = Thread(target=self.check_connection_lost, args=(driver,))
-        t2.daemon = True
-        t2.start()
+    def scan(self, path: str):
+        """
+        Обход папки в порядке os.walk: сначала файлы папки, затем подпапки
+        """
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if self.recursive:
+                        subdirs.append(entry.path)
+                    continue
+
+                # Расширение проверяется до чтения заголовка файла
+                if os.path.splitext(entry.name)[1].lower() in self.excluded_extensions:
+                    continue
+                if not entry.is_file() or not filetype.is_image(entry.path):
+                    continue
+
+                yield entry.path, entry.name, entry.stat()
+
+        for subdir in subdirs:
+            yield from self.scan(subdir)
+
+    def hash_candidates(self, candidates):
+        """
+        Хеширует файлы параллельно и отдает их в порядке обхода папки (порядок пачек не зависит от числа потоков)
+        """
+        order = {}
+
+        def items():
+            for seq, (path, name, st) in enumerate(candidates):
+                order[path] = (seq, name, st)
+                yield path, st
+
+        ready = {}
+        next_seq = 0
+        for path, digest, error in self.hash_engine.map(items()):
+            seq, name, st = order.pop(path)
+            if error:
+                print(f"Ошибка чтения файла {path}: {error}")
+            ready[seq] = (digest, (name, st.st_size, path)) if digest else None
+
+            while next_seq in ready:
+                item = ready.pop(next_seq)
+                next_seq += 1
+                if item:
+                    yield item
+
+    def run(self):
+        try:
+            candidates = self.files if self.files is not None else self.scan(self.folder)
+            if self.hash_index is not None:
+                self.hash_engine = HashEngine(hash_algorithm, workers=hash_workers, index=self.hash_index)
+                files = self.hash_candidates(candidates)
+            else:
+                # Без хеширования ключ файла - путь, размер и время изменения
+                files = ((f"{path}|{st.st_size}|{st.st_mtime_ns}", (name, st.st_size, path)) for path, name, st in candidates)
+
+            seen = set()
+            for file_id, file in files:
+                if file_id in seen:
+                    continue
+                seen.add(file_id)
+
+                if self.skip and self.skip(file_id):
+                    self.skipped_count += 1
+                    continue
+
+                self.discovered_count += 1
+                self.discovered_size += file[1]
+                if self.optimizer:
+                    # Хеш содержимого уже посчитан при поиске дубликатов
+                    self.optimizer.submit(file_id, file[2], file_id if self.hash_index is not None else None)
+                self.queue.put((file_id, file))
+
+        except OSError as e:
+            print(f"Ошибка поиска файлов в папке {self.folder}: {e}")
+        finally:
+            if self.hash_index is not None:
+                self.hash_index.close()
+                print(f"Индекс хешей: попаданий {self.hash_index.hits}, промахов {self.hash_index.misses}")
+                if self.hash_engine:
+                    print(f"Захешировано файлов {self.hash_engine.hashed_files} ({size(self.hash_engine.hashed_bytes)}) в {self.hash_engine.workers} потоков")
+            print(f"Найдено файлов для загрузки {self.discovered_count} {size(self.discovered_size)}, уже загружено ранее {self.skipped_count}")
+            self.finished = True
+            self.queue.put(None)
+
+    def next_batch(self, batch_size: int) -> list:
+        """
+        Дождаться и вернуть следующие batch_size файлов (меньше, если поиск завершен)
+        :return: [(id, (название, размер, полное название))], полное название - уменьшенного файла, если задан optimizer
+        """
+        batch = []
+        # Пачки могут забирать несколько потоков загрузки одновременно
+        with self.lock:
+            while self.requeued and len(batch) < batch_size:
+                batch.append(self.requeued.popleft())
+            while len(batch) < batch_size:
+                item = self.queue.get()
+                if item is None:
+                    # Признак конца оставляем в очереди для следующих вызовов
+                    self.queue.put(None)
+                    break
+                batch.append(item)
+
+        if self.optimizer:
+            batch = [(file_id, (file[0], file[1], self.optimizer.path(file_id, file[2]))) for file_id, file in batch]
+        return batch
 
-        t3 = Thread(target=self.check_connection_stable, args=(driver,))
-        t3.daemon = True
-        t3.start()
+    def requeue(self, files: list) -> None:
+        """
+        Вернуть файлы в начало очереди (отложены при уменьшении пачки)
+        """
+        with self.lock:
+            self.requeued.extendleft(reversed(files))
 
-    def check_page_unavailable(self, driver):
-        while True:
-            try: 
-                element = WebDriverWait(driver, 100).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Страница сейчас недоступна']")))
-                print(f'Watcher: обнаружено сообщение {element.text}')
-                self.problems_count += 1
-                sleep(100)
-                driver.refresh()
-            except TimeoutException:
-                self.problems_count = 0
-                pass
-    
-    def check_connection_lost(self, driver):
-        global connection_status
-        while True:
-            try: 
-                element = WebDriverWait(driver, 1000).until(EC.presence_of_element_located((By.XPATH, "//*[text()='Вы офлайн.']")))
-                if connection_status == True:
-                    print(f'Watcher: обнаружено сообщение {element.text}')
-                    print('Watcher: соединение потеряно')
-                    connection_status = False
-            except WebDriverException:
-                pass
-    
-    def check_connection_stable(self, driver):
-        global connection_status
-        while True:
-            try: 
-                element = WebDriverWait(driver, 1000).until(EC.invisibility_of_element_located((By.XPATH, "//*[text()='Вы офлайн.']")))
-                if connection_status == False:
-                    print('Watcher: соединение восстановлено')
-                    connection_status = True
+
+class TreeScheduler:
+    """
+    Планировщик загрузки дерева папок. Корень обходится один раз, каждая папка с изображениями -
+    задание на загрузку в отдельный альбом. Задания выполняются по очереди в одной сессии браузера,
+    состояние заданий хранится в журнале загрузки: завершенные папки пропускаются, начатые - продолжаются первыми
+    """
+    orders = {
+        'size': lambda job: job['size'],
+        'size_desc': lambda job: -job['size'],
+        'count': lambda job: job['count'],
+        'name': lambda job: job['folder'],
+    }
+
+    def __init__(self, root: str, order: str = 'size', priority: list = None, skip_done: bool = True):
+        """
+        :param root: Корневая папка дерева
+        :param order: Порядок заданий (size - сначала маленькие папки, size_desc, count, name)
+        :param priority: Шаблоны папок, которые загружаются раньше остальных, в порядке важности
+        :param skip_done: Пропускать папки, загрузка которых завершена в прошлые запуски
+        """
+        self.root = root
+        self.order = order
+        self.priority = priority or []
+        self.skip_done = skip_done
+        self.jobs = []
+        self.skipped = []
+
+    def priority_rank(self, job_folder: str) -> int:
+        for rank, pattern in enumerate(self.priority):
+            if fnmatch(job_folder.lower(), f"*{pattern.lower()}*"):
+                return rank
+        return len(self.priority)
+
+    def plan(self) -> list:
+        """
+        Обход дерева и составление очереди заданий
+        :return: [{'folder', 'files', 'count', 'size'}]
+        """
+        jobs = {}
+        for path, name, st in DiscoveryPipeline(self.root, recursive=True).scan(self.root):
+            job_folder = os.path.dirname(path)
+            job = jobs.setdefault(job_folder, {'folder': job_folder, 'files': [], 'count': 0, 'size': 0})
+            job['files'].append((path, name, st))
+            job['count'] += 1
+            job['size'] += st.st_size
+
+        self.jobs = []
+        self.skipped = []
+        for job in jobs.values():
+            if self.skip_done and ledger.is_album_done(job['folder']):
+                self.skipped.append(job)
+            else:
+                self.jobs.append(job)
+
+        self.jobs.sort(key=lambda job: (ledger.get_album(job['folder']) is None, self.priority_rank(job['folder']), self.orders[self.order](job)))
+
+        return self.jobs
+
+    def print_plan(self):
+        print(f"Дерево {self.root}: заданий {len(self.jobs)}, "
+              f"файлов {sum(job['count'] for job in self.jobs)} {size(sum(job['size'] for job in self.jobs))}, "
+              f"пропущено завершенных папок {len(self.skipped)}")
+        for number, job in enumerate(self.jobs, start=1):
+            resumed = " (продолжение)" if ledger.get_album(job['folder']) else ""
+            print(f"{number}. {job['folder']}: {job['count']} файлов {size(job['size'])}{resumed}")
+
+
+class UploadWorkers:
+    """
+    Параллельная загрузка в нескольких браузерах. Каждый поток работает со своим браузером и своим
+    состоянием загрузки (upload_state, размер пачки), число одновременно загружаемых пачек во всех
+    браузерах ограничено upload_slots
+    """
+
+    def __init__(self, drivers: list[WebDriver]):
+        self.drivers = drivers
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def worker(self, name: str, driver: WebDriver, target):
+        upload_state.batch_controller = BatchSizeController(splited_size, max_size=max_batch_size, adaptive=not fixed_batch_size)
+        started = time.monotonic()
+        try:
+            target(driver)
+        except WebDriverException as e:
+            print(f"Ошибка в потоке загрузки {name}: {e}")
+        finally:
+            history = upload_state.batch_controller.history
+            uploaded = [stats for stats in history if stats['success']]
+            seconds = time.monotonic() - started
+            files = sum(stats['files'] for stats in uploaded)
+            total_size = sum(stats['bytes'] for stats in uploaded)
+            with self.lock:
+                self.stats[name] = {
+                    'batches': len(uploaded),
+                    'rollbacks': len(history) - len(uploaded),
+                    'files': files,
+                    'bytes': total_size,
+                    'seconds': seconds,
+                    'files_per_second': files / seconds if seconds > 0 else 0.0,
+                    'bytes_per_second': total_size / seconds if seconds > 0 else 0.0,
+                }
+
+    def run(self, target):
+        """
+        Выполнить target(driver) во всех браузерах параллельно и дождаться завершения
+        """
+        threads = []
+        for index, driver in enumerate(self.drivers):
+            name = f"UploadWorker-{index}"
+            t = Thread(target=self.worker, args=(name, driver, target), name=name)
+            t.daemon = True
+            t.start()
+            threads.append(t)
+        for t in threads:
+            t.join()
+
+        self.print_stats()
+
+    def upload_album(self, pipeline: DiscoveryPipeline, album_id: int, album_name: str, files: list):
+        """
+        Догрузить файлы папки в один альбом, пачки распределяются между браузерами
+        """
+        job_folder = upload_state.folder
+
+        def work(driver: WebDriver):
+            upload_state.folder = job_folder
+            upload_state.album_name = album_name
+            # Первый браузер продолжает с уже полученной пачкой, остальные берут следующие
+            batch = files if driver is self.drivers[0] else pipeline.next_batch(upload_state.batch_controller.next_size())
+            upload_batches(driver, pipeline, album_id, batch)
+
+        self.run(work)
+
+    def print_stats(self):
+        for name, stats in sorted(self.stats.items()):
+            print(f"{name}: пачек {stats['batches']}, откатов {stats['rollbacks']}, файлов {stats['files']} {size(stats['bytes'])} "
+                  f"за {stats['seconds']:.0f} сек, {stats['files_per_second']:.2f} файлов/сек, {size(int(stats['bytes_per_second']))}/сек")
+
+
+class Watcher:
+    """
+    Следит за сообщениями "Страница сейчас недоступна" и "Вы офлайн.". Один поток на браузер:
+    за период одна выборка событий страницы (PageEventBus), все условия проверяются по ее результату.
+    Загрузчик узнает о состоянии через события online и page_available и сам ждет восстановления (check_connection)
+    """
+    instances = {}
+
+    def __init__(self, driver, interval: float = None):
+        self.driver = driver
+        self.interval = interval or pauses.events['poll_interval']
+        self.online = threading.Event()
+        self.online.set()
+        self.page_available = threading.Event()
+        self.page_available.set()
+        self.problems_count = 0
+        self.stopped = threading.Event()
+
+        self.events = PageEventBus.for_driver(driver)
+        self.events.subscribe('page_unavailable', self.on_page_unavailable)
+        self.events.subscribe('offline', self.on_offline)
+        Watcher.instances[id(driver)] = self
+
+        t = Thread(target=self.run, name="Watcher")
+        t.daemon = True
+        t.start()
+
+    @classmethod
+    def for_driver(cls, driver):
+        watcher = cls.instances.get(id(driver))
+        return watcher if watcher and watcher.driver is driver else None
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.events.poll()
             except WebDriverException:
                 pass
 
+            # Пока есть проблема, восстановление проверяется чаще
+            problem = not self.online.is_set() or not self.page_available.is_set()
+            self.stopped.wait(pauses.events['alert_poll_interval'] if problem else self.interval)
+
+    def stop(self):
+        self.stopped.set()
+
+    def on_page_unavailable(self, event: dict):
+        if not event['count']:
+            self.problems_count = 0
+            self.page_available.set()
+            return
+
+        print(f'Watcher: обнаружено сообщение {event["text"]}')
+        self.problems_count += 1
+        self.page_available.clear()
+
+    def on_offline(self, event: dict):
+        if event['count']:
+            if self.online.is_set():
+                print(f'Watcher: обнаружено сообщение {event["text"]}')
+                print('Watcher: соединение потеряно')
+                self.online.clear()
+        else:
+            if not self.online.is_set():
+                print('Watcher: соединение восстановлено')
+                self.online.set()
+
+    def print_stats(self):
+        stats = self.events.probe_stats()
+        print(f"Watcher: проверок {stats['probes']}, запросов к браузеру {stats['round_trips']}, "
+              f"установок наблюдателя {stats['installs']}, среднее время проверки {stats['avg_seconds'] * 1000:.1f} мс, "
+              f"максимальное {stats['max_seconds'] * 1000:.1f} мс")
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,28 @@
+import sys
+import types
+from pathlib import Path
+
+# checkpoint/config.py хранит личные данные пользователя и не входит в репозиторий,
+# а импорт пакета checkpoint сразу читает его в gb.init_globals()
+if not (Path(__file__).parent.parent / "checkpoint" / "config.py").exists():
+    config = types.ModuleType('checkpoint.config')
+    config.USER_NAME = ""
+    config.PASSWORD = ""
+    config.NOTIFY_EMAIL = ""
+    config.EMAIL_FROM = ""
+    config.EMAIL_APP_PASSWORD = ""
+    config.headers = {}
+    sys.modules['checkpoint.config'] = config
+
+# Загрузчик run.py читает логин и пароль из config.py в корне проекта (тоже не входит в репозиторий)
+if not (Path(__file__).parent.parent / "config.py").exists():
+    config = types.ModuleType('config')
+    config.USER_NAME = ""
+    config.PASSWORD = ""
+    sys.modules['config'] = config
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # Лог DualConsole закрывается до остановки интерпретатора
+    from checkpoint import globals as gb
+    gb.cleanup_globals()
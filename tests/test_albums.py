@@ -0,0 +1,49 @@
+from checkpoint.objects.albums import AlbumRegistry
+
+
+def test_find_returns_last_continuation(tmp_path):
+    registry = AlbumRegistry(tmp_path / "albums.json")
+    assert registry.merge([
+        {'id': 1, 'name': 'Отпуск', 'count': 9000},
+        {'id': 2, 'name': 'Отпуск 3', 'count': 40},
+        {'id': 3, 'name': 'Отпуск 2', 'count': 10000},
+        {'id': 4, 'name': 'Отпуск старый', 'count': 5},
+    ]) == 4
+
+    assert registry.find('Отпуск') == ('2', 40)
+    assert registry.find('Отпуск старый') == ('4', 5)
+    assert registry.find('Поход') is None
+
+
+def test_merge_updates_known_albums(tmp_path):
+    registry = AlbumRegistry(tmp_path / "albums.json")
+    registry.merge([{'id': 1, 'name': 'Отпуск', 'count': 10}])
+
+    assert registry.merge([{'id': 1, 'name': 'Отпуск', 'count': 12}, {'id': 2, 'name': 'Поход'}]) == 1
+    assert registry.find('Отпуск') == ('1', 12)
+    assert registry.find('Поход') == ('2', 0)
+
+
+def test_add_items_is_saved(tmp_path):
+    registry_path = tmp_path / "data" / "albums.json"
+    registry = AlbumRegistry(registry_path)
+    registry.update(1, 'Отпуск', 10)
+    registry.mark_complete()
+    registry.add_items(1, 5)
+    registry.add_items(2, 3, name='Поход')
+
+    loaded = AlbumRegistry(registry_path)
+    assert loaded.load() == 2
+    assert loaded.complete
+    assert (loaded.find('Отпуск'), loaded.find('Поход')) == (('1', 15), ('2', 3))
+    assert not registry_path.with_suffix('.json.tmp').exists()
+
+
+def test_load_ignores_broken_file(tmp_path):
+    registry_path = tmp_path / "albums.json"
+    registry_path.write_text('{"albums": {"1": ', encoding='utf-8')
+    registry = AlbumRegistry(registry_path)
+
+    assert registry.load() == 0
+    assert not registry.complete
+    assert AlbumRegistry(tmp_path / "missing.json").load() == 0
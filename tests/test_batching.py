@@ -0,0 +1,85 @@
+import pytest
+
+from checkpoint.knowledge.upload import batching as batching_config
+from checkpoint.objects import batching
+from checkpoint.objects.batching import BatchSizeController
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(batching.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    for key, value in {'min_size': 2, 'max_size': 20, 'increase_step': 2, 'decrease_factor': 0.5,
+                       'popup_limit': 2, 'stall_limit': 5, 'slow_publication': 60, 'dialog_slowdown': 1.5,
+                       'smoothing': 0.5}.items():
+        monkeypatch.setitem(batching_config, key, value)
+
+
+def run_batch(controller, clock, success=True, files=10, seconds=10.0, dialog=None, observe=None):
+    controller.start_batch()
+    if dialog is not None:
+        controller.observe_dialog(dialog)
+    if observe:
+        observe(controller)
+    clock[0] += seconds
+    return controller.finish_batch(success, files, files * 100)
+
+
+def test_additive_increase_up_to_max(clock):
+    controller = BatchSizeController(16)
+    stats = run_batch(controller, clock)
+
+    assert (stats['size'], stats['next_size'], stats['reason']) == (16, 18, None)
+    assert stats['files_per_second'] == 1.0 and stats['bytes_per_second'] == 100.0
+    run_batch(controller, clock)
+    run_batch(controller, clock)
+    assert controller.next_size() == 20
+
+
+@pytest.mark.parametrize('observe, reason', [
+    (lambda c: c.observe_timeout(), 'timeout'),
+    (lambda c: [c.observe_popup() for _ in range(3)], 'popups'),
+    (lambda c: [c.observe_stall() for _ in range(6)], 'stalls'),
+    (lambda c: c.observe_publication(61), 'slow publication'),
+])
+def test_congestion_halves_the_batch(clock, observe, reason):
+    controller = BatchSizeController(10)
+    stats = run_batch(controller, clock, observe=observe)
+
+    assert (stats['reason'], stats['next_size']) == (reason, 5)
+
+
+def test_signals_below_limits_are_not_congestion(clock):
+    controller = BatchSizeController(10)
+    stats = run_batch(controller, clock, observe=lambda c: ([c.observe_popup() for _ in range(2)], [c.observe_stall() for _ in range(5)]))
+
+    assert (stats['reason'], stats['next_size'], stats['popups'], stats['stalls']) == (None, 12, 2, 5)
+
+
+def test_rollback_shrinks_to_min_and_is_not_throughput(clock):
+    controller = BatchSizeController(3)
+    stats = run_batch(controller, clock, success=False)
+
+    assert (stats['reason'], stats['next_size'], stats['files_per_second']) == ('rollback', 2, 0.0)
+    assert controller.throughput is None
+
+
+def test_dialogs_slower_than_average(clock):
+    controller = BatchSizeController(10)
+    run_batch(controller, clock, dialog=2.0)
+    assert run_batch(controller, clock, dialog=2.9)['reason'] is None
+    # Среднее сглажено: 0.5 * 2.9 + 0.5 * 2.0 = 2.45, порог 3.675
+    assert run_batch(controller, clock, dialog=3.7)['reason'] == 'slow dialogs'
+
+
+def test_fixed_size_is_not_adapted(clock):
+    controller = BatchSizeController(50, adaptive=False)
+    run_batch(controller, clock, success=False)
+
+    assert controller.next_size() == 20
+    assert [stats['success'] for stats in controller.history] == [False]
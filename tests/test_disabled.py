@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from checkpoint.knowledge import fs, pauses
+from checkpoint.modules import disabled
+
+
+class Manager:
+    """
+    Фоновый менеджер, который не запускает потоков
+    """
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def start_monitor(self):
+        pass
+
+    def stop_monitor(self):
+        pass
+
+
+class Button:
+    def __init__(self, driver, text):
+        self.driver = driver
+        self.text = text
+
+    def click(self):
+        self.driver.actions.append(('click', self.text))
+
+
+class FakeDriver:
+    def __init__(self):
+        self.actions = []
+
+    def refresh(self):
+        self.actions.append('refresh')
+
+    def get(self, url):
+        self.actions.append(('get', url))
+
+    def find_element(self, by, xpath):
+        return Button(self, xpath.split("'")[1])
+
+
+@pytest.fixture
+def machine(tmp_path, monkeypatch):
+    """
+    Модуль disabled с поддельными часами, страницами и менеджерами
+
+    Returns:
+        dict: {'pages': страницы по порядку проверок, 'sleeps': паузы, 'downloads': вызовы скачивания}
+    """
+    state = {'now': 0.0, 'pages': [], 'sleeps': [], 'downloads': 0, 'allowed': None}
+
+    def sleep(duration, description="Пауза", channels=()):
+        state['sleeps'].append(duration)
+        state['now'] += duration
+        return False
+
+    def classify_page(driver, pages, timeout):
+        state['allowed'] = set(pages)
+        if not state['pages']:
+            raise KeyboardInterrupt()
+        return [state['pages'].pop(0)]
+
+    async def handle_download_ready(driver, download_folder):
+        state['downloads'] += 1
+
+    for name in ['ArchiveManager', 'MediaManager', 'PhotoStatsManager', 'CleanupManager']:
+        monkeypatch.setattr(disabled, name, Manager)
+    monkeypatch.setattr(disabled.time, 'monotonic', lambda: state['now'])
+    monkeypatch.setattr(disabled, 'sleep', sleep)
+    monkeypatch.setattr(disabled, 'classify_page', classify_page)
+    monkeypatch.setattr(disabled, 'handle_download_ready', handle_download_ready)
+    monkeypatch.setattr(disabled, 'send_module_start_notification', lambda *args: None)
+    monkeypatch.setattr(disabled, 'check_popup', lambda driver, name: False)
+    monkeypatch.setattr(disabled, 'check_browser_error', lambda driver: False)
+    monkeypatch.setattr(disabled, 'get_page_title', lambda driver: None)
+    monkeypatch.setattr(disabled, 'load_allowed_pages', lambda: ['disabled_account', 'download_account', 'login'])
+    monkeypatch.setattr(disabled, 'save_allowed_pages', lambda pages: None)
+    monkeypatch.setitem(fs.path, 'stats_logs_dir', str(tmp_path / "stats_logs"))
+    monkeypatch.setitem(pauses.disabled_states, 'creation_backup_is_processing', 36000)
+    return state
+
+
+def run(driver, tmp_path):
+    asyncio.run(disabled.run(driver, str(tmp_path), str(tmp_path / "photos")))
+
+
+def test_actions_are_checked_without_refresh(machine, tmp_path):
+    driver = FakeDriver()
+    machine['pages'] = ['disabled_account', 'download_account', 'creation_backup_is_processing', 'download_ready', 'unknown']
+
+    run(driver, tmp_path)
+
+    # После кликов страница проверяется сразу, обработка бэкапа, скачивание и неизвестная страница ждут дедлайна
+    assert driver.actions == [('click', 'Скачать информацию'), ('click', 'Запросить файл'), 'refresh', 'refresh', 'refresh']
+    assert machine['sleeps'] == [36000, 600, 1800]
+    assert machine['downloads'] == 1
+    # Страница готовых файлов проверяется, только пока файл запрошен
+    assert 'download_ready' not in machine['allowed']
+
+
+def test_repeated_state_waits_before_next_action(machine, tmp_path):
+    driver = FakeDriver()
+    machine['pages'] = ['disabled_account', 'disabled_account', 'disabled_account']
+
+    run(driver, tmp_path)
+
+    # Второй клик - сразу, следующие - не чаще pauses.disabled_states['repeat']
+    click = ('click', 'Скачать информацию')
+    assert driver.actions == [click, click, 'refresh', click, 'refresh']
+    assert machine['sleeps'] == [pauses.disabled_states['repeat']] * 2
@@ -0,0 +1,289 @@
+import asyncio
+import io
+import json
+import time
+import zipfile
+
+import httpx
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from checkpoint.knowledge import pauses
+from checkpoint.knowledge.download import direct as direct_config
+from checkpoint.objects.downloads import DirectDownloader, DownloadTracker
+from checkpoint.objects.scheduler import scheduler
+
+
+class FakeDriver:
+    """
+    Браузер с логом performance: события скачивания добавляются тестом
+    """
+
+    def __init__(self, events_available: bool = True):
+        self.events_available = events_available
+        self.log = []
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+
+    def get_log(self, log_type):
+        if not self.events_available:
+            raise WebDriverException("performance log is not enabled")
+        entries, self.log = self.log, []
+        return entries
+
+    def event(self, method, timestamp=None, **params):
+        entry = {'message': json.dumps({'message': {'method': f"Browser.{method}", 'params': params}})}
+        if timestamp is not None:
+            entry['timestamp'] = timestamp * 1000
+        self.log.append(entry)
+
+
+@pytest.fixture(autouse=True)
+def download_pauses(monkeypatch):
+    for key, value in {'download_start': 0.2, 'progress_poll': 0.01, 'stall_timeout': 1800}.items():
+        monkeypatch.setitem(pauses.download, key, value)
+
+
+def test_download_events(tmp_path):
+    driver = FakeDriver()
+    tracker = DownloadTracker(driver, tmp_path)
+    driver.event('downloadWillBegin', guid='old', suggestedFilename='old.zip')
+    tracker.enable()
+
+    tracker.begin('Part 1')
+    driver.event('downloadWillBegin', guid='g1', suggestedFilename='part1.zip')
+    assert tracker.wait_started('Part 1')
+    assert tracker.parts['Part 1']['file'] == 'part1.zip'
+
+    driver.event('downloadProgress', guid='g1', receivedBytes=50, totalBytes=100, state='inProgress')
+    driver.event('downloadProgress', guid='g1', receivedBytes=100, totalBytes=100, state='completed')
+    changed = tracker.poll()
+
+    assert [(part['part'], part['state']) for part in changed] == [('Part 1', DownloadTracker.STATE_COMPLETED)]
+    assert tracker.stats() == {'parts': 1, 'completed': 1, 'failed': 0, 'pending': 0, 'bytes': 100, 'rejected': 0}
+
+
+def test_canceled_part_is_retried(tmp_path):
+    driver = FakeDriver()
+    tracker = DownloadTracker(driver, tmp_path)
+    tracker.enable()
+
+    tracker.begin('Part 1')
+    driver.event('downloadWillBegin', guid='g1', suggestedFilename='part1.zip')
+    tracker.wait_started('Part 1')
+    driver.event('downloadProgress', guid='g1', receivedBytes=10, state='canceled')
+    tracker.poll()
+    assert [part['error'] for part in tracker.failed()] == ['canceled']
+
+    part = tracker.begin('Part 1')
+    driver.event('downloadWillBegin', guid='g2', suggestedFilename='part1.zip')
+    assert tracker.wait_started('Part 1')
+    # Прогресс прошлой попытки больше не относится к части
+    driver.event('downloadProgress', guid='g1', receivedBytes=99, state='completed')
+    tracker.poll()
+    assert (part['attempts'], part['state'], part['received']) == (2, DownloadTracker.STATE_PROGRESS, 0)
+
+
+def test_late_start_is_not_bound_to_next_part(tmp_path):
+    driver = FakeDriver()
+    tracker = DownloadTracker(driver, tmp_path)
+    tracker.enable()
+
+    tracker.begin('Part 1')
+    assert not tracker.wait_started('Part 1')
+    assert tracker.parts['Part 1']['error'] == 'not started'
+
+    second = tracker.begin('Part 2')
+    # Скачивание первой части началось до клика по второй, но пришло после окончания ожидания
+    driver.event('downloadWillBegin', timestamp=second['clicked'] - 0.5, guid='late', suggestedFilename='part1.zip')
+    driver.event('downloadWillBegin', timestamp=second['clicked'] + 0.5, guid='g2', suggestedFilename='part2.zip')
+    assert tracker.wait_started('Part 2')
+
+    assert second['file'] == 'part2.zip'
+    assert ('Browser.cancelDownload', {'guid': 'late'}) in driver.commands
+    assert tracker.stats()['rejected'] == 1
+
+
+def test_folder_fallback_without_events(tmp_path):
+    (tmp_path / "old.zip").write_bytes(b"old")
+    tracker = DownloadTracker(FakeDriver(events_available=False), tmp_path)
+    tracker.enable()
+    assert not tracker.events_available
+
+    part = tracker.begin('Part 1')
+    (tmp_path / "Unconfirmed 1.crdownload").write_bytes(b"1")
+    tracker.poll()
+    assert part['state'] == DownloadTracker.STATE_WAITING
+
+    (tmp_path / "Unconfirmed 1.crdownload").rename(tmp_path / "part1.zip.crdownload")
+    assert tracker.wait_started('Part 1')
+    assert part['file'] == 'part1.zip'
+
+    (tmp_path / "part1.zip.crdownload").write_bytes(b"12345")
+    tracker.poll()
+    assert part['received'] == 5
+
+    (tmp_path / "part1.zip.crdownload").rename(tmp_path / "part1.zip")
+    tracker.poll()
+    assert part['state'] == DownloadTracker.STATE_COMPLETED
+    # Файл, который был в папке до клика, не считается скачиванием
+    assert tracker.stats()['completed'] == 1
+
+
+def test_stalled_download_fails(tmp_path, monkeypatch):
+    monkeypatch.setitem(pauses.download, 'stall_timeout', 0)
+    driver = FakeDriver()
+    tracker = DownloadTracker(driver, tmp_path)
+    tracker.enable()
+
+    tracker.begin('Part 1')
+    driver.event('downloadWillBegin', guid='g1', suggestedFilename='part1.zip')
+    tracker.poll()
+    time.sleep(0.01)
+    tracker.poll()
+
+    assert [part['error'] for part in tracker.failed()] == ['stalled']
+
+
+def test_wait_started_is_interrupted_by_shutdown(tmp_path):
+    tracker = DownloadTracker(FakeDriver(), tmp_path)
+    tracker.enable()
+    tracker.begin('Part 1')
+    scheduler.shutdown()
+
+    try:
+        started = time.monotonic()
+        assert not tracker.wait_started('Part 1', timeout=5)
+        assert time.monotonic() - started < 1
+    finally:
+        scheduler.start()
+
+
+def zip_bytes() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('photo.jpg', bytes(range(256)) * 400)
+    return buffer.getvalue()
+
+
+def fetch(downloader: DirectDownloader, handler, part_name: str = 'Part 1') -> tuple:
+    """
+    Скачивает часть через httpx.MockTransport
+
+    Returns:
+        tuple: (путь к файлу или исключение, состояние части)
+    """
+    part = {'part': part_name, 'url': 'https://example.com/download/part1', 'received': 0, 'downloaded': 0}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            try:
+                return await downloader._fetch(client, part)
+            except ValueError as e:
+                return e
+
+    return asyncio.run(run()), part
+
+
+def partial_download(downloader: DirectDownloader, data: bytes, received: int, validator='"v1"'):
+    temp_path = downloader._temp_path('Part 1')
+    temp_path.write_bytes(data[:received])
+    downloader._meta_path(temp_path).write_text(
+        json.dumps({'name': 'backup-1.zip', 'validator': validator, 'total': len(data)}), encoding='utf-8')
+    return temp_path
+
+
+def test_direct_download(tmp_path):
+    data = zip_bytes()
+
+    def handler(request):
+        assert 'Range' not in request.headers
+        return httpx.Response(200, content=data, headers={
+            'ETag': '"v1"', 'Content-Disposition': "attachment; filename*=UTF-8''backup%201.zip"})
+
+    target, part = fetch(DirectDownloader(tmp_path, []), handler)
+
+    assert target == tmp_path / "backup 1.zip"
+    assert target.read_bytes() == data
+    assert (part['total'], part['received'], part['resumed_from']) == (len(data), len(data), 0)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["backup 1.zip"]
+
+
+def test_direct_download_resumes_with_range(tmp_path):
+    data = zip_bytes()
+    downloader = DirectDownloader(tmp_path, [])
+    partial_download(downloader, data, 1000)
+
+    def handler(request):
+        assert request.headers['Range'] == "bytes=1000-"
+        assert request.headers['If-Range'] == '"v1"'
+        return httpx.Response(206, content=data[1000:], headers={
+            'ETag': '"v1"', 'Content-Range': f"bytes 1000-{len(data) - 1}/{len(data)}"})
+
+    target, part = fetch(downloader, handler)
+
+    assert target.read_bytes() == data
+    assert (part['resumed_from'], part['downloaded']) == (1000, len(data) - 1000)
+
+
+def test_direct_download_restarts_when_part_changed(tmp_path):
+    data = zip_bytes()
+    downloader = DirectDownloader(tmp_path, [])
+    partial_download(downloader, b"x" * len(data), 1000)
+
+    # If-Range не совпал - сервер отдает весь файл заново
+    target, part = fetch(downloader, lambda request: httpx.Response(200, content=data, headers={'ETag': '"v2"'}))
+
+    assert target.read_bytes() == data
+    assert part['resumed_from'] == 0
+
+
+def test_direct_download_416_for_complete_part(tmp_path):
+    data = zip_bytes()
+    downloader = DirectDownloader(tmp_path, [])
+    partial_download(downloader, data, len(data))
+
+    target, part = fetch(downloader, lambda request: httpx.Response(416))
+
+    assert target == tmp_path / "backup-1.zip"
+    assert target.read_bytes() == data
+
+
+def test_direct_download_416_for_incomplete_part(tmp_path):
+    data = zip_bytes()
+    downloader = DirectDownloader(tmp_path, [])
+    temp_path = partial_download(downloader, data, 1000)
+
+    error, _ = fetch(downloader, lambda request: httpx.Response(416, headers={'Content-Range': "bytes */500"}))
+
+    assert isinstance(error, ValueError)
+    # Следующая попытка скачивает часть с начала
+    assert not temp_path.exists() and not downloader._meta_path(temp_path).exists()
+
+
+def test_direct_download_rejects_bad_zip(tmp_path, monkeypatch):
+    monkeypatch.setitem(direct_config, 'verify_zip', True)
+    downloader = DirectDownloader(tmp_path, [])
+
+    def handler(request):
+        return httpx.Response(200, content=b"not a zip archive", headers={'Content-Disposition': 'attachment; filename="part1.zip"'})
+
+    error, _ = fetch(downloader, handler)
+
+    assert isinstance(error, ValueError)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_direct_download_rejects_corrupted_zip(tmp_path, monkeypatch):
+    monkeypatch.setitem(direct_config, 'verify_zip', True)
+    data = bytearray(zip_bytes())
+    # Порча содержимого сжатого файла (заголовок архива цел)
+    data[100] ^= 0xFF
+    downloader = DirectDownloader(tmp_path, [])
+
+    error, _ = fetch(downloader, lambda request: httpx.Response(200, content=bytes(data), headers={'Content-Disposition': 'attachment; filename="part1.zip"'}))
+
+    assert isinstance(error, ValueError) and "CRC" in str(error)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,28 @@
+from checkpoint.objects import driver as driver_module
+from checkpoint.objects.driver import DriverPool
+
+
+class FakeChrome:
+    def __init__(self, options):
+        self.arguments = options.arguments
+        self.closed = False
+
+    def quit(self):
+        self.closed = True
+
+
+def test_pool_starts_browsers_with_own_profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(driver_module.webdriver, 'Chrome', FakeChrome)
+    pool = DriverPool(2, tmp_path / "profiles", is_headless=True)
+
+    drivers = pool.start()
+
+    assert len(drivers) == 2
+    assert [next(arg for arg in driver.arguments if arg.startswith("--user-data-dir=")) for driver in drivers] == [
+        f"--user-data-dir={(tmp_path / 'profiles' / f'worker_{number}').resolve()}" for number in range(2)]
+    assert all("--headless" in driver.arguments for driver in drivers)
+    # Повторный запуск не открывает лишних браузеров
+    assert pool.start() == drivers
+
+    pool.close()
+    assert all(driver.closed for driver in drivers) and pool.drivers == []
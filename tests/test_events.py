@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from checkpoint.knowledge import pauses
+from checkpoint.objects.events import DRAIN_SCRIPT, INSTALL_SCRIPT, PageEventBus
+
+
+class FakeDriver:
+    """
+    Браузер, в котором наблюдатель событий уже установлен или устанавливается заново после перехода
+    """
+
+    def __init__(self):
+        self.installed = False
+        self.state = {}
+        self.queue = []
+        self.lock = threading.Lock()
+
+    def set_count(self, name: str, count: int, text: str = ''):
+        with self.lock:
+            previous = self.state.get(name, {}).get('count', 0)
+            self.queue.append({'name': name, 'count': count, 'previous': previous, 'text': text, 'time': 0})
+            self.state[name] = {'count': count, 'text': text}
+
+    def navigate(self):
+        with self.lock:
+            self.installed = False
+            self.state = {}
+            self.queue = []
+
+    def execute_script(self, script, *args):
+        with self.lock:
+            if script == DRAIN_SCRIPT and not self.installed:
+                return None
+            assert script in (DRAIN_SCRIPT, INSTALL_SCRIPT)
+            self.installed = True
+            events, self.queue = self.queue, []
+            return {'events': events, 'state': dict(self.state), 'dropped': 0}
+
+
+@pytest.fixture(autouse=True)
+def poll_interval(monkeypatch):
+    monkeypatch.setitem(pauses.events, 'poll_interval', 0.01)
+
+
+def test_poll_installs_once_and_dispatches_events():
+    driver = FakeDriver()
+    bus = PageEventBus(driver, {'offline': "//*"})
+    received = []
+    bus.subscribe('offline', received.append)
+
+    bus.poll()
+    driver.set_count('offline', 1, 'Вы офлайн.')
+    bus.poll()
+
+    assert [event['count'] for event in received] == [1]
+    assert bus.text('offline') == 'Вы офлайн.'
+    assert (bus.installs, bus.round_trips) == (1, 3)
+
+
+def test_navigation_reports_disappeared_elements():
+    driver = FakeDriver()
+    bus = PageEventBus(driver, {'popup': "//*"})
+    driver.set_count('popup', 2, 'Что произошло')
+    bus.poll()
+
+    driver.navigate()
+    events = bus.poll()
+
+    assert [(event['name'], event['count'], event['previous']) for event in events] == [('popup', 0, 2)]
+    assert not bus.present('popup')
+
+
+def test_wait_returns_after_change_polled_by_another_thread():
+    driver = FakeDriver()
+    bus = PageEventBus(driver, {'add_dialogs': "//*"})
+    driver.set_count('add_dialogs', 3)
+    bus.poll()
+    since = bus.mark('add_dialogs')
+
+    def close_dialog():
+        driver.set_count('add_dialogs', 2)
+        bus.poll()
+
+    threading.Timer(0.05, close_dialog).start()
+
+    assert bus.wait('add_dialogs', since, 5)
+    assert bus.count('add_dialogs') == 2
+
+
+def test_wait_times_out_without_change():
+    driver = FakeDriver()
+    bus = PageEventBus(driver, {'add_dialogs': "//*", 'offline': "//*"})
+    driver.set_count('add_dialogs', 1)
+    bus.poll()
+    since = bus.mark('add_dialogs')
+    driver.set_count('offline', 1)
+
+    assert not bus.wait('add_dialogs', since, 0.05)
+    # Изменения других событий ожидание не завершают
+    assert bus.present('offline')
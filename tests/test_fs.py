@@ -0,0 +1,76 @@
+import hashlib
+import os
+
+import pytest
+
+from checkpoint.helpers.fs import _group_duplicates
+from checkpoint.knowledge.fs import hashing as hashing_config
+from checkpoint.objects.hashing import hash_file_edges
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setitem(hashing_config, 'partial_chunk_size', 16)
+    return 16
+
+
+def write(path, data: bytes):
+    path.write_bytes(data)
+    return path
+
+
+def test_edges_of_small_file_are_full_hash(tmp_path):
+    data = b"x" * 20
+    file_path = write(tmp_path / "a.bin", data)
+
+    assert hash_file_edges(file_path, 'md5', chunk_size=16) == (hashlib.md5(data).hexdigest(), 20)
+
+
+def test_edges_of_large_file_read_only_head_and_tail(tmp_path):
+    first = write(tmp_path / "a.bin", b"h" * 16 + b"1" * 100 + b"t" * 16)
+    second = write(tmp_path / "b.bin", b"h" * 16 + b"2" * 100 + b"t" * 16)
+    longer = write(tmp_path / "c.bin", b"h" * 16 + b"1" * 101 + b"t" * 16)
+
+    digest, read = hash_file_edges(first, 'md5', chunk_size=16)
+    assert read == 32
+    # Середина файла не читается, размер входит в хеш
+    assert hash_file_edges(second, 'md5', chunk_size=16)[0] == digest
+    assert hash_file_edges(longer, 'md5', chunk_size=16)[0] != digest
+
+
+@pytest.mark.parametrize('strategy', ['tiered', 'full'])
+def test_group_duplicates_finds_same_content(tmp_path, small_chunks, strategy):
+    large = os.urandom(200)
+    files = [
+        write(tmp_path / "large1.bin", large),
+        write(tmp_path / "large2.bin", large),
+        # Те же начало, конец и размер, другая середина
+        write(tmp_path / "large3.bin", large[:16] + bytes(168) + large[-16:]),
+        write(tmp_path / "small1.bin", b"small"),
+        write(tmp_path / "small2.bin", b"small"),
+        write(tmp_path / "other.bin", b"other"),
+        write(tmp_path / "unique.bin", b"unique size"),
+    ]
+
+    groups, _ = _group_duplicates(files, 'md5', strategy)
+
+    assert sorted((digest, [path.name for path in paths]) for digest, paths in groups) == sorted([
+        (hashlib.md5(large).hexdigest(), ["large1.bin", "large2.bin"]),
+        (hashlib.md5(b"small").hexdigest(), ["small1.bin", "small2.bin"]),
+    ])
+
+
+def test_tiered_reads_small_files_once(tmp_path, small_chunks):
+    files = [write(tmp_path / f"{name}.bin", b"same") for name in "abc"]
+    files.append(write(tmp_path / "unique.bin", b"unique size"))
+
+    groups, bytes_read = _group_duplicates(files, 'md5', 'tiered')
+
+    assert [len(paths) for _, paths in groups] == [3]
+    # Файл уникального размера не читается, остальные - по одному разу
+    assert bytes_read == 3 * 4
+
+
+def test_unknown_strategy(tmp_path):
+    with pytest.raises(ValueError):
+        _group_duplicates([], 'md5', 'fast')
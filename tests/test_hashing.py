@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+
+from checkpoint.objects.hashing import HashEngine, HashIndex, hash_file
+
+
+def write(path, data: bytes):
+    path.write_bytes(data)
+    return path
+
+
+def test_hash_file_matches_hashlib(tmp_path):
+    data = os.urandom(300_000)
+    file_path = write(tmp_path / "a.bin", data)
+
+    assert hash_file(file_path, 'md5', buffer_size=4096) == hashlib.md5(data).hexdigest()
+    assert hash_file(file_path, 'sha256') == hashlib.sha256(data).hexdigest()
+
+
+def test_lookup_hits_only_unchanged_files(tmp_path):
+    file_path = write(tmp_path / "a.jpg", b"first")
+    index = HashIndex(tmp_path / "index.jsonl")
+
+    assert index.lookup(file_path) is None
+    index.store(file_path, "digest")
+    assert index.lookup(file_path) == "digest"
+    assert (index.hits, index.misses) == (1, 1)
+
+    # Изменился размер и время изменения - запись устарела
+    write(file_path, b"second version")
+    os.utime(file_path, ns=(1, 1))
+    assert index.lookup(file_path) is None
+
+
+def test_records_of_other_algorithm_are_misses(tmp_path):
+    file_path = write(tmp_path / "a.jpg", b"data")
+    index = HashIndex(tmp_path / "index.jsonl", algorithm='md5')
+    index.store(file_path, "md5 digest")
+    index.close()
+
+    other = HashIndex(tmp_path / "index.jsonl", algorithm='sha256')
+    other.load()
+    assert other.lookup(file_path) is None
+
+
+def test_get_hash_computes_once(tmp_path):
+    file_path = write(tmp_path / "a.jpg", b"data")
+    index = HashIndex(tmp_path / "index.jsonl")
+    calls = []
+
+    def hasher(path):
+        calls.append(path)
+        return "digest"
+
+    assert index.get_hash(file_path, hasher) == "digest"
+    assert index.get_hash(file_path, hasher) == "digest"
+    assert len(calls) == 1
+
+
+def test_load_survives_torn_line_and_keeps_latest_record(tmp_path):
+    file_path = write(tmp_path / "a.jpg", b"data")
+    index_path = tmp_path / "index.jsonl"
+    index = HashIndex(index_path)
+    index.store(file_path, "old")
+    index.store(file_path, "new")
+    index.close()
+    with open(index_path, 'a', encoding='utf-8') as f:
+        f.write('{"path": "broken')
+
+    loaded = HashIndex(index_path)
+    assert loaded.load() == 1
+    assert loaded.stale_records == 2
+    assert loaded.lookup(file_path) == "new"
+
+
+def test_invalidate_folder_prefix(tmp_path):
+    (tmp_path / "album").mkdir()
+    (tmp_path / "album2").mkdir()
+    inside = write(tmp_path / "album" / "a.jpg", b"a")
+    sibling = write(tmp_path / "album2" / "b.jpg", b"b")
+    index = HashIndex(tmp_path / "index.jsonl")
+    index.store(inside, "a")
+    index.store(sibling, "b")
+
+    assert index.invalidate(str(tmp_path / "album")) == 1
+    assert index.lookup(inside) is None
+    assert index.lookup(sibling) == "b"
+
+
+def test_compact_drops_stale_and_missing_records(tmp_path):
+    kept = write(tmp_path / "a.jpg", b"a")
+    removed = write(tmp_path / "b.jpg", b"b")
+    index_path = tmp_path / "index.jsonl"
+    index = HashIndex(index_path)
+    index.store(kept, "a1")
+    index.store(kept, "a2")
+    index.store(removed, "b")
+    removed.unlink()
+
+    assert index.compact() == (1, 2)
+    records = [json.loads(line) for line in index_path.read_text(encoding='utf-8').splitlines()]
+    assert [record['hash'] for record in records] == ["a2"]
+
+
+def test_engine_yields_results_before_input_is_exhausted(tmp_path):
+    first = write(tmp_path / "a.jpg", b"a")
+    more_input = threading.Event()
+
+    def items():
+        yield first
+        # Следующий путь появится только после того, как получен первый результат
+        assert more_input.wait(5)
+        yield tmp_path / "missing.jpg"
+
+    results = HashEngine('md5', workers=2).map(items())
+    assert next(results) == (first, hashlib.md5(b"a").hexdigest(), None)
+    more_input.set()
+
+    file_path, digest, error = next(results)
+    assert (file_path, digest, type(error)) == (tmp_path / "missing.jpg", None, FileNotFoundError)
+    assert list(results) == []
+
+
+def test_engine_uses_index_and_stores_new_hashes(tmp_path):
+    files = [write(tmp_path / f"{number}.jpg", bytes([number])) for number in range(20)]
+    index = HashIndex(tmp_path / "index.jsonl")
+    index.store(files[0], "from index")
+
+    engine = HashEngine('md5', workers=4, max_inflight_bytes=2, index=index)
+    results = {file_path: digest for file_path, digest, _ in engine.map(files)}
+
+    assert results[files[0]] == "from index"
+    assert results[files[1]] == hashlib.md5(bytes([1])).hexdigest()
+    assert (engine.hashed_files, len(results)) == (19, 20)
+    assert index.lookup(files[1]) == results[files[1]]
@@ -0,0 +1,79 @@
+from checkpoint.objects.ledger import UploadLedger
+
+
+def file_entry(key, size=10):
+    return key, (f"{key}.jpg", size, f"/photos/{key}.jpg")
+
+
+def test_uploaded_status_survives_reload(tmp_path):
+    ledger = UploadLedger(tmp_path / "ledger.jsonl")
+    ledger.record_files([file_entry("a"), file_entry("b")], UploadLedger.STATUS_ATTACHED, album_id=1, batch=1)
+    ledger.record_files([file_entry("a")], UploadLedger.STATUS_UPLOADED, batch=1)
+    ledger.record_files([file_entry("b")], UploadLedger.STATUS_FAILED, batch=1)
+    ledger.close()
+
+    loaded = UploadLedger(tmp_path / "ledger.jsonl")
+    assert loaded.load() == 2
+    assert loaded.is_uploaded("a")
+    assert not loaded.is_uploaded("b")
+    # Альбом и время создания берутся из предыдущей записи файла
+    assert loaded.files["a"]["album_id"] == "1"
+    assert loaded.files["a"]["created"] == ledger.files["a"]["created"]
+
+
+def test_uploaded_check_is_scoped_to_album(tmp_path):
+    ledger = UploadLedger(tmp_path / "ledger.jsonl")
+    ledger.record_files([file_entry("a")], UploadLedger.STATUS_UPLOADED, album_id=1)
+    ledger.record_files([file_entry("a")], UploadLedger.STATUS_UPLOADED, album_id=2)
+
+    assert ledger.is_uploaded("a")
+    assert ledger.is_uploaded("a", 1) and ledger.is_uploaded("a", "2")
+    assert not ledger.is_uploaded("a", 3)
+    assert ledger.uploaded_albums("a") == {"1", "2"}
+    assert ledger.album_totals() == {"1": {"files": 1, "bytes": 10}, "2": {"files": 1, "bytes": 10}}
+
+
+def test_totals_count_each_file_once(tmp_path):
+    ledger = UploadLedger(tmp_path / "ledger.jsonl")
+    ledger.record_files([file_entry("a", 10), file_entry("b", 5)], UploadLedger.STATUS_UPLOADED, album_id=1)
+    ledger.record_files([file_entry("a", 10)], UploadLedger.STATUS_UPLOADED, album_id=1)
+    ledger.record_files([file_entry("b", 5)], UploadLedger.STATUS_FAILED, album_id=1)
+
+    assert ledger.album_totals() == {"1": {"files": 1, "bytes": 10}}
+
+
+def test_torn_last_line_is_skipped_and_not_glued(tmp_path):
+    ledger_path = tmp_path / "ledger.jsonl"
+    ledger = UploadLedger(ledger_path)
+    ledger.record_files([file_entry("a")], UploadLedger.STATUS_UPLOADED, album_id=1)
+    ledger.close()
+    with open(ledger_path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "file", "key": "b", "sta')
+
+    ledger = UploadLedger(ledger_path)
+    assert ledger.load() == 1
+    ledger.record_files([file_entry("c")], UploadLedger.STATUS_UPLOADED, album_id=1)
+    ledger.close()
+
+    reloaded = UploadLedger(ledger_path)
+    assert reloaded.load() == 2
+    assert reloaded.is_uploaded("a") and reloaded.is_uploaded("c")
+
+
+def test_album_of_folder(tmp_path):
+    ledger_path = tmp_path / "ledger.jsonl"
+    ledger = UploadLedger(ledger_path)
+    ledger.set_album("/photos", 1, "Photos")
+    ledger.set_album("/photos", 1, "Photos")
+    assert len(ledger_path.read_text(encoding='utf-8').splitlines()) == 1
+
+    assert ledger.get_album("/photos")["album_name"] == "Photos"
+    assert not ledger.is_album_done("/photos")
+    ledger.close_album("/photos")
+    ledger.close()
+
+    reloaded = UploadLedger(ledger_path)
+    reloaded.load()
+    assert reloaded.get_album("/photos") is None
+    assert reloaded.is_album_done("/photos")
+    assert reloaded.get_album("/other") is None
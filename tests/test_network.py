@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from checkpoint.knowledge.upload import network as network_config
+from checkpoint.objects.network import NetworkTracker
+
+
+class FakeDriver:
+    """
+    Браузер с логом performance: события Network добавляются тестом
+    """
+
+    def __init__(self):
+        self.log = []
+        self.bodies = {}
+
+    def get_log(self, log_type):
+        assert log_type == 'performance'
+        entries, self.log = self.log, []
+        return entries
+
+    def execute_cdp_cmd(self, command, params):
+        assert command == 'Network.getResponseBody'
+        if params['requestId'] not in self.bodies:
+            raise WebDriverException("No resource with given identifier found")
+        return {'body': self.bodies[params['requestId']]}
+
+    def event(self, method, **params):
+        self.log.append({'message': json.dumps({'message': {'method': f"Network.{method}", 'params': params}})})
+
+    def request(self, request_id, url, timestamp, method='GET', post_data=''):
+        self.event('requestWillBeSent', requestId=request_id, timestamp=timestamp,
+                   request={'url': url, 'method': method, 'postData': post_data})
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    monkeypatch.setitem(network_config, 'poll_interval', 0.01)
+
+
+def test_classify_requests():
+    assert NetworkTracker.classify({'url': 'https://upload.facebook.com/ajax/photo', 'method': 'POST'}) == 'upload'
+    assert NetworkTracker.classify({'url': 'https://www.facebook.com/api/graphql/', 'method': 'POST',
+                                    'postData': 'fb_api_req_friendly_name=ComposerStoryCreateMutation'}) == 'publish'
+    # Запросы GraphQL без мутации - чтение страницы, а не публикация
+    assert NetworkTracker.classify({'url': 'https://www.facebook.com/api/graphql/', 'method': 'POST',
+                                    'postData': 'fb_api_req_friendly_name=ProfileQuery'}) is None
+    assert NetworkTracker.classify({'url': 'https://www.facebook.com/api/graphql/', 'method': 'GET'}) is None
+    assert NetworkTracker.classify({'url': 'https://www.facebook.com/'}) is None
+
+
+def test_poll_finishes_tracked_requests():
+    driver = FakeDriver()
+    tracker = NetworkTracker(driver)
+    received = []
+    tracker.subscribe(received.append)
+
+    driver.request('1', 'https://upload.facebook.com/photo', 10.0, method='POST')
+    driver.request('2', 'https://www.facebook.com/', 10.0)
+    driver.request('3', 'https://upload.facebook.com/photo', 11.0, method='POST')
+    driver.event('responseReceived', requestId='1', response={'status': 200})
+    driver.event('loadingFinished', requestId='1', timestamp=12.5)
+    driver.event('loadingFinished', requestId='2', timestamp=12.5)
+    driver.event('responseReceived', requestId='3', response={'status': 503})
+    driver.event('loadingFinished', requestId='3', timestamp=13.0)
+
+    finished = tracker.poll()
+
+    assert [(record['seq'], record['latency'], record['status'], record['error']) for record in finished] == [
+        (1, 2.5, 200, None), (2, 2.0, 503, 'HTTP 503')]
+    assert received == finished
+    assert tracker.pending == {}
+    assert tracker.stats() == {'upload': {'count': 2, 'failed': 1, 'avg_latency': 2.25, 'max_latency': 2.5}}
+
+
+def test_publish_errors():
+    driver = FakeDriver()
+    tracker = NetworkTracker(driver)
+    for request_id in ['1', '2', '3']:
+        driver.request(request_id, 'https://www.facebook.com/api/graphql/', 1.0, method='POST',
+                       post_data='fb_api_req_friendly_name=AlbumAddMediaMutation')
+    driver.bodies = {'1': '{"data": {}}', '2': '{"errors": [{"message": "blocked"}]}'}
+    for request_id in ['1', '2']:
+        driver.event('responseReceived', requestId=request_id, response={'status': 200})
+        driver.event('loadingFinished', requestId=request_id, timestamp=2.0)
+    driver.event('loadingFailed', requestId='3', timestamp=2.0, errorText='net::ERR_CONNECTION_RESET')
+
+    assert [(record['kind'], record['error'], record['ok']) for record in tracker.poll()] == [
+        ('publish', None, True), ('publish', 'graphql errors', False), ('publish', 'net::ERR_CONNECTION_RESET', False)]
+    assert tracker.stats()['publish']['failed'] == 2
+
+
+def test_wait_returns_only_requests_after_mark():
+    driver = FakeDriver()
+    tracker = NetworkTracker(driver)
+    driver.request('1', 'https://upload.facebook.com/photo', 1.0)
+    driver.event('loadingFinished', requestId='1', timestamp=2.0)
+    since = tracker.mark()
+
+    assert tracker.wait('upload', since, timeout=0.05) is None
+
+    driver.request('2', 'https://upload.facebook.com/photo', 3.0)
+    driver.event('loadingFinished', requestId='2', timestamp=4.0)
+    assert tracker.wait('upload', since, timeout=1)['seq'] == 2
+    assert tracker.wait('publish', since, timeout=0.05) is None
+
+
+def test_for_driver_shares_tracker():
+    driver = FakeDriver()
+
+    assert NetworkTracker.for_driver(driver) is NetworkTracker.for_driver(driver)
+    assert NetworkTracker.for_driver(FakeDriver()) is not NetworkTracker.for_driver(driver)
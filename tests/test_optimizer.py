@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from PIL import Image
+
+from checkpoint.objects.optimizer import ImageOptimizer
+
+
+def noise_image(path, size, image_format='JPEG', quality=95):
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(path, image_format, quality=quality)
+    return str(path)
+
+
+@pytest.fixture
+def optimizer(tmp_path):
+    optimizer = ImageOptimizer(tmp_path / "cache", max_edge=256, quality=70, workers=2)
+    yield optimizer
+    optimizer.close()
+
+
+def test_large_image_is_downscaled_and_cached(tmp_path, optimizer):
+    original = noise_image(tmp_path / "big.jpg", (1024, 512))
+
+    optimized = optimizer.path('big', original)
+
+    with Image.open(optimized) as img:
+        assert (img.format, img.size) == ('JPEG', (256, 128))
+    assert optimizer.optimized_files == 1
+    assert optimizer.saved_bytes == os.path.getsize(original) - os.path.getsize(optimized)
+
+    # Следующий запуск берет готовый файл из кэша по хешу оригинала
+    again = ImageOptimizer(tmp_path / "cache", max_edge=256, quality=70)
+    assert again.path('big', original) == optimized
+    assert (again.cached_files, again.optimized_files) == (1, 0)
+    again.close()
+
+
+def test_submit_once_per_file(tmp_path, optimizer):
+    original = noise_image(tmp_path / "big.jpg", (512, 512))
+
+    assert optimizer.submit('big', original) is optimizer.submit('big', original)
+    optimizer.path('big', original)
+    assert optimizer.optimized_files == 1
+
+
+def test_original_is_kept_without_saving(tmp_path):
+    # PNG не пересжимается, а пересжатие маленького JPEG с более высоким качеством не дает выигрыша
+    optimizer = ImageOptimizer(tmp_path / "cache", max_edge=256, quality=95)
+    png = noise_image(tmp_path / "small.png", (64, 64), 'PNG')
+    small_jpeg = noise_image(tmp_path / "small.jpg", (64, 64), quality=50)
+
+    assert optimizer.path('png', png) == png
+    assert optimizer.path('jpeg', small_jpeg) == small_jpeg
+    assert optimizer.kept_files == 2
+    assert optimizer.saved_bytes == 0
+    assert not list((tmp_path / "cache").glob("*.jpg"))
+
+    # Повторно оригинал не пересжимается
+    again = ImageOptimizer(tmp_path / "cache", max_edge=256, quality=95)
+    assert again.path('jpeg', small_jpeg) == small_jpeg
+    assert again.kept_files == 1
+    optimizer.close()
+    again.close()
+
+
+def test_broken_file_falls_back_to_original(tmp_path, optimizer):
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+
+    assert optimizer.path('broken', str(broken)) == str(broken)
+    assert optimizer.failed_files == 1
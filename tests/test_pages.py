@@ -0,0 +1,96 @@
+import pytest
+from selenium.common import WebDriverException
+
+from checkpoint.helpers import pages as page_helpers
+from checkpoint.helpers.pages import CLASSIFY_SCRIPT, check_page, classify_page, compile_signatures
+from checkpoint.knowledge import pages
+
+
+class FakeDriver:
+    """
+    Браузер, в котором распознаются заданные страницы
+    """
+
+    def __init__(self, matched=(), error: bool = False, appear_after: int = 0):
+        self.matched = list(matched)
+        self.error = error
+        self.appear_after = appear_after
+        self.calls = []
+
+    def execute_script(self, script, signatures):
+        assert script == CLASSIFY_SCRIPT
+        self.calls.append(signatures)
+        if self.error:
+            raise WebDriverException("browser closed")
+        if len(self.calls) <= self.appear_after:
+            return []
+        return [page for page in self.matched if page in signatures]
+
+
+@pytest.fixture
+def signatures(monkeypatch):
+    monkeypatch.setattr(pages, 'signatures', {
+        'login': {
+            'texts': {'ru': ['Войти'], 'en': ['Log in']},
+            'selectors': ["[name='login']"],
+            'aria_labels': {'ru': ['Вход "быстрый"'], 'en': ['Quick \\ login']},
+            'urls': ['/login'],
+            'priority': 60,
+        },
+        'captcha': {'texts': {'en': ['Enter the characters']}, 'priority': 90},
+        'index': {'aria_labels': {'ru': ['Ваш профиль']}},
+    })
+    compile_signatures.cache_clear()
+    yield pages.signatures
+    compile_signatures.cache_clear()
+
+
+def test_compile_signatures_for_locales(signatures):
+    compiled = compile_signatures(('ru', 'en'))
+
+    assert compiled['login'] == {
+        'selector': "[name='login'], [aria-label=\"Вход \\\"быстрый\\\"\"], [aria-label=\"Quick \\\\ login\"]",
+        'texts': ['Войти', 'Log in'],
+        'urls': ['/login'],
+        'priority': 60,
+    }
+    assert compiled['index'] == {'selector': '[aria-label="Ваш профиль"]', 'texts': [], 'urls': [], 'priority': 0}
+    assert compile_signatures(('en',))['login']['texts'] == ['Log in']
+    assert compile_signatures(('en',))['index']['selector'] == ''
+
+
+def test_compiled_signatures_are_cached(signatures):
+    assert compile_signatures(('ru',)) is compile_signatures(('ru',))
+
+
+def test_classify_page_orders_by_priority(signatures):
+    driver = FakeDriver(['index', 'login', 'captcha'])
+
+    assert classify_page(driver) == ['captcha', 'login', 'index']
+    # Признаки всех страниц проверяются одним вызовом
+    assert len(driver.calls) == 1
+    assert set(driver.calls[0]) == {'login', 'captcha', 'index'}
+
+
+def test_classify_only_requested_pages(signatures):
+    driver = FakeDriver(['login', 'captcha'])
+
+    assert classify_page(driver, ['login', 'unknown']) == ['login']
+    assert set(driver.calls[0]) == {'login'}
+    assert classify_page(driver, ['unknown']) == []
+    assert len(driver.calls) == 1
+
+
+def test_classify_page_waits_for_any_signature(signatures, monkeypatch):
+    monkeypatch.setattr(page_helpers, 'POLL_FREQUENCY', 0.01)
+    driver = FakeDriver(['login'], appear_after=2)
+
+    assert classify_page(driver, timeout=1) == ['login']
+    assert len(driver.calls) == 3
+    assert classify_page(FakeDriver(['login'], appear_after=1), timeout=0) == []
+
+
+def test_browser_errors_mean_unknown_page(signatures):
+    assert classify_page(FakeDriver(['login'], error=True)) == []
+    assert check_page(FakeDriver(['login']), 'login', timeout=0)
+    assert not check_page(FakeDriver(['captcha']), 'login', timeout=0)
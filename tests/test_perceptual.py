@@ -0,0 +1,103 @@
+import random
+from pathlib import Path
+
+from PIL import Image
+
+from checkpoint.helpers import fs
+from checkpoint.objects import stats
+from checkpoint.objects.perceptual import BKTree, PerceptualIndex
+from checkpoint.objects.stats import PhotoStatsManager
+
+
+def gradient(path, shift: int = 0):
+    image = Image.new('L', (64, 64))
+    image.putdata([min(255, x * 4 + shift) for y in range(64) for x in range(64)])
+    image.save(path)
+    return path
+
+
+def noise(path):
+    rng = random.Random(3)
+    image = Image.new('L', (64, 64))
+    image.putdata([rng.randrange(256) for _ in range(64 * 64)])
+    image.save(path)
+    return path
+
+
+def test_bktree_search_matches_brute_force():
+    rng = random.Random(1)
+    values = [rng.getrandbits(64) for _ in range(300)]
+    # Близкие к первым значениям хеши и точные повторы
+    values += [value ^ (1 << rng.randrange(64)) for value in values[:50]] + values[:10]
+    tree = BKTree()
+    for number, value in enumerate(values):
+        tree.add(value, number)
+
+    for query in values[:20] + [rng.getrandbits(64) for _ in range(5)]:
+        found = sorted(item for distance, _, items in tree.search(query, 6) for item in items)
+        expected = sorted(number for number, value in enumerate(values) if (value ^ query).bit_count() <= 6)
+        assert found == expected
+
+    assert tree.size == len(values)
+    assert sorted(tree.values()) == sorted(set(values))
+
+
+def test_clusters_join_chains_of_neighbours(tmp_path):
+    index = PerceptualIndex(tmp_path / "index.jsonl")
+    # a-b и b-c на расстоянии 2, a-c на расстоянии 4: группа по цепочке соседей
+    for name, value in [("a", 0b0000), ("b", 0b0011), ("c", 0b1111), ("d", 0xFFFF0000), ("e", 0xFFFF0001)]:
+        index._add(tmp_path / name, format(value, 'x'))
+    index._add(tmp_path / "far", format(0xF0F0F0F0F0, 'x'))
+
+    clusters = index.clusters(max_distance=2)
+
+    assert sorted(clusters) == [[tmp_path / "a", tmp_path / "b", tmp_path / "c"], [tmp_path / "d", tmp_path / "e"]]
+
+
+def test_update_finds_similar_images_and_reuses_stored_hashes(tmp_path, monkeypatch):
+    images = tmp_path / "images"
+    images.mkdir()
+    original = gradient(images / "original.png")
+    brighter = gradient(images / "brighter.png", shift=3)
+    noise(images / "other.png")
+    (images / "notes.txt").write_text("not an image")
+
+    index = PerceptualIndex(tmp_path / "index.jsonl", workers=2)
+    assert index.update(images, extensions=['.png']) == 3
+    assert index.clusters() == [[brighter, original]]
+    assert [path for _, path in index.near_duplicates(original)] == [brighter]
+
+    # Неизмененные файлы берутся из индекса на диске и не декодируются повторно
+    reloaded = PerceptualIndex(tmp_path / "index.jsonl")
+    monkeypatch.setattr(reloaded, '_compute', lambda file_path: (file_path, None, AssertionError(file_path)))
+    assert reloaded.update(images, extensions=['.png']) == 3
+    assert reloaded.errors == []
+
+
+def test_near_duplicates_excludes_image_given_by_other_path(tmp_path, monkeypatch):
+    images = tmp_path / "images"
+    images.mkdir()
+    original = gradient(images / "original.png")
+    brighter = gradient(images / "brighter.png", shift=3)
+    index = PerceptualIndex(tmp_path / "index.jsonl")
+    monkeypatch.chdir(tmp_path)
+    index.update(Path("images"), extensions=['.png'])
+
+    for query in (Path("images/original.png"), images / ".." / "images" / "original.png", original):
+        assert [path for _, path in index.near_duplicates(query)] == [brighter]
+
+
+def test_duplicate_report_lists_near_duplicates(tmp_path, monkeypatch):
+    photo = tmp_path / "PHOTO"
+    photo.mkdir()
+    original = gradient(photo / "original.png")
+    brighter = gradient(photo / "brighter.png", shift=3)
+    other = noise(photo / "other.png")
+    monkeypatch.setattr(stats, 'get_temp_path', lambda name: tmp_path / name)
+    monkeypatch.setattr(fs, 'get_temp_path', lambda name: tmp_path / name)
+
+    manager = PhotoStatsManager(photo, tmp_path / "logs")
+    assert manager.get_near_duplicates([str(brighter), str(other), str(photo / "video.mp4")]) == [(str(brighter), [str(original)])]
+
+    report = fs.get_duplicate_statistics(photo, include_filename_duplicates=False, include_near_duplicates=True)
+    assert report['near_duplicates'] == {'groups': 1, 'files': 1, 'details': [[str(brighter), str(original)]]}
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from checkpoint.knowledge import pauses
+from checkpoint.knowledge.upload import rate as rate_config
+from checkpoint.objects import rate
+from checkpoint.objects.rate import RateController
+from checkpoint.objects.scheduler import scheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {'monotonic': 100.0, 'time': 1_700_000_000.0}
+    monkeypatch.setattr(rate.time, 'monotonic', lambda: now['monotonic'])
+    monkeypatch.setattr(rate.time, 'time', lambda: now['time'])
+    return now
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    for key, value in {'initial_rate': 30, 'min_rate': 1, 'max_rate': 120, 'burst': 2, 'increase_step': 1,
+                       'block_factor': 0.5, 'ceiling_margin': 0.9, 'ceiling_recovery': 0.5}.items():
+        monkeypatch.setitem(rate_config, key, value)
+    for key, value in {'base_delay': 1, 'max_delay': 900, 'jitter': 0, 'block_delay': 600}.items():
+        monkeypatch.setitem(pauses.throttling, key, value)
+
+
+def test_burst_then_rate(clock):
+    controller = RateController()
+
+    assert controller.reserve() == 0.0
+    assert controller.reserve() == 0.0
+    # 30 действий в минуту - следующий токен через 2 секунды
+    assert controller.reserve() == pytest.approx(2.0)
+    clock['monotonic'] += 2
+    assert controller.reserve() == 0.0
+
+
+def test_failure_backs_off_exponentially(clock):
+    controller = RateController()
+
+    assert [controller.failure() for _ in range(3)] == [2, 4, 8]
+    assert controller.delay() == 8
+    assert controller.reserve() == 8
+    assert controller.next_allowed_at is not None
+
+    controller.success()
+    assert controller.failure() == 2
+    assert max(controller.failure() for _ in range(20)) == 900
+
+
+def test_block_lowers_rate_and_ceiling(clock, tmp_path):
+    controller = RateController(tmp_path / "rate.json")
+
+    assert controller.failure(blocked=True) == 600
+    assert (controller.rate, controller.ceiling, controller.blocks) == (15, 27, 1)
+
+    # После блокировки темп растет только до потолка, потолок восстанавливается медленно
+    for _ in range(20):
+        controller.success()
+    assert controller.ceiling == 37
+    assert controller.rate == 35
+
+
+def test_state_is_restored(clock, tmp_path):
+    controller = RateController(tmp_path / "rate.json")
+    controller.failure(blocked=True)
+
+    restored = RateController(tmp_path / "rate.json")
+    assert restored.load()
+    assert (restored.rate, restored.ceiling, restored.blocks) == (15, 27, 1)
+    assert restored.delay() == 600
+    assert restored.last_block == controller.last_block
+
+
+def test_broken_state_is_ignored(tmp_path):
+    (tmp_path / "rate.json").write_text("{not json", encoding='utf-8')
+    controller = RateController(tmp_path / "rate.json")
+
+    assert not controller.load()
+    assert controller.rate == 30
+
+
+def test_acquire_is_interrupted_by_shutdown():
+    controller = RateController()
+    controller.failure()
+    threading.Timer(0.05, scheduler.shutdown).start()
+
+    try:
+        assert controller.acquire() < 1
+    finally:
+        scheduler.start()
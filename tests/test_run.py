@@ -0,0 +1,257 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import run
+from checkpoint.knowledge import pauses
+from checkpoint.objects.events import DRAIN_SCRIPT, INSTALL_SCRIPT
+from checkpoint.objects.hashing import HashIndex
+from checkpoint.objects.ledger import UploadLedger
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 16
+
+
+def write_image(path, data: bytes = b""):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(JPEG + data)
+    return path
+
+
+def drain(pipeline, batch_size):
+    batches = []
+    while batch := pipeline.next_batch(batch_size):
+        batches.append(batch)
+    return batches
+
+
+def test_pipeline_streams_images_in_batches(tmp_path):
+    for number in range(5):
+        write_image(tmp_path / f"{number}.jpg", bytes([number]))
+    write_image(tmp_path / "layers.psd")
+    write_image(tmp_path / "sub" / "nested.jpg")
+    (tmp_path / "notes.txt").write_text("not an image")
+
+    pipeline = run.DiscoveryPipeline(str(tmp_path))
+    pipeline.start()
+    batches = drain(pipeline, 2)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert sorted(file[0] for batch in batches for _, file in batch) == [f"{number}.jpg" for number in range(5)]
+    assert (pipeline.finished, pipeline.discovered_count) == (True, 5)
+    # После конца поиска пачки пустые
+    assert pipeline.next_batch(2) == []
+
+    recursive = run.DiscoveryPipeline(str(tmp_path), recursive=True)
+    recursive.start()
+    assert sum(len(batch) for batch in drain(recursive, 10)) == 6
+
+
+def test_pipeline_skips_duplicates_and_uploaded_files(tmp_path):
+    first = write_image(tmp_path / "a.jpg", b"a")
+    write_image(tmp_path / "copy of a.jpg", b"a")
+    uploaded = write_image(tmp_path / "b.jpg", b"b")
+    write_image(tmp_path / "c.jpg", b"c")
+    uploaded_id = hashlib.md5(uploaded.read_bytes()).hexdigest()
+
+    pipeline = run.DiscoveryPipeline(str(tmp_path), hash_index=HashIndex(tmp_path / "index.jsonl"),
+                                     skip=lambda file_id: file_id == uploaded_id)
+    pipeline.start()
+    files = {file_id: file for batch in drain(pipeline, 10) for file_id, file in batch}
+
+    assert len(files) == 2
+    assert files[hashlib.md5(first.read_bytes()).hexdigest()][0] in ("a.jpg", "copy of a.jpg")
+    assert pipeline.skipped_count == 1
+
+
+def test_requeued_files_come_first(tmp_path):
+    for number in range(3):
+        write_image(tmp_path / f"{number}.jpg", bytes([number]))
+    pipeline = run.DiscoveryPipeline(str(tmp_path))
+    pipeline.start()
+
+    batch = pipeline.next_batch(3)
+    pipeline.requeue(batch[1:])
+
+    assert pipeline.next_batch(1) == batch[1:2]
+    assert pipeline.next_batch(5) == batch[2:]
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    ledger = UploadLedger(tmp_path / "ledger.jsonl")
+    monkeypatch.setattr(run, 'ledger', ledger)
+    yield ledger
+    ledger.close()
+
+
+def test_tree_plan_orders_jobs(tmp_path, ledger):
+    root = tmp_path / "photos"
+    write_image(root / "2019" / "big.jpg", b"x" * 1000)
+    write_image(root / "2020" / "a.jpg")
+    write_image(root / "2020" / "b.jpg")
+    write_image(root / "family" / "small.jpg")
+    write_image(root / "done" / "old.jpg")
+    ledger.set_album(str(root / "done"), 1, "done")
+    ledger.close_album(str(root / "done"))
+    ledger.set_album(str(root / "2019"), 2, "2019")
+
+    scheduler = run.TreeScheduler(str(root), order='size', priority=['family'])
+    jobs = scheduler.plan()
+
+    # Начатые папки продолжаются первыми, затем приоритетные, затем от маленьких к большим
+    assert [os.path.basename(job['folder']) for job in jobs] == ['2019', 'family', '2020']
+    assert [job['count'] for job in jobs] == [1, 1, 2]
+    assert [os.path.basename(job['folder']) for job in scheduler.skipped] == ['done']
+
+    scheduler = run.TreeScheduler(str(root), order='name', skip_done=False)
+    assert [os.path.basename(job['folder']) for job in scheduler.plan()] == ['2019', '2020', 'done', 'family']
+
+
+def test_upload_workers_share_album_batches(monkeypatch):
+    uploaded = []
+
+    class Pipeline:
+        def next_batch(self, batch_size):
+            return [('next', ('next.jpg', 1, '/photos/next.jpg'))]
+
+    def upload_batches(driver, pipeline, album_id, files):
+        upload_state = run.upload_state
+        upload_state.batch_controller.start_batch()
+        upload_state.batch_controller.finish_batch(True, len(files), 100)
+        uploaded.append((driver, album_id, files, upload_state.album_name))
+
+    monkeypatch.setattr(run, 'upload_batches', upload_batches)
+    workers = run.UploadWorkers(['first', 'second'])
+    files = [('first', ('first.jpg', 1, '/photos/first.jpg'))]
+
+    workers.upload_album(Pipeline(), 10, 'Отпуск', files)
+
+    # Первый браузер продолжает с уже полученной пачкой, второй берет следующую
+    assert sorted(uploaded) == [('first', 10, files, 'Отпуск'), ('second', 10, Pipeline().next_batch(1), 'Отпуск')]
+    assert sorted(workers.stats) == ['UploadWorker-0', 'UploadWorker-1']
+    assert all((stats['batches'], stats['files'], stats['bytes']) == (1, 1, 100) for stats in workers.stats.values())
+
+
+class EventsDriver:
+    """
+    Браузер, на странице которого появляется сообщение "Страница сейчас недоступна" до обновления страницы
+    """
+
+    def __init__(self):
+        self.state = {}
+        self.queue = []
+        self.refreshes = 0
+        self.lock = threading.Lock()
+
+    def set_count(self, name: str, count: int, text: str = ''):
+        with self.lock:
+            previous = self.state.get(name, {}).get('count', 0)
+            self.queue.append({'name': name, 'count': count, 'previous': previous, 'text': text, 'time': 0})
+            self.state[name] = {'count': count, 'text': text}
+
+    def execute_script(self, script, *args):
+        assert script in (DRAIN_SCRIPT, INSTALL_SCRIPT)
+        with self.lock:
+            events, self.queue = self.queue, []
+            return {'events': events, 'state': dict(self.state), 'dropped': 0}
+
+    def refresh(self):
+        self.refreshes += 1
+        self.set_count('page_unavailable', 0)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_uploader_refreshes_unavailable_page(monkeypatch):
+    for key, value in {'poll_interval': 0.01, 'alert_poll_interval': 0.01, 'page_unavailable_refresh': 0.05}.items():
+        monkeypatch.setitem(pauses.events, key, value)
+    driver = EventsDriver()
+    watcher = run.Watcher(driver)
+    try:
+        run.check_connection(driver)
+        assert driver.refreshes == 0
+
+        driver.set_count('page_unavailable', 1, 'Страница сейчас недоступна')
+        assert wait_until(lambda: not watcher.page_available.is_set())
+
+        run.check_connection(driver)
+        assert driver.refreshes == 1
+        assert watcher.page_available.is_set()
+        assert run.Watcher.for_driver(driver) is watcher
+    finally:
+        watcher.stop()
+
+
+class FilesInput:
+    def __init__(self, multiple: bool = True):
+        self.multiple = multiple
+        self.sent = []
+
+    def send_keys(self, value):
+        if "\n" in value and not self.multiple:
+            raise WebDriverException("File not found")
+        self.sent.append(value)
+
+
+def test_attach_files_in_one_call(monkeypatch):
+    monkeypatch.setattr(run, 'sleep', lambda seconds: None)
+    paths = ['/photos/a.jpg', '/photos/b.jpg']
+
+    files_input = FilesInput()
+    assert run.attach_files(files_input, paths)
+    assert files_input.sent == ["/photos/a.jpg\n/photos/b.jpg"]
+
+    # Поле без multiple получает файлы по одному
+    files_input = FilesInput(multiple=False)
+    assert not run.attach_files(files_input, paths)
+    assert files_input.sent == paths
+
+    files_input = FilesInput()
+    assert not run.attach_files(files_input, paths, bulk=False)
+    assert files_input.sent == paths
+
+
+class ScrollDriver:
+    """
+    Страница, которая подгружает следующий фрагмент results раз
+    """
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.steps = 0
+
+    def set_script_timeout(self, timeout):
+        self.script_timeout = timeout
+
+    def execute_async_script(self, script, timeout, idle, interval):
+        assert script == run.SCROLL_STEP_SCRIPT
+        self.steps += 1
+        return self.results.pop(0)
+
+
+def step(grew=False, at_end=False, timed_out=False):
+    return {'grew': grew, 'atEnd': at_end, 'timedOut': timed_out}
+
+
+def test_scroll_to_end_stops_at_page_end():
+    driver = ScrollDriver([step(), step(grew=True), step(), step(at_end=True, timed_out=True)])
+
+    stats = run.scroll_to_end(driver, timeout=2)
+
+    assert (stats['steps'], stats['waits'], stats['timeouts']) == (4, 1, 1)
+    assert driver.script_timeout == 7
+
+
+def test_scroll_to_end_stops_on_condition():
+    driver = ScrollDriver([step()] * 10)
+
+    assert run.scroll_to_end(driver, timeout=2, until=lambda: driver.steps == 3)['steps'] == 3
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from checkpoint.objects.scheduler import Scheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler()
+    yield scheduler
+    scheduler.shutdown()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_wait_times_out(scheduler):
+    started = time.monotonic()
+
+    assert scheduler.wait(0.05, 'task') is False
+    assert time.monotonic() - started >= 0.05
+
+
+def test_signal_wakes_waiting_task(scheduler):
+    threading.Timer(0.05, scheduler.signal, args=('task',)).start()
+    started = time.monotonic()
+
+    assert scheduler.wait(5, 'other', 'task') is True
+    assert time.monotonic() - started < 1
+
+
+def test_signal_before_wait_is_kept_once(scheduler):
+    scheduler.signal('task')
+
+    assert scheduler.wait(5, 'task') is True
+    assert scheduler.wait(0.01, 'task') is False
+
+
+def test_clear_drops_pending_signal(scheduler):
+    scheduler.signal('task')
+    scheduler.clear('task')
+
+    assert scheduler.wait(0.01, 'task') is False
+
+
+def test_timers(scheduler):
+    calls = []
+    repeating = scheduler.every(0.02, lambda: calls.append('every'))
+    scheduler.call_later(0.03, lambda: calls.append('later'))
+    cancelled = scheduler.call_later(0.03, lambda: calls.append('cancelled'))
+    cancelled.cancel()
+
+    assert wait_until(lambda: calls.count('every') >= 3 and 'later' in calls)
+    repeating.cancel()
+    time.sleep(0.05)
+    count = len(calls)
+    time.sleep(0.05)
+
+    assert len(calls) == count
+    assert calls.count('later') == 1 and 'cancelled' not in calls
+
+
+def test_failing_timer_does_not_stop_others(scheduler):
+    calls = []
+    scheduler.call_later(0.01, lambda: 1 / 0)
+    scheduler.call_later(0.02, lambda: calls.append('ok'))
+
+    assert wait_until(lambda: calls == ['ok'])
+
+
+def test_shutdown_interrupts_waits_and_restart(scheduler):
+    calls = []
+    scheduler.every(0.01, lambda: calls.append(1))
+    scheduler.signal('task')
+    threading.Timer(0.05, scheduler.shutdown).start()
+
+    assert scheduler.wait(5, 'other') is True
+    assert scheduler.wait(5, 'other') is True
+    assert scheduler.call_later(0.01, lambda: calls.append(2)).cancelled
+
+    scheduler.start()
+    count = len(calls)
+    time.sleep(0.05)
+    # Таймеры и сигналы прошлого запуска не переживают остановку
+    assert len(calls) == count
+    assert scheduler.wait(0.01, 'task') is False
+
+    scheduler.call_later(0.01, lambda: calls.append(3))
+    assert wait_until(lambda: 3 in calls)
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from checkpoint.objects.telemetry import Telemetry, percentile
+
+
+def read_events(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_percentile_by_nearest_rank():
+    values = [1.0, 2.0, 3.0, 4.0]
+
+    assert percentile(values, 50) == 2.0
+    assert percentile(values, 95) == 4.0
+    assert percentile(values, 0) == 1.0
+    assert percentile([], 50) == 0.0
+
+
+def test_span_records_fields_and_error(tmp_path):
+    telemetry = Telemetry()
+    telemetry.start(tmp_path / "logs" / "telemetry.jsonl")
+
+    with telemetry.span('attach', files=3) as fields:
+        fields['bytes'] = 1024
+    with pytest.raises(TimeoutError):
+        with telemetry.span('publish', files=2):
+            raise TimeoutError()
+    telemetry.close()
+
+    events = read_events(tmp_path / "logs" / "telemetry.jsonl")
+    assert [(event['phase'], event.get('event')) for event in events] == [('run', 'start'), ('attach', None), ('publish', None)]
+    assert (events[1]['files'], events[1]['bytes']) == (3, 1024)
+    assert events[2]['error'] == 'TimeoutError'
+    assert all(event['seconds'] >= 0 and event['thread'] for event in events)
+
+
+def test_start_appends_to_existing_log(tmp_path):
+    log_path = tmp_path / "telemetry.jsonl"
+    for _ in range(2):
+        telemetry = Telemetry()
+        telemetry.start(log_path)
+        telemetry.record('pause', 1.5)
+        telemetry.close()
+
+    assert [event['phase'] for event in read_events(log_path)] == ['run', 'pause', 'run', 'pause']
+
+
+def test_timed_decorator():
+    telemetry = Telemetry()
+
+    @telemetry.timed('page_load')
+    def load(url):
+        return url
+
+    assert load("https://example.com") == "https://example.com"
+    assert telemetry.summary()['page_load']['count'] == 1
+
+
+def test_summary_by_phase():
+    telemetry = Telemetry()
+    for seconds in [3.0, 1.0, 2.0, 10.0]:
+        telemetry.record('dialogs', seconds, files=2, retry=True)
+
+    summary = telemetry.summary()['dialogs']
+    assert (summary['count'], summary['total'], summary['p50'], summary['p95'], summary['max']) == (4, 16.0, 2.0, 10.0, 10.0)
+    # Логические поля не суммируются
+    assert summary['fields'] == {'files': 8}
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Замер поиска дубликатов по хешу: сколько байт прочитано и сколько времени занял поэтапный поиск
+(размер, хеш начала и конца файла, полный хеш) по сравнению с полным хешированием всех файлов
+
+    python tools/benchmark_duplicates.py "D:\\PHOTO\\Домашние"
+    python tools/benchmark_duplicates.py "D:\\PHOTO" --extensions .jpg .jpeg .png --algorithm blake2b --json bench.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from checkpoint import globals as gb
+from checkpoint.helpers.fs import benchmark_duplicate_search
+from checkpoint.objects.hashing import HASH_ALGORITHMS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bytes read and time of the tiered and the full duplicate search")
+    parser.add_argument('directory', type=Path, help='Folder to search for duplicates')
+    parser.add_argument('--extensions', nargs='*', help='File extensions to check (all files if not given)')
+    parser.add_argument('--algorithm', choices=list(HASH_ALGORITHMS.keys()), default='md5', help='Hash algorithm')
+    parser.add_argument('--norecursive', action='store_true', help='Do not search subfolders')
+    parser.add_argument('--json', type=Path, help='File to write the results to')
+    args = parser.parse_args()
+
+    if not args.directory.is_dir():
+        parser.error(f"directory not found: {args.directory}")
+
+    try:
+        results = benchmark_duplicate_search(args.directory, args.extensions, args.algorithm, not args.norecursive)
+        if args.json:
+            args.json.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    finally:
+        gb.cleanup_globals()
+
+
+if __name__ == '__main__':
+    main()